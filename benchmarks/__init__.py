@@ -0,0 +1,13 @@
+"""Performance benchmarks for the link engineering interface.
+
+Run with "python -m benchmarks run" from the repository root; see
+"python -m benchmarks --help". Benchmarks that need Tk are skipped when no
+display is available, so the suite also runs on headless servers.
+"""
+import os
+import sys
+
+# the application modules import each other as top level packages from src, like link_engineering.py
+SOURCE_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if SOURCE_FOLDER not in sys.path:
+    sys.path.insert(0, SOURCE_FOLDER)
@@ -0,0 +1,69 @@
+"""Command line of the benchmark suite.
+
+    python -m benchmarks run --scales 1k,10k --output results.json
+    python -m benchmarks run --baseline baseline.json
+    python -m benchmarks compare baseline.json results.json
+"""
+import argparse
+import sys
+
+from . import suite
+
+
+def parse_scales(text):
+    """Parse scales such as '1k,10k,100k' into device counts."""
+    scales = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        scales.append(int(float(part[:-1]) * 1000) if part.endswith("k") else int(part))
+    return scales
+
+
+def report_regressions(regressions, threshold):
+    """Print the regressions and return the exit status."""
+    if not regressions:
+        print(f"no regressions above {threshold:.0%}")
+        return 0
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms ({ratio:.2f}x)")
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--scales", type=parse_scales, default=[1_000, 10_000], help="e.g. 1k,10k,100k")
+    run_parser.add_argument("--only", nargs="*", choices=sorted(suite.BENCHMARKS), help="benchmarks to run")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default="benchmark_results.json")
+    run_parser.add_argument("--baseline", help="results to compare against after the run")
+    run_parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown as a fraction")
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown as a fraction")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "compare":
+        regressions = suite.compare(suite.load(arguments.baseline), suite.load(arguments.current), arguments.threshold)
+        return report_regressions(regressions, arguments.threshold)
+
+    def report(name, result, skipped):
+        if skipped:
+            print(f"{name:40s} skipped: {skipped}")
+        else:
+            print(f"{name:40s} median {result['median'] * 1000:10.2f} ms   min {result['min'] * 1000:10.2f} ms")
+
+    document = suite.run(arguments.scales, arguments.only, arguments.seed, report)
+    suite.save(arguments.output, document)
+    print(f"results saved to {arguments.output}")
+    if arguments.baseline:
+        return report_regressions(suite.compare(suite.load(arguments.baseline), document, arguments.threshold),
+                                  arguments.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Generators of synthetic device libraries and projects at any scale.
+
+Libraries mix the device kinds of the shipped device_library.json:
+antennas, LNAs, cables with attenuation tables (some with the misspelled
+'frequenccy' key), attenuators, and free form devices nested like the
+'fasdf' entry. The same seed always gives the same data.
+"""
+import json
+import random
+
+# share of each generated device kind
+KINDS = (("antenna", 0.1), ("lna", 0.3), ("cable", 0.2), ("attenuator", 0.2), ("nested", 0.2))
+
+
+def _frequency_range(rng):
+    low = round(rng.uniform(0.1, 8.0), 3)
+    keys = ("start", "end", "unit") if rng.random() < 0.5 else ("min", "max", "units")
+    return {keys[0]: low, keys[1]: round(low + rng.uniform(0.5, 20.0), 3), keys[2]: "GHz"}
+
+
+def _antenna(rng):
+    return {"diameter": {"value": round(rng.uniform(0.5, 30), 2), "unit": "meters"},
+            "frequency_range": _frequency_range(rng),
+            "location": {"lat": round(rng.uniform(-80, 80), 4), "lon": round(rng.uniform(-180, 180), 4),
+                         "alt": round(rng.uniform(0, 3000))},
+            "efficiency": rng.randint(50, 85), "gain": round(rng.uniform(20, 70), 1)}
+
+
+def _lna(rng):
+    return {"frequency_range": _frequency_range(rng),
+            "Gain": {"value": round(rng.uniform(10, 60), 1), "unit": "dB"},
+            "Noise_Figure": {"value": round(rng.uniform(0.3, 4.0), 2), "unit": "dB"},
+            "Temperature": {"value": rng.randint(250, 320), "unit": "K"}}
+
+
+def _cable(rng):
+    table = {}
+    loss = rng.uniform(1, 5)
+    for index, frequency in enumerate((0.01, 0.1, 1, 5, 10), start=1):
+        key = "frequenccy" if index == 1 and rng.random() < 0.2 else "frequency"
+        table[f"F{index}"] = {key: frequency, "units": "GHz", "attenuation": round(loss * (1 + frequency) ** 0.5, 2),
+                              "unit": "dB/100m"}
+    return {"length": {"value": rng.randint(1, 200), "unit": "meters"}, "frequency_range": _frequency_range(rng),
+            "attenuation": table}
+
+
+def _attenuator(rng):
+    return {"frequency_range": _frequency_range(rng), "attenuation": {"value": rng.randint(1, 40), "unit": "dB"}}
+
+
+def _nested(rng, depth, fanout=3):
+    if depth == 0:
+        return "".join(rng.choice("asdf") for _ in range(8))
+    return {"".join(rng.choice("asdf") for _ in range(rng.randint(3, 7))) + str(index): _nested(rng, depth - 1, fanout)
+            for index in range(fanout)}
+
+
+def generate_library(count, seed=0, nesting=5):
+    """Return a device library dictionary with count devices; nested devices are nesting levels deep."""
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in KINDS]
+    weights = [weight for _, weight in KINDS]
+    builders = {"antenna": _antenna, "lna": _lna, "cable": _cable, "attenuator": _attenuator,
+                "nested": lambda rng: _nested(rng, nesting)}
+    devices = {}
+    for index in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        devices[f"{kind.upper()}-{index:06d}"] = builders[kind](rng)
+    return {"devices": devices}
+
+
+def generate_project(library, count, seed=0, sweep_points=1001, measurement_points=100_000):
+    """Return a project of count devices drawn from a library, with a sweep, a link and measured data.
+
+    The first device is an antenna; most others refer to the library by
+    name and some carry their parameters inline.
+    """
+    rng = random.Random(seed)
+    names = list(library["devices"])
+    antennas = [name for name in names if name.startswith("ANTENNA")]
+    stages = [name for name in names if name.startswith(("LNA", "CABLE", "ATTENUATOR"))]
+    devices = [{"name": antennas[0]}] if antennas else []
+    for _ in range(count - len(devices)):
+        name = rng.choice(stages)
+        if rng.random() < 0.1:
+            devices.append(dict(library["devices"][name], name=name))
+        else:
+            devices.append({"name": name})
+    return {"name": f"synthetic-{count}", "devices": devices,
+            "sweep": {"start": 8.0, "stop": 8.4, "points": sweep_points, "unit": "GHz"},
+            "link": {"eirp": {"value": 50, "unit": "dBW"}, "distance": {"value": 36000, "unit": "km"},
+                     "required_cn0": 60},
+            "measurements": {"S21": [round(rng.gauss(0, 1), 5) for _ in range(measurement_points)]}}
+
+
+def write_json(path, data):
+    """Write generated data as a json file."""
+    with open(path, "w") as f:
+        json.dump(data, f)
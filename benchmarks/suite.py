@@ -0,0 +1,334 @@
+"""The benchmarks, a timing helper and the comparison against a baseline.
+
+Every benchmark runs at each requested scale, a number of devices, on
+data from the generators. Tk benchmarks open real windows and are skipped,
+with the reason recorded, when Tk or a display is not available.
+"""
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from . import generators
+
+from core.cascade import CascadeEvaluator
+from core.interpolation import compile_library_tables
+from core.link_budget import Chain, LinkParameters, Stage, build_chain, build_stage, evaluate_chain, frequency_sweep
+from core.model import parse_device
+from core.parametric import ParametricIndex, parse_query
+from core.project_io import ProjectFile
+from core.search import DeviceSearchIndex
+from core.storage import FolderLibraryStore, JsonLibraryStore, SqliteLibraryStore
+
+# fewer repeats at larger scales keep a run short
+REPEATS = {1_000: 7, 10_000: 5, 100_000: 3}
+# typing "lna-0001" one key at a time
+TYPEAHEAD = ["l", "ln", "lna", "lna-", "lna-0", "lna-00", "lna-000", "lna-0001"]
+
+
+class Skipped(Exception):
+    """Raised by a benchmark that cannot run in this environment."""
+
+
+def measure(function, repeats, setup=None):
+    """Time function over repeats runs and return the min, median and all times in seconds.
+
+    setup, when given, runs untimed before each run and its result is passed to function.
+    """
+    times = []
+    for _ in range(repeats):
+        if setup is None:
+            start = time.perf_counter()
+            function()
+        else:
+            state = setup()
+            start = time.perf_counter()
+            function(state)
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "repeats": repeats}
+
+
+class Context:
+    """The generated data and scratch folder shared by the benchmarks of one scale."""
+    def __init__(self, scale, folder, seed=0):
+        self.scale = scale
+        self.folder = folder
+        self.repeats = REPEATS.get(scale, 3)
+        self.library = generators.generate_library(scale, seed)
+        self.library_path = os.path.join(folder, "device_library.json")
+        generators.write_json(self.library_path, self.library)
+        self.sqlite_path = os.path.join(folder, "device_library.sqlite")
+        store = SqliteLibraryStore(self.sqlite_path)
+        store.save_all(self.library)
+        store.close()
+        self.project_path = os.path.join(folder, "project.json")
+        generators.write_json(self.project_path, generators.generate_project(self.library, scale, seed))
+        self.tables, _ = compile_library_tables(self.library)
+
+
+def bench_library_load_json(context):
+    return measure(JsonLibraryStore(context.library_path).load, context.repeats)
+
+
+def bench_library_save_json(context):
+    store = JsonLibraryStore(os.path.join(context.folder, "saved.json"))
+    return measure(lambda: store.save_all(context.library), context.repeats)
+
+
+def bench_library_load_sqlite(context):
+    store = SqliteLibraryStore(context.sqlite_path)
+    try:
+        return measure(store.load, context.repeats)
+    finally:
+        store.close()
+
+
+def bench_device_upsert_sqlite(context):
+    store = SqliteLibraryStore(context.sqlite_path)
+    name, data = next(iter(context.library["devices"].items()))
+    try:
+        return measure(lambda: store.upsert(name, data), context.repeats)
+    finally:
+        store.close()
+
+
+def bench_device_upsert_folder(context):
+    store = FolderLibraryStore(os.path.join(context.folder, "device_library"))
+    if not os.path.exists(store.manifest_path):
+        store.save_all(context.library)
+    name, data = next(iter(context.library["devices"].items()))
+    return measure(lambda: store.upsert(name, data), context.repeats)
+
+
+def bench_compile_tables(context):
+    return measure(lambda: compile_library_tables(context.library), context.repeats)
+
+
+def bench_parse_devices(context):
+    devices = context.library["devices"]
+    tables = context.tables
+    return measure(lambda: [parse_device(name, parameters, tables.get(name, {})) for name, parameters in devices.items()],
+                   context.repeats)
+
+
+def bench_search_index_build(context):
+    return measure(lambda: DeviceSearchIndex(context.library["devices"]), context.repeats)
+
+
+def bench_search_typeahead(context):
+    def typeahead(index):
+        for query in TYPEAHEAD:
+            index.search(query)
+    return measure(typeahead, context.repeats, lambda: DeviceSearchIndex(context.library["devices"]))
+
+
+def bench_parametric_index_build(context):
+    return measure(lambda: ParametricIndex(context.library["devices"]), context.repeats)
+
+
+def bench_parametric_query(context):
+    index = ParametricIndex(context.library["devices"])
+    query = parse_query("lna 8.0-8.4GHz nf<1 gain>20")
+    return measure(lambda: index.query(**query), context.repeats)
+
+
+def bench_project_open(context):
+    def open_project():
+        with ProjectFile(context.project_path) as project:
+            devices = project.sequence("devices")
+            # what a first view needs: the head of the chain and the sweep
+            devices[:20]
+            project["sweep"]
+    return measure(open_project, context.repeats)
+
+
+def bench_project_chain_build(context):
+    def build():
+        with ProjectFile(context.project_path) as project:
+            build_chain(project, context.library, tables=context.tables)
+    return measure(build, context.repeats)
+
+
+def _sweep_chain(context):
+    antenna = build_stage("Dish", {"gain": 40, "efficiency": 80})
+    stages = [Stage(f"S{index}", "lna", 1.0 + index % 3, 50.0 + index) for index in range(20)]
+    link = LinkParameters(eirp_dbw=50.0, distance_m=3.6e7, required_cn0_dbhz=60.0)
+    return Chain(antenna, stages), frequency_sweep(1, 10, context.scale), link
+
+
+def bench_chain_evaluate(context):
+    chain, frequencies, link = _sweep_chain(context)
+    return measure(lambda: evaluate_chain(chain, frequencies, link), context.repeats)
+
+
+def bench_cascade_update(context):
+    chain, frequencies, link = _sweep_chain(context)
+
+    def setup():
+        evaluator = CascadeEvaluator(chain, frequencies, link)
+        evaluator.result()
+        return evaluator
+
+    def update(evaluator):
+        evaluator.update_device("S15", {"Gain": 10, "Noise_Figure": 1})
+        evaluator.result()
+    return measure(update, context.repeats, setup)
+
+
+def _gui(context):
+    """Return (tk, interface module, windows module, root, app) with the generated library loaded."""
+    try:
+        import tkinter as tk
+        from gui import link_engineering_interface, windows
+    except ImportError as e:
+        raise Skipped(f"GUI modules cannot be imported: {e}") from e
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise Skipped(f"no display: {e}") from e
+    root.withdraw()
+    cwd = os.getcwd()
+    os.chdir(context.folder)
+    try:
+        generators.write_json("preferences.json", {"devices_folder": context.folder, "library_backend": "json"})
+        app = link_engineering_interface.LinkEngineeringInterface(root)
+        while app.device_library_loading:
+            root.update()
+    finally:
+        os.chdir(cwd)
+    return tk, link_engineering_interface, windows, root, app
+
+
+def _close_when_idle(root, window_class, times, start):
+    """Destroy the newest window of a class once Tk is idle, recording the time it took to get there."""
+    def close():
+        times.append(time.perf_counter() - start[0])
+        for widget in reversed(list(root.winfo_children())):
+            if isinstance(widget, window_class):
+                widget.destroy()
+                return
+    root.after_idle(close)
+
+
+def bench_gui_startup(context):
+    tk, interface, _, root, app = _gui(context)
+    root.destroy()
+
+    def start():
+        root = tk.Tk()
+        root.withdraw()
+        cwd = os.getcwd()
+        os.chdir(context.folder)
+        try:
+            app = interface.LinkEngineeringInterface(root)
+            while app.device_library_loading:
+                root.update()
+        finally:
+            os.chdir(cwd)
+            root.destroy()
+    return measure(start, context.repeats)
+
+
+def bench_gui_listbox_refresh(context):
+    _, _, windows, root, app = _gui(context)
+    try:
+        window = windows.BrowseDeviceWindow(root, app)
+
+        def typeahead():
+            for query in TYPEAHEAD:
+                window.filter_var.set(query)
+                window.update_idletasks()
+            window.filter_var.set("")
+        return measure(typeahead, context.repeats)
+    finally:
+        root.destroy()
+
+
+def bench_gui_device_window_open(context):
+    _, _, windows, root, app = _gui(context)
+    name = next(name for name in app.device_library["devices"] if name.startswith("NESTED"))
+    times = []
+    start = [0.0]
+    try:
+        for _ in range(context.repeats):
+            start[0] = time.perf_counter()
+            _close_when_idle(root, windows.DeviceWindow, times, start)
+            windows.DeviceWindow(root, app, selected_device=name)
+        return {"min": min(times), "median": statistics.median(times), "repeats": len(times)}
+    finally:
+        root.destroy()
+
+
+BENCHMARKS = {
+    "library_load_json": bench_library_load_json,
+    "library_save_json": bench_library_save_json,
+    "library_load_sqlite": bench_library_load_sqlite,
+    "device_upsert_sqlite": bench_device_upsert_sqlite,
+    "device_upsert_folder": bench_device_upsert_folder,
+    "compile_tables": bench_compile_tables,
+    "parse_devices": bench_parse_devices,
+    "search_index_build": bench_search_index_build,
+    "search_typeahead": bench_search_typeahead,
+    "parametric_index_build": bench_parametric_index_build,
+    "parametric_query": bench_parametric_query,
+    "project_open": bench_project_open,
+    "project_chain_build": bench_project_chain_build,
+    "chain_evaluate": bench_chain_evaluate,
+    "cascade_update": bench_cascade_update,
+    "gui_startup": bench_gui_startup,
+    "gui_listbox_refresh": bench_gui_listbox_refresh,
+    "gui_device_window_open": bench_gui_device_window_open,
+}
+
+
+def run(scales, names=None, seed=0, report=None):
+    """Run the benchmarks at each scale and return the results document."""
+    results = {}
+    skipped = {}
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as folder:
+            context = Context(scale, folder, seed)
+            for name, benchmark in BENCHMARKS.items():
+                if names and name not in names:
+                    continue
+                key = f"{name}[{scale}]"
+                try:
+                    results[key] = benchmark(context)
+                except Skipped as e:
+                    skipped[key] = str(e)
+                if report is not None:
+                    report(key, results.get(key), skipped.get(key))
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "scales": list(scales), "seed": seed},
+            "results": results, "skipped": skipped}
+
+
+def compare(baseline, current, threshold=0.25, floor=1e-4):
+    """Return (name, baseline median, current median, ratio) for the benchmarks that got slower.
+
+    A benchmark regresses when its median grew by more than threshold, as a
+    fraction; medians under floor seconds are too noisy to judge.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None or max(reference["median"], result["median"]) < floor:
+            continue
+        ratio = result["median"] / max(reference["median"], 1e-12)
+        if ratio > 1.0 + threshold:
+            regressions.append((name, reference["median"], result["median"], ratio))
+    return regressions
+
+
+def load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save(path, document):
+    with open(path, "w") as f:
+        json.dump(document, f, indent=4)
@@ -0,0 +1,56 @@
+"""Tk-free core of the link engineering interface: models, storage and computation.
+
+Importing the package is cheap: its submodules, and NumPy with them, are
+only imported when one of the names below is first used, either as
+core.<name> or through the submodule itself.
+"""
+import importlib
+
+# public name -> submodule that defines it
+_EXPORTS = {
+    "Device": "model",
+    "DeviceSpec": "model",
+    "Project": "model",
+    "classify_device": "model",
+    "parse_device": "model",
+    "parse_scalar": "model",
+    "LinkBudgetError": "link_budget",
+    "LinkParameters": "link_budget",
+    "build_chain": "link_budget",
+    "evaluate_chain": "link_budget",
+    "frequency_sweep": "link_budget",
+    "sweep_from_json": "link_budget",
+    "CascadeEvaluator": "cascade",
+    "build_topology": "topology",
+    "evaluate_topology": "topology",
+    "compile_library_tables": "interpolation",
+    "JobScheduler": "jobs",
+    "DeviceSearchIndex": "search",
+    "ParametricIndex": "parametric",
+    "ProjectFile": "project_io",
+    "ProjectFormatError": "project_io",
+    "validate_library": "schema",
+    "load_prepared": "sidecar",
+    "StorageError": "storage",
+    "open_store": "storage",
+    "UnitError": "units",
+    "run_monte_carlo": "montecarlo",
+    "span": "tracing",
+    "tracer": "tracing",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
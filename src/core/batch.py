@@ -0,0 +1,243 @@
+"""Headless batch evaluation of many project files.
+
+Nothing here imports Tk. Each worker process loads the device library and
+compiles its tables once, then evaluates projects as they are handed out;
+results are written one row per project as they finish, so an interrupted
+run can be resumed by skipping the projects its output already holds.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .interpolation import compile_library_tables
+from .link_budget import LinkBudgetError, LinkParameters, build_chain, evaluate_chain, sweep_from_json
+from .project_io import ProjectFile, ProjectFormatError
+from .storage import BACKENDS, DEFAULT_BACKEND, JsonLibraryStore, SqliteLibraryStore, StorageError, open_store
+from .topology import build_topology, evaluate_topology
+from .units import UnitError
+
+# the columns of a result row, in output order
+FIELDS = ("project", "status", "error", "points", "min_margin_db", "worst_frequency_hz", "mean_margin_db",
+          "min_g_over_t_db", "max_noise_temperature_k", "min_cn0_dbhz", "elapsed_s")
+
+
+def find_projects(patterns):
+    """Return the sorted project files named by directories, glob patterns or paths."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(pattern, "*.json")))
+        else:
+            paths.update(glob.glob(pattern) or ([pattern] if os.path.exists(pattern) else []))
+    return sorted(os.path.normpath(path) for path in paths)
+
+
+def load_library(path, backend=None):
+    """Load a device library from a devices folder, a device_library.json or a SQLite library file."""
+    if os.path.isdir(path):
+        # a batch run only reads, so it never migrates the folder it is pointed at
+        store = open_store(path, backend or DEFAULT_BACKEND, migrate=False)
+    elif path.endswith(".sqlite") or backend == "sqlite":
+        store = SqliteLibraryStore(path)
+    else:
+        store = JsonLibraryStore(path)
+    try:
+        return store.load()
+    finally:
+        store.close()
+
+
+def evaluate_project(path, library, tables):
+    """Evaluate one project file into a result row; failures become rows with an error."""
+    start = time.perf_counter()
+    row = dict.fromkeys(FIELDS)
+    row["project"] = path
+    try:
+        with ProjectFile(path) as data:
+            if "sweep" not in data:
+                raise LinkBudgetError("project has no sweep")
+            # an empty chain or a misshapen section would otherwise evaluate to a made up G/T
+            if not data.get("devices"):
+                raise LinkBudgetError("project has no devices")
+            for section in ("sweep", "link"):
+                if not isinstance(data.get(section, {}), dict):
+                    raise LinkBudgetError(f"project {section} must be an object")
+            frequencies = sweep_from_json(data["sweep"])
+            link = LinkParameters.from_json(data.get("link", {}))
+            if "connections" in data:
+                # a station graph is reported by its worst receive path; the pool already uses every CPU
+                result = evaluate_topology(build_topology(data, library, tables=tables), frequencies, link,
+                                           workers=1).worst()
+                if result is None:
+                    raise LinkBudgetError("project has no receive paths")
+            else:
+                result = evaluate_chain(build_chain(data, library, tables=tables), frequencies, link)
+        row["points"] = int(np.size(frequencies))
+        row["min_g_over_t_db"] = float(np.min(result.g_over_t_db))
+        row["max_noise_temperature_k"] = float(np.max(result.noise_temperature))
+        if result.cn0_dbhz is not None:
+            row["min_cn0_dbhz"] = float(np.min(result.cn0_dbhz))
+        if result.margin_db is not None:
+            margin = np.broadcast_to(result.margin_db, np.shape(frequencies))
+            worst = int(np.argmin(margin))
+            row["min_margin_db"] = float(margin.flat[worst])
+            row["worst_frequency_hz"] = float(np.ravel(frequencies)[worst])
+            row["mean_margin_db"] = float(np.mean(margin))
+        row["status"] = "ok"
+    except (OSError, ProjectFormatError, LinkBudgetError, UnitError, KeyError, TypeError, ValueError) as e:
+        row["status"] = "error"
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["elapsed_s"] = round(time.perf_counter() - start, 6)
+    return row
+
+
+# the library of a worker process, loaded once by _initialize_worker
+_worker_library = None
+_worker_tables = None
+
+
+def _initialize_worker(library_path, backend):
+    global _worker_library, _worker_tables
+    _worker_library = load_library(library_path, backend)
+    _worker_tables, _ = compile_library_tables(_worker_library)
+
+
+def _evaluate_in_worker(path):
+    return evaluate_project(path, _worker_library, _worker_tables)
+
+
+class ResultWriter:
+    """Appends result rows to a CSV or JSON lines file, flushing each row as it is written.
+
+    When resuming, a last line cut short by an interruption is dropped and
+    the projects already in the file are reported by done().
+    """
+    def __init__(self, path, output_format=None, resume=False):
+        self.path = path
+        self.format = output_format or ("csv" if path.endswith(".csv") else "jsonl")
+        if self.format not in ("csv", "jsonl"):
+            raise ValueError(f"Unknown output format: {self.format!r}")
+        self._done = set()
+        exists = resume and os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            self._truncate_partial_line()
+            self._done = self._read_done()
+        self._file = open(path, "a" if exists else "w", newline="")
+        if self.format == "csv":
+            self._csv = csv.DictWriter(self._file, FIELDS)
+            if not exists or os.path.getsize(path) == 0:
+                self._csv.writeheader()
+
+    def _truncate_partial_line(self):
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _read_done(self):
+        with open(self.path, "r", newline="") as f:
+            if self.format == "csv":
+                return {row["project"] for row in csv.DictReader(f) if row.get("project")}
+            return {json.loads(line)["project"] for line in f if line.strip()}
+
+    def done(self):
+        """Return the projects that already have a row."""
+        return set(self._done)
+
+    def write(self, row):
+        if self.format == "csv":
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+        self._done.add(row["project"])
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(projects, library_path, output, backend=None, workers=None, output_format=None, resume=False,
+              progress=None):
+    """Evaluate projects across a worker pool, streaming rows to output as they finish.
+
+    Returns the (evaluated, failed, skipped) counts. With resume, projects
+    already in output are skipped. progress, when given, is called with
+    each row.
+    """
+    writer = ResultWriter(output, output_format, resume)
+    done = writer.done()
+    pending = [path for path in projects if path not in done]
+    evaluated = failed = 0
+    try:
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(pending) <= 1:
+            _initialize_worker(library_path, backend)
+            rows = map(_evaluate_in_worker, pending)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                                           initargs=(library_path, backend))
+            rows = (future.result() for future in as_completed([executor.submit(_evaluate_in_worker, path)
+                                                                 for path in pending]))
+        try:
+            for row in rows:
+                writer.write(row)
+                evaluated += 1
+                failed += row["status"] != "ok"
+                if progress is not None:
+                    progress(row)
+        finally:
+            if executor is not None:
+                # an interrupted run stops handing out projects; finished rows are already on disk
+                executor.shutdown(cancel_futures=True)
+    finally:
+        writer.close()
+    return evaluated, failed, len(projects) - len(pending)
+
+
+def main(argv=None):
+    """Command line entry point; returns the process exit status."""
+    parser = argparse.ArgumentParser(description="Evaluate link engineering projects without a GUI.")
+    parser.add_argument("projects", nargs="+", help="project files, directories of projects or glob patterns")
+    parser.add_argument("-l", "--library", required=True,
+                        help="devices folder, device_library.json or device_library.sqlite")
+    parser.add_argument("-o", "--output", required=True, help="result file, .csv or .jsonl")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="output format, by default from the extension")
+    parser.add_argument("--backend", choices=BACKENDS, help="library backend of a devices folder")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes, default one per CPU")
+    parser.add_argument("--resume", action="store_true", help="skip projects already in the output file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not report progress on stderr")
+    arguments = parser.parse_args(argv)
+
+    projects = find_projects(arguments.projects)
+    if not projects:
+        parser.error("no project files found")
+    total = len(projects)
+    count = [0]
+
+    def report(row):
+        count[0] += 1
+        status = row["status"] if row["status"] == "ok" else f"error: {row['error']}"
+        print(f"[{count[0]}/{total}] {row['project']}: {status}", file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        evaluated, failed, skipped = run_batch(projects, arguments.library, arguments.output, arguments.backend,
+                                               arguments.workers, arguments.format, arguments.resume,
+                                               None if arguments.quiet else report)
+    except (OSError, StorageError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("interrupted; rerun with --resume to continue", file=sys.stderr)
+        return 130
+    print(f"{evaluated} evaluated, {failed} failed, {skipped} skipped in {time.perf_counter() - start:.1f} s",
+          file=sys.stderr)
+    return 1 if failed else 0
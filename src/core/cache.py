@@ -0,0 +1,298 @@
+"""A content addressed cache of evaluation results.
+
+Results are keyed by a hash of everything they were computed from: the
+parameters of the devices involved, the sweep and the link or analysis
+settings. An edited device therefore gets new keys by itself; entries are
+also indexed by device so an edit frees the results that used it right
+away. Entries live in a size bounded in-memory LRU and, optionally, in a
+folder on disk where they survive reopening the project. The disk store
+keeps its own index of the keys written for each device, so an edit frees
+them there too, even after a restart.
+
+The disk store holds pickles, so it should only point at a trusted folder.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .link_budget import LinkBudgetError, device_parameters
+
+# bump to orphan disk entries written by an older result format
+CACHE_FORMAT = 1
+DISK_SUFFIX = ".pickle"
+# the disk store's per-device key lists live in this subfolder, one file per device
+INDEX_FOLDER = "devices"
+INDEX_SUFFIX = ".keys"
+
+
+def _encode(value):
+    """json default for the values that can appear in a key."""
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value)
+        return {"array": hashlib.sha256(data.tobytes()).hexdigest(), "dtype": str(data.dtype), "shape": data.shape}
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "__dict__"):
+        return {"type": type(value).__name__, "state": vars(value)}
+    raise TypeError(f"Cannot hash a {type(value).__name__} into a cache key")
+
+
+def content_hash(*parts):
+    """Return a stable hex digest of json-like parts, NumPy arrays and plain objects."""
+    text = json.dumps([CACHE_FORMAT, parts], sort_keys=True, separators=(",", ":"), default=_encode)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def evaluation_key(kind, devices, library=None, *settings):
+    """Return (key, device names) for an evaluation of kind over project devices with settings.
+
+    Library references are resolved, so the key changes when a referenced
+    library device is edited.
+    """
+    names = []
+    parameters = []
+    for device in devices:
+        name = device.name if hasattr(device, "name") else device["name"]
+        try:
+            parameters.append([name, device_parameters(device, library)])
+        except LinkBudgetError:
+            parameters.append([name, None])
+        names.append(name)
+    return content_hash(kind, parameters, settings), names
+
+
+class ResultCache:
+    """An LRU of results bounded by their pickled size, with an optional disk store.
+
+    max_bytes bounds the memory entries and max_disk_bytes the folder; the
+    oldest disk entries are removed once it grows past that. The cache can
+    be shared between threads.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, folder=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.folder = folder
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._dependents = {}
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """Return the result stored under key, looking on disk after memory."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        data = self._read(key)
+        if data is not None:
+            try:
+                devices, value = pickle.loads(data)
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+                # a damaged or outdated entry is a miss and is removed
+                self._remove_file(key)
+                data = None
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.disk_hits += 1
+            self._store(key, value, len(data), devices)
+        return value
+
+    def put(self, key, value, devices=()):
+        """Store a result that depends on the named devices."""
+        devices = tuple(devices)
+        # the disk entry keeps its dependencies so an invalidation reaches it after a reload too
+        data = pickle.dumps((devices, value), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(key, value, len(data), devices)
+        if self._write(key, data):
+            self._index(key, devices)
+
+    def get_or_compute(self, key, compute, devices=()):
+        """Return the result under key, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value, devices)
+        return value
+
+    def invalidate_device(self, name):
+        """Drop the results that depend on a device, in memory and on disk; returns how many were dropped."""
+        with self._lock:
+            keys = self._dependents.pop(name, set())
+            for key in keys:
+                self._drop(key)
+        # entries written before a restart are only known to the disk index
+        removed = {key for key in keys | self._indexed(name) if self._remove_file(key)}
+        with self._lock:
+            dropped = len(keys | removed)
+            self.invalidations += dropped
+        return dropped
+
+    def clear(self):
+        """Drop every memory entry; the disk store is kept."""
+        with self._lock:
+            self._entries.clear()
+            self._dependents.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return the hit, miss, eviction and size counters."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "invalidations": self.invalidations,
+                    "entries": len(self._entries), "bytes": self._bytes, "disk_bytes": self._disk_bytes}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _store(self, key, value, size, devices):
+        # called with the lock held
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, devices)
+        self._bytes += size
+        for name in devices:
+            self._dependents.setdefault(name, set()).add(key)
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        # called with the lock held
+        _, size, devices = self._entries.pop(key)
+        self._bytes -= size
+        for name in devices:
+            dependents = self._dependents.get(name)
+            if dependents is not None:
+                dependents.discard(key)
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + DISK_SUFFIX)
+
+    def _read(self, key):
+        if self.folder is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, key, data):
+        """Write an entry to the disk store and return True if it was written."""
+        if self.folder is None or len(data) > self.max_disk_bytes:
+            return False
+        os.makedirs(self.folder, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=DISK_SUFFIX, dir=self.folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_bytes += len(data)
+            prune = self._disk_bytes > self.max_disk_bytes
+        if prune:
+            self._prune_disk()
+        return True
+
+    def _index_path(self, name):
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        return os.path.join(self.folder, INDEX_FOLDER, digest + INDEX_SUFFIX)
+
+    def _index(self, key, devices):
+        """Add a disk entry's key to the index of each device it depends on."""
+        for name in devices:
+            path = self._index_path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # appends of one short line do not interleave, so other processes can index at the same time
+            with open(path, "a") as f:
+                f.write(key + "\n")
+
+    def _indexed(self, name):
+        """Remove a device's disk index and return the keys it listed."""
+        if self.folder is None:
+            return set()
+        path = self._index_path(name)
+        try:
+            with open(path, "r") as f:
+                keys = set(f.read().split())
+            os.remove(path)
+        except OSError:
+            return set()
+        return keys
+
+    def _disk_entries(self):
+        """Return (modification time, size, path) of the files in the disk store."""
+        entries = []
+        with os.scandir(self.folder) as scan:
+            for entry in scan:
+                if entry.name.endswith(DISK_SUFFIX) and not entry.name.startswith(".tmp-"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _prune_disk(self):
+        """Remove the oldest disk entries until the store is back under three quarters of its limit."""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes * 0.75:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def _remove_file(self, key):
+        """Remove an entry from the disk store and return True if there was one."""
+        if self.folder is None:
+            return False
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return False
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+        return True
+
+
+# marks a miss in get_or_compute, where None is a valid result
+_MISSING = object()
@@ -0,0 +1,141 @@
+"""Incremental evaluation of a device chain that keeps per-stage partial results.
+
+The cascade is a running sum: the gain and input referred noise through
+stage i only depend on stages 0..i. The evaluator keeps those prefix
+results for a fixed sweep, and when one stage changes it recomputes only the
+suffix from that stage onwards, reusing everything ahead of it.
+"""
+import numpy as np
+
+from .link_budget import (
+    Antenna, Chain, LinkBudgetError, LinkParameters, REFERENCE_TEMPERATURE, build_stage, finish_result)
+from .units import db_to_linear
+
+
+class CascadeEvaluator:
+    """Evaluate a chain over a fixed sweep, recomputing only invalidated stages."""
+    def __init__(self, chain, frequencies, link=None, physical_temperature=REFERENCE_TEMPERATURE):
+        self.chain = chain
+        self.frequencies = np.asarray(frequencies, dtype=float)
+        self.link = link if link is not None else LinkParameters()
+        self.physical_temperature = physical_temperature
+        self._allocate()
+        # number of stages evaluated since construction, useful to check how much work an edit cost
+        self.stages_evaluated = 0
+
+    def _allocate(self):
+        """Allocate the per-stage arrays and invalidate everything."""
+        shape = (len(self.chain.stages),) + self.frequencies.shape
+        self._gain_db = np.zeros(shape)
+        self._temperature = np.zeros(shape)
+        self._cumulative_gain_db = np.zeros(shape)
+        self._receiver_temperature = np.zeros(shape)
+        self._stage_valid = [False] * len(self.chain.stages)
+        self._valid = 0
+        self._result = None
+
+    def invalidate(self, index):
+        """Mark stage index and everything downstream of it as out of date."""
+        self._stage_valid[index] = False
+        self._valid = min(self._valid, index)
+        self._result = None
+
+    def replace_stage(self, index, stage):
+        """Swap one stage for another, invalidating the suffix from it."""
+        self.chain.stages[index] = stage
+        self.invalidate(index)
+
+    def insert_stage(self, index, stage):
+        """Insert a stage into the chain; the prefix ahead of it is kept."""
+        self.chain.stages.insert(index, stage)
+        self._grow(index, insert=True)
+
+    def remove_stage(self, index):
+        """Remove a stage from the chain; the prefix ahead of it is kept."""
+        del self.chain.stages[index]
+        self._grow(index, insert=False)
+
+    def _grow(self, index, insert):
+        """Resize the per-stage arrays around index, keeping the valid prefix."""
+        arrays = (self._gain_db, self._temperature, self._cumulative_gain_db, self._receiver_temperature)
+        if insert:
+            arrays = [np.insert(array, index, 0.0, axis=0) for array in arrays]
+            self._stage_valid.insert(index, False)
+        else:
+            arrays = [np.delete(array, index, axis=0) for array in arrays]
+            del self._stage_valid[index]
+        self._gain_db, self._temperature, self._cumulative_gain_db, self._receiver_temperature = arrays
+        self._valid = min(self._valid, index)
+        self._result = None
+
+    def update_device(self, name, parameters, tables=None):
+        """Rebuild every stage built from the named device and return True if any was affected.
+
+        Editing the antenna only invalidates the final combination, since the
+        antenna is not part of the cascade. A device that turns from an
+        antenna into a two-port or back changes the chain's shape, so the
+        chain is rebuilt and evaluated from scratch.
+        """
+        antenna = self.chain.antenna
+        elements = ([antenna] if antenna is not None else []) + self.chain.stages
+        if not any(element.name == name for element in elements):
+            return False
+        rebuilt = build_stage(name, parameters, self.physical_temperature, tables)
+        if any(element.name == name and isinstance(element, Antenna) != isinstance(rebuilt, Antenna)
+               for element in elements):
+            elements = [rebuilt if element.name == name else element for element in elements]
+            for index, element in enumerate(elements):
+                if isinstance(element, Antenna) and index != 0:
+                    raise LinkBudgetError(f"Antenna {element.name!r} must be the first device in the chain")
+            if elements and isinstance(elements[0], Antenna):
+                self.chain = Chain(elements[0], elements[1:])
+            else:
+                self.chain = Chain(None, elements)
+            self._allocate()
+            return True
+        if antenna is not None and antenna.name == name:
+            self.chain.antenna = rebuilt
+            self._result = None
+        for index, stage in enumerate(self.chain.stages):
+            if stage.name == name:
+                self.replace_stage(index, rebuilt)
+        return True
+
+    def set_link(self, link):
+        """Change the link parameters; the cascade itself stays valid."""
+        self.link = link
+        self._result = None
+
+    def result(self):
+        """Return the ChainResult, evaluating only the stages that are out of date."""
+        if self._result is not None:
+            return self._result
+        for index in range(self._valid, len(self.chain.stages)):
+            if not self._stage_valid[index]:
+                stage = self.chain.stages[index]
+                self._gain_db[index] = stage.gain_db(self.frequencies)
+                self._temperature[index] = stage.noise_temperature(self.frequencies)
+                self._stage_valid[index] = True
+                self.stages_evaluated += 1
+            if index == 0:
+                self._cumulative_gain_db[index] = self._gain_db[index]
+                self._receiver_temperature[index] = self._temperature[index]
+            else:
+                gain_ahead_db = self._cumulative_gain_db[index - 1]
+                self._cumulative_gain_db[index] = gain_ahead_db + self._gain_db[index]
+                self._receiver_temperature[index] = (self._receiver_temperature[index - 1]
+                                                     + self._temperature[index] / db_to_linear(gain_ahead_db))
+        self._valid = len(self.chain.stages)
+        if self._stage_valid:
+            receiver_temperature = self._receiver_temperature[-1].copy()
+        else:
+            receiver_temperature = np.zeros(self.frequencies.shape)
+        self._result = finish_result(self.chain, self.frequencies, self.link, self._gain_db.copy(),
+                                     self._cumulative_gain_db.copy(), receiver_temperature)
+        return self._result
+
+    def stage_results(self, index):
+        """Return the (cumulative gain dB, input referred noise temperature) through stage index."""
+        self.result()
+        return self._cumulative_gain_db[index], self._receiver_temperature[index]
+
@@ -0,0 +1,139 @@
+"""Min/max decimation of long series for drawing.
+
+A line drawn over w pixel columns can show at most the minimum and the
+maximum of the points falling in each column. MinMaxPyramid keeps the
+minimum and maximum of blocks of factor**k points for every level k, so a
+view of any part of a series at any width is reduced from a few blocks
+per column of the finest level coarser than half a column, however long
+the series. Appending points recomputes only the last block of each
+level, so a series streamed in chunks stays ready to draw at a cost
+proportional to the points appended.
+
+x must be ascending, like the frequencies of a sweep or the times of a
+pass. NaN values, such as steps without a result, are ignored by the
+minimum and maximum; a column of only NaN stays NaN and is drawn as a gap.
+"""
+import numpy as np
+
+# the number of blocks of one level reduced into a block of the next
+FACTOR = 4
+
+
+class _Growable:
+    """A float array with spare capacity at its end, so appending is amortized O(1) per value."""
+    __slots__ = ("data", "size")
+
+    def __init__(self):
+        self.data = np.empty(16)
+        self.size = 0
+
+    def view(self):
+        return self.data[:self.size]
+
+    def truncate(self, size):
+        self.size = size
+
+    def extend(self, values):
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.empty(max(needed, 2 * len(self.data)))
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = values
+        self.size = needed
+
+
+class MinMaxPyramid:
+    """A series with the minimum and maximum of its blocks precomputed at every level of detail."""
+    def __init__(self, x=(), y=(), factor=FACTOR):
+        self.factor = factor
+        self._x = _Growable()
+        self._y = _Growable()
+        # level k holds the first x, the minimum and the maximum of blocks of factor**(k + 1) points
+        self._levels = []
+        self.append(x, y)
+
+    @property
+    def x(self):
+        return self._x.view()
+
+    @property
+    def y(self):
+        return self._y.view()
+
+    def __len__(self):
+        return self._x.size
+
+    def append(self, x, y):
+        """Add points at the end of the series; their x must not be below the last one."""
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+        if len(x) != len(y):
+            raise ValueError(f"x has {len(x)} values but y has {len(y)}")
+        if not len(x):
+            return
+        if np.any(np.diff(x) < 0) or (len(self) and x[0] < self._x.data[self._x.size - 1]):
+            raise ValueError("x must be ascending")
+        start = len(self)
+        self._x.extend(x)
+        self._y.extend(y)
+        self._update(start)
+
+    def _update(self, start):
+        """Recompute the blocks of every level from the one holding the point at start on."""
+        lower_x, lower_min, lower_max = self.x, self.y, self.y
+        level = 0
+        while len(lower_x) > self.factor:
+            if level == len(self._levels):
+                self._levels.append((_Growable(), _Growable(), _Growable()))
+            xs, mins, maxs = self._levels[level]
+            first = start // self.factor
+            offset = first * self.factor
+            starts = np.arange(0, len(lower_x) - offset, self.factor)
+            for array in (xs, mins, maxs):
+                array.truncate(first)
+            xs.extend(lower_x[offset:][starts])
+            mins.extend(np.fmin.reduceat(lower_min[offset:], starts))
+            maxs.extend(np.fmax.reduceat(lower_max[offset:], starts))
+            lower_x, lower_min, lower_max = xs.view(), mins.view(), maxs.view()
+            start = first
+            level += 1
+
+    def bounds(self):
+        """Return (x min, x max, y min, y max) of the whole series, or None when it is empty."""
+        if not len(self):
+            return None
+        mins, maxs = (self._levels[-1][1].view(), self._levels[-1][2].view()) if self._levels else (self.y, self.y)
+        finite = np.isfinite(mins)
+        if not finite.any():
+            return self.x[0], self.x[-1], np.nan, np.nan
+        return self.x[0], self.x[-1], float(np.min(mins[finite])), float(np.max(maxs[np.isfinite(maxs)]))
+
+    def decimate(self, x0, x1, width):
+        """Return the (x, y) polyline drawing the series between x0 and x1 across width pixel columns.
+
+        With at most two points per column the points themselves are
+        returned; otherwise each column gives its minimum and maximum at the
+        column's centre. One point beyond each end of the range is included
+        so the line reaches the edges.
+        """
+        x = self.x
+        width = max(int(width), 1)
+        i0 = max(int(np.searchsorted(x, x0, "left")) - 1, 0)
+        i1 = min(int(np.searchsorted(x, x1, "right")) + 1, len(x))
+        count = i1 - i0
+        if count <= 2 * width or x1 <= x0:
+            return x[i0:i1], self.y[i0:i1]
+        # the coarsest level with at least two blocks per column, so a block seldom spans two columns
+        level = min(int(np.log(count / (2 * width)) / np.log(self.factor)), len(self._levels))
+        if level == 0:
+            xs, mins, maxs = x[i0:i1], self.y[i0:i1], self.y[i0:i1]
+        else:
+            size = self.factor ** level
+            b0, b1 = i0 // size, -(-i1 // size)
+            xs, mins, maxs = (array.view()[b0:b1] for array in self._levels[level - 1])
+        columns = np.clip(np.floor((xs - x0) * (width / (x1 - x0))), 0, width - 1)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(columns)) + 1))
+        column_x = x0 + (columns[starts] + 0.5) * ((x1 - x0) / width)
+        column_y = np.column_stack((np.fmin.reduceat(mins, starts), np.fmax.reduceat(maxs, starts)))
+        return np.repeat(column_x, 2), column_y.ravel()
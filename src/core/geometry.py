@@ -0,0 +1,308 @@
+"""Pass geometry from a located ground station to a moving target.
+
+Positions are Earth centred, Earth fixed (ECEF) coordinates on the WGS84
+ellipsoid. A target trajectory is either an ephemeris table or a
+Keplerian orbit propagated analytically. The geometry of a whole pass,
+slant range, azimuth, elevation and range rate, is computed as arrays over
+every time step at once, and evaluate_pass feeds it to the link budget so
+a margin versus time curve costs one chain evaluation.
+"""
+import copy
+
+import numpy as np
+
+from .link_budget import LinkBudgetError, evaluate_chain, free_space_path_loss
+from .units import SPEED_OF_LIGHT, angle_to_rad, distance_to_m, frequency_to_hz, quantity, unit_of
+
+# WGS84 semi-major axis in meters and first eccentricity squared
+WGS84_A = 6378137.0
+WGS84_F = 1.0 / 298.257223563
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)
+# Earth's gravitational parameter in m^3/s^2 and rotation rate in rad/s
+EARTH_MU = 3.986004418e14
+EARTH_ROTATION = 7.2921150e-5
+# scale factors of time units to seconds
+TIME_UNITS = {"s": 1.0, "sec": 1.0, "min": 60.0, "h": 3600.0, "hour": 3600.0, "d": 86400.0, "day": 86400.0}
+# time steps evaluated at once when a pass is streamed in chunks
+PASS_CHUNK_SIZE = 100_000
+
+
+def geodetic_to_ecef(latitude, longitude, altitude=0.0):
+    """Return the ECEF position in meters of geodetic coordinates in radians and meters."""
+    sin_lat = np.sin(latitude)
+    prime_vertical = WGS84_A / np.sqrt(1.0 - WGS84_E2 * sin_lat ** 2)
+    horizontal = (prime_vertical + altitude) * np.cos(latitude)
+    return np.stack([horizontal * np.cos(longitude), horizontal * np.sin(longitude),
+                     (prime_vertical * (1.0 - WGS84_E2) + altitude) * sin_lat], axis=-1)
+
+
+def enu_rotation(latitude, longitude):
+    """Return the matrix turning ECEF offsets into east, north, up components at a location."""
+    sin_lat, cos_lat = np.sin(latitude), np.cos(latitude)
+    sin_lon, cos_lon = np.sin(longitude), np.cos(longitude)
+    return np.array([[-sin_lon, cos_lon, 0.0],
+                     [-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat],
+                     [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat]])
+
+
+def _time_to_s(value, unit="s"):
+    try:
+        scale = TIME_UNITS[str(unit).strip().lower()]
+    except KeyError:
+        raise LinkBudgetError(f"Unknown time unit: {unit!r}") from None
+    return np.asarray(value, dtype=float) * scale
+
+
+class Ephemeris:
+    """A target trajectory given as a table of ECEF positions, and optionally velocities, over time.
+
+    Times are in seconds and positions in meters; positions between table
+    rows are interpolated linearly. Without velocities they are estimated
+    from the positions.
+    """
+    def __init__(self, times, positions, velocities=None):
+        self.times = np.asarray(times, dtype=float)
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        if len(self.times) != len(self.positions) or len(self.times) < 2:
+            raise LinkBudgetError("An ephemeris needs at least two times, each with a position")
+        if np.any(np.diff(self.times) <= 0):
+            raise LinkBudgetError("Ephemeris times must increase")
+        if velocities is None:
+            velocities = np.gradient(self.positions, self.times, axis=0)
+        self.velocities = np.asarray(velocities, dtype=float).reshape(-1, 3)
+
+    @classmethod
+    def from_json(cls, data):
+        """Build an ephemeris from {'times', 'positions', optional 'velocities', 'unit', 'time_unit'}."""
+        unit = unit_of(data, "m")
+        times = _time_to_s(data["times"], data.get("time_unit", "s"))
+        velocities = data.get("velocities")
+        if velocities is not None:
+            velocities = distance_to_m(velocities, unit)
+        return cls(times, distance_to_m(data["positions"], unit), velocities)
+
+    def state(self, times=None):
+        """Return ECEF (positions, velocities) at times in seconds, the table's own times by default."""
+        if times is None:
+            return self.positions, self.velocities
+        times = np.asarray(times, dtype=float)
+        positions = np.stack([np.interp(times, self.times, self.positions[:, axis]) for axis in range(3)], axis=-1)
+        velocities = np.stack([np.interp(times, self.times, self.velocities[:, axis]) for axis in range(3)], axis=-1)
+        return positions, velocities
+
+
+class KeplerianOrbit:
+    """A two body orbit from classical elements, angles in radians and the semi-major axis in meters.
+
+    mean_anomaly is the mean anomaly at time 0 and gmst the Greenwich
+    sidereal angle at time 0, which fixes where the Earth has turned.
+    """
+    def __init__(self, semi_major_axis, eccentricity=0.0, inclination=0.0, raan=0.0, argument_of_perigee=0.0,
+                 mean_anomaly=0.0, gmst=0.0):
+        if semi_major_axis <= 0 or not 0.0 <= eccentricity < 1.0:
+            raise LinkBudgetError("A Keplerian orbit needs a positive semi-major axis and an eccentricity in [0, 1)")
+        self.semi_major_axis = semi_major_axis
+        self.eccentricity = eccentricity
+        self.inclination = inclination
+        self.raan = raan
+        self.argument_of_perigee = argument_of_perigee
+        self.mean_anomaly = mean_anomaly
+        self.gmst = gmst
+
+    @classmethod
+    def from_json(cls, data):
+        """Build an orbit from a project's 'orbit' section; angles default to degrees.
+
+        The size of the orbit is a 'semi_major_axis' or, for a circular
+        orbit, an 'altitude' above the equatorial radius.
+        """
+        if "semi_major_axis" in data:
+            value, unit = quantity(data["semi_major_axis"], "m")
+            semi_major_axis = float(distance_to_m(value, unit))
+        elif "altitude" in data:
+            value, unit = quantity(data["altitude"], "m")
+            semi_major_axis = WGS84_A + float(distance_to_m(value, unit))
+        else:
+            raise LinkBudgetError("An orbit needs a semi_major_axis or an altitude")
+
+        def angle(key):
+            value, unit = quantity(data.get(key, 0.0), "deg")
+            return float(angle_to_rad(value, unit))
+        return cls(semi_major_axis, float(data.get("eccentricity", 0.0)), angle("inclination"), angle("raan"),
+                   angle("argument_of_perigee"), angle("mean_anomaly"), angle("gmst"))
+
+    @property
+    def period(self):
+        """The orbital period in seconds."""
+        return 2.0 * np.pi * np.sqrt(self.semi_major_axis ** 3 / EARTH_MU)
+
+    def state(self, times):
+        """Return ECEF (positions, velocities) at times in seconds."""
+        times = np.asarray(times, dtype=float)
+        a, e = self.semi_major_axis, self.eccentricity
+        motion = np.sqrt(EARTH_MU / a ** 3)
+        mean_anomaly = self.mean_anomaly + motion * times
+        # Kepler's equation by Newton's method, on every time step at once
+        eccentric = mean_anomaly if e < 0.8 else np.full_like(mean_anomaly, np.pi)
+        for _ in range(30):
+            step = (eccentric - e * np.sin(eccentric) - mean_anomaly) / (1.0 - e * np.cos(eccentric))
+            eccentric = eccentric - step
+            if np.max(np.abs(step), initial=0.0) < 1e-12:
+                break
+        cos_e, sin_e = np.cos(eccentric), np.sin(eccentric)
+        root = np.sqrt(1.0 - e * e)
+        # position and velocity in the orbital plane, x towards perigee
+        x, y = a * (cos_e - e), a * root * sin_e
+        rate = a * motion / (1.0 - e * cos_e)
+        vx, vy = -rate * sin_e, rate * root * cos_e
+        sin_o, cos_o = np.sin(self.raan), np.cos(self.raan)
+        sin_w, cos_w = np.sin(self.argument_of_perigee), np.cos(self.argument_of_perigee)
+        sin_i, cos_i = np.sin(self.inclination), np.cos(self.inclination)
+        p = np.array([cos_o * cos_w - sin_o * sin_w * cos_i, sin_o * cos_w + cos_o * sin_w * cos_i, sin_w * sin_i])
+        q = np.array([-cos_o * sin_w - sin_o * cos_w * cos_i, -sin_o * sin_w + cos_o * cos_w * cos_i, cos_w * sin_i])
+        positions = x[..., None] * p + y[..., None] * q
+        velocities = vx[..., None] * p + vy[..., None] * q
+        # turn with the Earth into ECEF; the frame's rotation adds -omega x r to the velocity
+        theta = self.gmst + EARTH_ROTATION * times
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+        ecef = np.stack([cos_t * positions[..., 0] + sin_t * positions[..., 1],
+                         -sin_t * positions[..., 0] + cos_t * positions[..., 1], positions[..., 2]], axis=-1)
+        ecef_velocities = np.stack([cos_t * velocities[..., 0] + sin_t * velocities[..., 1]
+                                    + EARTH_ROTATION * ecef[..., 1],
+                                    -sin_t * velocities[..., 0] + cos_t * velocities[..., 1]
+                                    - EARTH_ROTATION * ecef[..., 0], velocities[..., 2]], axis=-1)
+        return ecef, ecef_velocities
+
+
+class PassGeometry:
+    """The look angles and range from a station to a target over time.
+
+    Angles are in radians, the range in meters and the range rate in
+    meters per second, positive while the target recedes.
+    """
+    def __init__(self, times, azimuth, elevation, range_m, range_rate):
+        self.times = times
+        self.azimuth = azimuth
+        self.elevation = elevation
+        self.range_m = range_m
+        self.range_rate = range_rate
+
+    def doppler_hz(self, frequency_hz):
+        """Return the Doppler shift of a carrier received at the station."""
+        return -np.asarray(frequency_hz, dtype=float) * self.range_rate / SPEED_OF_LIGHT
+
+    def path_loss_db(self, frequency_hz):
+        """Return the free space path loss along the pass."""
+        return free_space_path_loss(self.range_m, frequency_hz)
+
+    def visible(self, min_elevation=0.0):
+        """Return a mask of the time steps with the target above min_elevation radians."""
+        return self.elevation >= min_elevation
+
+    def windows(self, min_elevation=0.0):
+        """Return the (start, stop) index ranges in which the target is visible."""
+        edges = np.diff(np.concatenate(([0], self.visible(min_elevation).astype(np.int8), [0])))
+        return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def pass_geometry(location, trajectory, times=None):
+    """Compute the geometry from a station at a Location to a trajectory at times in seconds.
+
+    times may be left out for an ephemeris, whose own table times are then used.
+    """
+    if times is None and isinstance(trajectory, KeplerianOrbit):
+        raise LinkBudgetError("A Keplerian orbit needs the times to propagate to")
+    positions, velocities = trajectory.state(times)
+    if times is None:
+        times = trajectory.times
+    station = geodetic_to_ecef(location.latitude, location.longitude, location.altitude)
+    offsets = positions - station
+    range_m = np.sqrt(np.einsum("...i,...i->...", offsets, offsets))
+    # the station is fixed in ECEF, so the range rate is the target velocity along the line of sight
+    range_rate = np.einsum("...i,...i->...", offsets, velocities) / range_m
+    east, north, up = np.moveaxis(offsets @ enu_rotation(location.latitude, location.longitude).T, -1, 0)
+    azimuth = np.mod(np.arctan2(east, north), 2.0 * np.pi)
+    elevation = np.arctan2(up, np.hypot(east, north))
+    return PassGeometry(np.asarray(times, dtype=float), azimuth, elevation, range_m, range_rate)
+
+
+def evaluate_pass(chain, frequency_hz, link, geometry):
+    """Evaluate the chain once per time step of a pass and return the ChainResult over time.
+
+    The path loss follows the slant range and the carrier is shifted by the
+    Doppler at each step; the link's fixed path loss or distance, if any,
+    is replaced. Steps below the horizon are evaluated too and can be
+    masked with geometry.visible().
+    """
+    pass_link = copy.copy(link)
+    pass_link.path_loss_db = None
+    pass_link.distance_m = geometry.range_m
+    return evaluate_chain(chain, frequency_hz + geometry.doppler_hz(frequency_hz), pass_link)
+
+
+def times_from_json(data):
+    """Build the time steps in seconds of a pass from {'start', 'stop', 'step' or 'points', 'unit'}."""
+    unit = unit_of(data, "s")
+    start = float(_time_to_s(data.get("start", 0.0), unit))
+    stop = float(_time_to_s(data["stop"], unit))
+    if "points" in data:
+        return np.linspace(start, stop, int(data["points"]))
+    step = float(_time_to_s(data.get("step", 1.0), unit))
+    return start + step * np.arange(int(np.floor((stop - start) / step)) + 1)
+
+
+def station_location(devices, name=None):
+    """Return the location of the named device, or of the first located device, from parsed project devices."""
+    for device in devices:
+        if device.spec is not None and device.spec.location is not None and name in (None, device.name):
+            return device.spec.location
+    raise LinkBudgetError(f"No located station device {name!r}" if name else "No device of the project has a location")
+
+
+def _join(parts, lengths):
+    """Join objects computed over consecutive chunks of time steps into one, along their last axis."""
+    joined = copy.copy(parts[0])
+    for name, value in vars(parts[0]).items():
+        if isinstance(value, np.ndarray) and value.ndim and value.shape[-1] == lengths[0]:
+            setattr(joined, name, np.concatenate([getattr(part, name) for part in parts], axis=-1))
+    return joined
+
+
+def pass_from_json(data, devices, chain, link, progress=None, chunk_size=PASS_CHUNK_SIZE):
+    """Evaluate a project's 'pass' section and return (PassGeometry, ChainResult).
+
+    The section names the station device, the carrier 'frequency', and
+    either an 'ephemeris' table or an 'orbit' with the 'times' to propagate to.
+
+    progress, when given, is called with the (PassGeometry, ChainResult)
+    of each chunk of chunk_size time steps as it is evaluated, so a long
+    pass can be shown as it is computed; an exception it raises stops the
+    evaluation.
+    """
+    location = station_location(devices, data.get("station"))
+    value, unit = quantity(data["frequency"], "Hz")
+    frequency_hz = float(frequency_to_hz(value, unit))
+    if "ephemeris" in data:
+        trajectory = Ephemeris.from_json(data["ephemeris"])
+        times = times_from_json(data["times"]) if "times" in data else None
+    elif "orbit" in data:
+        trajectory = KeplerianOrbit.from_json(data["orbit"])
+        times = times_from_json(data["times"])
+    else:
+        raise LinkBudgetError("A pass needs an ephemeris or an orbit")
+    if progress is None or times is None or len(times) <= chunk_size:
+        geometry = pass_geometry(location, trajectory, times)
+        result = evaluate_pass(chain, frequency_hz, link, geometry)
+        if progress is not None:
+            progress(geometry, result)
+        return geometry, result
+    geometries = []
+    results = []
+    for start in range(0, len(times), chunk_size):
+        geometry = pass_geometry(location, trajectory, times[start:start + chunk_size])
+        result = evaluate_pass(chain, frequency_hz, link, geometry)
+        progress(geometry, result)
+        geometries.append(geometry)
+        results.append(result)
+    lengths = [len(geometry.times) for geometry in geometries]
+    return _join(geometries, lengths), _join(results, lengths)
@@ -0,0 +1,155 @@
+"""Undo and redo of device library edits.
+
+Every edit replaces or removes whole device entries, so a step is stored
+as a patch of the entries it touched: for each device, the value before
+and after the edit. Device dictionaries are never mutated in place, so a
+patch only holds references to them; the memory of the history grows
+with the edits, not with the library, and undoing or redoing a step
+touches only the devices it changed.
+"""
+from collections import deque
+
+# marks a device that does not exist on one side of a patch
+MISSING = object()
+# the default number of steps kept before the oldest is dropped
+DEFAULT_LIMIT = 10_000
+
+
+class HistoryError(Exception):
+    """Raised when there is no step to undo or redo."""
+
+
+class Step:
+    """One undoable edit: a label and {device name: (before, after)}."""
+    __slots__ = ("label", "changes")
+
+    def __init__(self, label, changes):
+        self.label = label
+        self.changes = changes
+
+    def __repr__(self):
+        return f"Step({self.label!r}, {len(self.changes)} device(s))"
+
+
+class EditHistory:
+    """Applies edits to a devices dictionary and keeps the steps needed to undo and redo them.
+
+    devices is the 'devices' dictionary of the library, edited in place.
+    At most limit steps are kept. Making a new edit after undoing discards
+    the steps that could have been redone.
+    """
+    def __init__(self, devices, limit=DEFAULT_LIMIT):
+        self.devices = devices
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+        # the last step applied, undone or redone, the side of it the devices hold, and the redo steps apply cleared
+        self._last = None
+
+    def apply(self, label, updates):
+        """Apply {device name: new data or MISSING} as one step and return the names it changed."""
+        changes = {}
+        for name, data in updates.items():
+            before = self.devices.get(name, MISSING)
+            if before is not data:
+                changes[name] = (before, data)
+        if not changes:
+            return []
+        self._set(changes, 1)
+        step = Step(label, changes)
+        self._undo.append(step)
+        self._last = (step, 1, self._redo)
+        self._redo = []
+        return list(changes)
+
+    def set(self, name, data, label=None):
+        """Add or replace one device."""
+        verb = "Edit" if name in self.devices else "Add"
+        return self.apply(label or f"{verb} {name}", {name: data})
+
+    def delete(self, name, label=None):
+        """Remove one device."""
+        return self.apply(label or f"Delete {name}", {name: MISSING})
+
+    def undo(self):
+        """Revert the last step and return the names of the devices it changed."""
+        if not self._undo:
+            raise HistoryError("Nothing to undo")
+        step = self._undo.pop()
+        self._set(step.changes, 0)
+        self._redo.append(step)
+        self._last = (step, 0, None)
+        return list(step.changes)
+
+    def redo(self):
+        """Reapply the last undone step and return the names of the devices it changed."""
+        if not self._redo:
+            raise HistoryError("Nothing to redo")
+        step = self._redo.pop()
+        self._set(step.changes, 1)
+        self._undo.append(step)
+        self._last = (step, 1, None)
+        return list(step.changes)
+
+    def discard(self, names):
+        """Take back the last apply, undo or redo for some of its devices, such as those that could not be saved.
+
+        The devices get back the values they had before it. A new edit is
+        left without them, and once empty is dropped with the redo steps it
+        cleared brought back; an undo or redo of them is put back on the
+        stack it came from, so it can be tried again.
+        """
+        if self._last is None:
+            return
+        step, side, cleared = self._last
+        self._last = None
+        taken = {}
+        for name in names:
+            values = step.changes.pop(name, None)
+            if values is not None:
+                self._set({name: values}, 1 - side)
+                taken[name] = values
+        # an applied or redone step is on top of the undo stack, an undone one on top of the redo stack
+        done, source = (self._undo, self._redo) if side else (self._redo, self._undo)
+        if not step.changes and done and done[-1] is step:
+            done.pop()
+        if cleared is not None:
+            if not step.changes:
+                self._redo = cleared
+            return
+        if taken:
+            source.append(Step(step.label, taken))
+
+    def _set(self, changes, side):
+        for name, values in changes.items():
+            value = values[side]
+            if value is MISSING:
+                self.devices.pop(name, None)
+            else:
+                self.devices[name] = value
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    @property
+    def undo_label(self):
+        """The label of the step undo would revert, or None."""
+        return self._undo[-1].label if self._undo else None
+
+    @property
+    def redo_label(self):
+        """The label of the step redo would reapply, or None."""
+        return self._redo[-1].label if self._redo else None
+
+    def __len__(self):
+        return len(self._undo)
+
+    def clear(self):
+        """Forget every step."""
+        self._undo.clear()
+        self._redo.clear()
+        self._last = None
@@ -0,0 +1,166 @@
+"""Precompiled interpolation tables for frequency dependent device parameters.
+
+Devices store frequency dependent parameters as sparse points, e.g. a cable's
+attenuation as F1..Fn dictionaries of frequency and dB/100m. These are
+compiled once, when the library is loaded, into sorted and unit normalized
+arrays that can be queried with a whole vector of frequencies.
+"""
+import numpy as np
+
+from .units import UnitError, distance_to_m, frequency_to_hz
+
+# keys that hold the frequency of a table point, including known misspellings
+FREQUENCY_KEYS = ("frequency", "freq")
+MISSPELLED_FREQUENCY_KEYS = ("frequenccy", "frequncy", "frequecy")
+
+
+class TableError(ValueError):
+    """Raised when a parameter table has malformed points."""
+    def __init__(self, problems):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+class InterpolationTable:
+    """A sorted, array backed interpolator over frequency in Hz.
+
+    Points outside the table are clamped to the nearest end point. In
+    'loglog' mode both axes are interpolated logarithmically, which suits
+    quantities like cable attenuation that follow a power law in frequency.
+    """
+    __slots__ = ("x", "y", "mode", "_log_x", "_log_y")
+
+    def __init__(self, x, y, mode="linear"):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if x.ndim != 1 or x.shape != y.shape or x.size == 0:
+            raise TableError(["table needs matching, non-empty frequency and value arrays"])
+        order = np.argsort(x, kind="stable")
+        self.x = x[order]
+        self.y = y[order]
+        if mode not in ("linear", "loglog"):
+            raise TableError([f"unknown interpolation mode {mode!r}"])
+        self.mode = mode
+        self._log_x = self._log_y = None
+        if mode == "loglog":
+            if np.any(self.x <= 0) or np.any(self.y <= 0):
+                raise TableError(["log-log interpolation needs positive frequencies and values"])
+            self._log_x = np.log10(self.x)
+            self._log_y = np.log10(self.y)
+
+    def __call__(self, frequencies):
+        """Return the interpolated values at the given frequencies in Hz."""
+        frequencies = np.asarray(frequencies, dtype=float)
+        if self.mode == "loglog":
+            return 10.0 ** np.interp(np.log10(frequencies), self._log_x, self._log_y)
+        return np.interp(frequencies, self.x, self.y)
+
+    def __len__(self):
+        return self.x.size
+
+    def __repr__(self):
+        return f"InterpolationTable(points={self.x.size}, mode={self.mode})"
+
+
+def per_length_m(unit):
+    """Return the reference length in meters of a unit such as 'dB/100m', or 1.0 for plain 'dB'."""
+    _, _, length = str(unit).partition("/")
+    length = length.strip()
+    if not length:
+        return 1.0
+    index = 0
+    while index < len(length) and (length[index].isdigit() or length[index] == "."):
+        index += 1
+    scale = float(length[:index]) if index else 1.0
+    return float(distance_to_m(scale, length[index:].strip()))
+
+
+def is_point_table(value):
+    """Return True when a parameter looks like a table of frequency points."""
+    return (isinstance(value, dict) and len(value) > 0
+            and all(isinstance(point, dict) for point in value.values())
+            and all(any(key in point for key in FREQUENCY_KEYS + MISSPELLED_FREQUENCY_KEYS)
+                    for point in value.values()))
+
+
+def compile_table(table, value_key, mode="linear"):
+    """Compile a dictionary of frequency points into an InterpolationTable.
+
+    Values are normalized per meter when their unit is per length. Returns
+    the table and a list of warnings; raises TableError listing every
+    malformed point at once.
+    """
+    frequencies = []
+    values = []
+    problems = []
+    warnings = []
+    seen = set()
+    for label, point in table.items():
+        if not isinstance(point, dict):
+            problems.append(f"{label}: point is not a dictionary")
+            continue
+        frequency_key = next((key for key in FREQUENCY_KEYS if key in point), None)
+        if frequency_key is None:
+            frequency_key = next((key for key in MISSPELLED_FREQUENCY_KEYS if key in point), None)
+            if frequency_key is None:
+                problems.append(f"{label}: missing frequency")
+                continue
+            warnings.append(f"{label}: misspelled key {frequency_key!r} read as 'frequency'")
+        if value_key not in point:
+            problems.append(f"{label}: missing {value_key!r}")
+            continue
+        try:
+            # points keep the frequency unit under 'units' and the value unit under 'unit'
+            frequency_unit = point.get("units", point.get("frequency_unit", "Hz"))
+            frequency = float(frequency_to_hz(float(point[frequency_key]), frequency_unit))
+            value = float(point[value_key]) / per_length_m(point.get("unit", ""))
+        except (TypeError, ValueError, UnitError) as e:
+            problems.append(f"{label}: {e}")
+            continue
+        if frequency in seen:
+            problems.append(f"{label}: duplicate frequency {frequency:g} Hz")
+            continue
+        seen.add(frequency)
+        frequencies.append(frequency)
+        values.append(value)
+    if problems:
+        raise TableError(problems)
+    return InterpolationTable(frequencies, values, mode), warnings
+
+
+def compile_device_tables(parameters, mode="linear"):
+    """Compile every point table of one device, keyed by parameter name.
+
+    Returns the tables and a list of problems; devices with malformed
+    tables simply have no compiled table for that parameter.
+    """
+    tables = {}
+    problems = []
+    for key, value in parameters.items():
+        if not is_point_table(value):
+            continue
+        try:
+            tables[key], warnings = compile_table(value, key, mode)
+            problems.extend(f"{key}.{warning}" for warning in warnings)
+        except TableError as e:
+            problems.extend(f"{key}.{problem}" for problem in e.problems)
+    return tables, problems
+
+
+def compile_library_tables(device_library, mode="linear"):
+    """Compile the point tables of every device in a library.
+
+    Returns a dictionary of device name to {parameter: table} and a
+    dictionary of device name to the problems found while compiling.
+    """
+    tables = {}
+    problems = {}
+    for name, parameters in device_library.get("devices", {}).items():
+        if not isinstance(parameters, dict):
+            continue
+        device_tables, device_problems = compile_device_tables(parameters, mode)
+        if device_tables:
+            tables[name] = device_tables
+        if device_problems:
+            problems[name] = device_problems
+    return tables, problems
@@ -0,0 +1,242 @@
+"""A scheduler of background jobs whose results are delivered to one thread.
+
+The GUI must never compute on the Tk thread, yet only the Tk thread may
+touch widgets. Jobs therefore run on a thread pool and report through a
+queue that the Tk thread drains with poll(), from a root.after loop. A
+job's own code may spread its work further, over a process pool; the
+Monte Carlo analysis does.
+
+Jobs are submitted under a key, such as "monte_carlo", and a token
+describing their inputs, such as the hash of the devices and settings. A
+submission with the key and token of a job still running is coalesced
+into that job; one with the same key but another token supersedes it,
+and the old job is cancelled. Cancellation is cooperative: a job stops at
+its next check(), progress() or partial() call.
+
+Progress and partial results are snapshots, so each poll delivers only the
+latest of each per job; a burst of updates costs the Tk thread one call.
+Chunks are pieces of a streamed result, so every one is delivered, in order.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# the states of a job, in the order it goes through them
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled, to unwind it."""
+
+
+class Job:
+    """One submitted computation; the function is called with the job followed by its arguments."""
+    def __init__(self, scheduler, key, token, function, args, devices, callbacks):
+        self.scheduler = scheduler
+        self.key = key
+        self.token = token
+        self.function = function
+        self.args = args
+        self.devices = frozenset(devices)
+        self.callbacks = callbacks
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.submitted = time.perf_counter()
+        self.elapsed = None
+        self._cancelled = threading.Event()
+        self._future = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Ask the job to stop; a job that has not started yet never runs."""
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        if self._future is not None and self._future.cancel():
+            self.scheduler._post(self, CANCELLED, None)
+            self.scheduler._finished(self)
+
+    def check(self):
+        """Raise JobCancelled if the job was cancelled; long loops call this between steps."""
+        if self._cancelled.is_set():
+            raise JobCancelled(self.key)
+
+    def progress(self, fraction=None, text=None):
+        """Report how far the job has got, as a fraction from 0 to 1 and/or a message."""
+        self.check()
+        self.scheduler._post(self, "progress", (fraction, text))
+
+    def partial(self, value):
+        """Report an intermediate result, superseding any earlier one."""
+        self.check()
+        self.scheduler._post(self, "partial", value)
+
+    def chunk(self, value):
+        """Report the next piece of a streamed result; unlike partials, chunks are never dropped."""
+        self.check()
+        self.scheduler._post(self, "chunk", value)
+
+    def _run(self):
+        self.state = RUNNING
+        start = time.perf_counter()
+        try:
+            self.check()
+            result = self.function(self, *self.args)
+        except JobCancelled:
+            self.scheduler._post(self, CANCELLED, None)
+        except Exception as e:
+            # the error belongs to whoever submitted the job, on the thread that polls
+            self.elapsed = time.perf_counter() - start
+            self.scheduler._post(self, FAILED, e)
+        else:
+            self.elapsed = time.perf_counter() - start
+            self.scheduler._post(self, DONE, result)
+        finally:
+            self.scheduler._finished(self)
+
+    def __repr__(self):
+        return f"Job({self.key!r}, {self.state})"
+
+
+class JobScheduler:
+    """Runs jobs on a pool of worker threads and delivers their reports through poll().
+
+    Callbacks are on_progress(fraction, text), on_partial(value),
+    on_chunk(value), on_done(result) and on_error(exception). They are only ever called
+    from poll(), and never for a job that was cancelled.
+    """
+    def __init__(self, workers=None):
+        self.workers = workers or max(2, min(4, os.cpu_count() or 1))
+        self._executor = None
+        self._jobs = {}
+        self._messages = queue.Queue()
+        self._lock = threading.Lock()
+        # jobs submitted whose final report poll() has not delivered yet
+        self._undelivered = 0
+
+    def submit(self, key, function, *args, token=None, devices=(), on_progress=None, on_partial=None, on_chunk=None,
+               on_done=None, on_error=None):
+        """Run function(job, *args) in the background and return its job.
+
+        A job with the same key and token that is still running is returned
+        instead; a job under key with another token, or with no token, is
+        cancelled. devices names the devices the job reads, for
+        cancel_dependents.
+        """
+        with self._lock:
+            current = self._jobs.get(key)
+            if current is not None and current.token == token and token is not None and not current.cancelled:
+                return current
+            job = Job(self, key, token, function, args, devices,
+                      {"progress": on_progress, "partial": on_partial, "chunk": on_chunk, DONE: on_done,
+                       FAILED: on_error})
+            self._jobs[key] = job
+            self._undelivered += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            job._future = self._executor.submit(job._run)
+        if current is not None:
+            current.cancel()
+        return job
+
+    def get(self, key):
+        """Return the job running under key, or None."""
+        with self._lock:
+            return self._jobs.get(key)
+
+    def cancel(self, key):
+        """Cancel the job running under key; returns whether there was one."""
+        with self._lock:
+            job = self._jobs.pop(key, None)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def cancel_dependents(self, device_name):
+        """Cancel the jobs that read a device, whose results an edit of it makes stale; returns how many."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if device_name in job.devices]
+            for job in jobs:
+                del self._jobs[job.key]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    @property
+    def active(self):
+        """True while some job's final report has not been delivered by poll()."""
+        return self._undelivered > 0
+
+    def poll(self):
+        """Deliver the reports that arrived since the last poll; call this from the thread that owns the UI.
+
+        Returns the number of callbacks made.
+        """
+        messages = []
+        while True:
+            try:
+                messages.append(self._messages.get_nowait())
+            except queue.Empty:
+                break
+        # only the last progress and partial report of each job is worth delivering
+        latest = {}
+        for position, (job, kind, _) in enumerate(messages):
+            latest[(id(job), kind)] = position
+        calls = 0
+        for position, (job, kind, payload) in enumerate(messages):
+            if kind in (DONE, FAILED, CANCELLED):
+                with self._lock:
+                    self._undelivered -= 1
+                job.state = CANCELLED if job.cancelled else kind
+                if kind == DONE:
+                    job.result = payload
+                elif kind == FAILED:
+                    job.error = payload
+            elif kind != "chunk" and (latest[(id(job), kind)] != position or (id(job), DONE) in latest
+                                      or (id(job), FAILED) in latest):
+                continue
+            if job.cancelled:
+                continue
+            callback = job.callbacks.get(kind)
+            if callback is None:
+                continue
+            if kind == "progress":
+                callback(*payload)
+            else:
+                callback(payload)
+            calls += 1
+        return calls
+
+    def shutdown(self, wait=False):
+        """Cancel every job and stop the worker threads."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        for job in jobs:
+            job.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def _post(self, job, kind, payload):
+        self._messages.put((job, kind, payload))
+
+    def _finished(self, job):
+        with self._lock:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
@@ -0,0 +1,32 @@
+"""Deferred module imports.
+
+A lazy module stands in for a module that is imported the first time one
+of its attributes is used, so callers can keep module level names for
+heavy dependencies, like NumPy backed computation or Tk dialogs, without
+paying for them at startup. The import itself goes through importlib, so
+concurrent first uses from several threads are safe.
+"""
+import importlib
+
+
+class LazyModule:
+    """A module imported on first attribute access."""
+    def __init__(self, name, package=None):
+        self._name = name
+        self._package = package
+        self._module = None
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name, self._package)
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name, package=None):
+    """Return a stand-in for a module that imports it when first used; relative names need a package."""
+    return LazyModule(name, package)
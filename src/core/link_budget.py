@@ -0,0 +1,350 @@
+"""Vectorized link budget evaluation over a project's ordered device chain.
+
+Every quantity is computed as a NumPy array over the whole frequency sweep at
+once, so a chain costs a handful of array operations per stage instead of a
+Python loop per frequency point.
+"""
+import numpy as np
+
+# classify_device moved to the device model and is kept importable from here
+from .model import classify_device, parse_device
+from .units import (
+    SPEED_OF_LIGHT, db_to_linear, distance_to_m, frequency_to_hz,
+    linear_to_db, loss_to_db, power_to_w, quantity, temperature_to_k, unit_of,
+)
+
+# 10*log10(k) with k the Boltzmann constant, in dBW/K/Hz
+BOLTZMANN_DB = -228.5991672
+# standard reference temperature for noise figures, in Kelvin
+REFERENCE_TEMPERATURE = 290.0
+# devices that split one input over their ports, or combine their ports into one output, and a switch that
+# selects one of its ports; each costs a signal path its insertion loss, plus the split for the first two
+SPLIT_KINDS = ("splitter", "combiner")
+BRANCH_KINDS = SPLIT_KINDS + ("switch",)
+DEFAULT_PORTS = 2
+
+
+class LinkBudgetError(ValueError):
+    """Raised when a device chain cannot be evaluated."""
+
+
+def _evaluate(parameter, frequencies):
+    """Evaluate a constant, array or callable parameter over the frequencies."""
+    if callable(parameter):
+        return parameter(frequencies)
+    return np.asarray(parameter, dtype=float)
+
+
+def _stack(arrays, shape):
+    """Broadcast a list of arrays against each other and stack them on a new first axis."""
+    if not arrays:
+        return np.zeros((0,) + shape)
+    arrays = np.broadcast_arrays(np.zeros(shape), *arrays)[1:]
+    return np.stack(arrays)
+
+
+def free_space_path_loss(distance_m, frequency_hz):
+    """Return the free space path loss in dB."""
+    distance_m = np.asarray(distance_m, dtype=float)
+    frequency_hz = np.asarray(frequency_hz, dtype=float)
+    return 20.0 * np.log10(4.0 * np.pi * distance_m * frequency_hz / SPEED_OF_LIGHT)
+
+
+def frequency_sweep(start, stop, points, unit="GHz", log=False):
+    """Return an array of sweep frequencies in Hz."""
+    start = float(frequency_to_hz(start, unit))
+    stop = float(frequency_to_hz(stop, unit))
+    if log:
+        return np.geomspace(start, stop, int(points))
+    return np.linspace(start, stop, int(points))
+
+
+def sweep_from_json(data):
+    """Build a frequency sweep from a project's 'sweep' section."""
+    return frequency_sweep(data["start"], data["stop"], data.get("points", 1001),
+                           unit_of(data, "GHz"), log=data.get("log", False))
+
+
+class Stage:
+    """One two-port device in the receive chain, described by its gain and noise temperature.
+
+    A passive stage's noise temperature follows from its loss and physical temperature.
+    """
+    def __init__(self, name, kind, gain_db, noise_temperature, passive=False):
+        self.name = name
+        self.kind = kind
+        self.passive = passive
+        self._gain_db = gain_db
+        self._noise_temperature = noise_temperature
+
+    def gain_db(self, frequencies):
+        """Return the stage gain in dB at the given frequencies."""
+        return _evaluate(self._gain_db, frequencies)
+
+    def noise_temperature(self, frequencies):
+        """Return the equivalent input noise temperature in Kelvin."""
+        return _evaluate(self._noise_temperature, frequencies)
+
+    def __repr__(self):
+        return f"Stage(name={self.name}, kind={self.kind})"
+
+
+def passive_stage(name, kind, loss_db, physical_temperature=REFERENCE_TEMPERATURE):
+    """Build a stage for a matched passive loss, whose noise temperature follows from the loss."""
+    def noise_temperature(frequencies):
+        return (db_to_linear(_evaluate(loss_db, frequencies)) - 1.0) * physical_temperature
+
+    def gain_db(frequencies):
+        return -_evaluate(loss_db, frequencies)
+
+    return Stage(name, kind, gain_db, noise_temperature, passive=True)
+
+
+class Antenna:
+    """The receive antenna at the head of the chain, the reference point for G/T."""
+    def __init__(self, name, gain_db=None, efficiency=1.0, diameter_m=None,
+                 physical_temperature=REFERENCE_TEMPERATURE):
+        if gain_db is None and diameter_m is None:
+            raise LinkBudgetError(f"Antenna {name!r} needs a gain or a diameter")
+        self.name = name
+        self.efficiency = efficiency
+        self.diameter_m = diameter_m
+        self.physical_temperature = physical_temperature
+        self._gain_db = gain_db
+
+    def gain_db(self, frequencies):
+        """Return the antenna gain in dBi, from the aperture when no gain is given."""
+        if self._gain_db is not None:
+            return _evaluate(self._gain_db, frequencies)
+        wavelength = SPEED_OF_LIGHT / np.asarray(frequencies, dtype=float)
+        return linear_to_db(self.efficiency * (np.pi * self.diameter_m / wavelength) ** 2)
+
+    def noise_temperature(self, frequencies, sky_temperature):
+        """Return the antenna noise temperature seen at its terminals."""
+        return self.efficiency * sky_temperature + (1.0 - self.efficiency) * self.physical_temperature
+
+    def __repr__(self):
+        return f"Antenna(name={self.name})"
+
+
+class Chain:
+    """An antenna followed by an ordered list of stages."""
+    def __init__(self, antenna, stages):
+        self.antenna = antenna
+        self.stages = list(stages)
+
+    def __repr__(self):
+        return f"Chain(antenna={self.antenna}, stages={self.stages})"
+
+
+def device_parameters(device, library=None):
+    """Return the parameter dictionary of a project device, resolving library references."""
+    data = device.json_data if hasattr(device, "json_data") else device
+    parameters = {key: value for key, value in data.items() if key != "name"}
+    if not parameters and library is not None:
+        try:
+            parameters = library["devices"][data["name"]]
+        except KeyError:
+            raise LinkBudgetError(f"Device {data['name']!r} is not in the device library") from None
+    return parameters
+
+
+def stage_from_spec(spec, physical_temperature=REFERENCE_TEMPERATURE):
+    """Build the antenna or stage for one parsed device."""
+    name, kind = spec.name, spec.kind
+    if kind == "antenna":
+        efficiency = 1.0 if spec.efficiency is None else spec.efficiency
+        return Antenna(name, spec.gain_db, efficiency, spec.diameter_m, physical_temperature)
+    if kind == "lna":
+        if spec.gain_db is None:
+            raise LinkBudgetError(f"Device {name!r} has invalid lna parameters: no Gain")
+        if spec.noise_figure_db is not None:
+            noise_temperature = REFERENCE_TEMPERATURE * (db_to_linear(spec.noise_figure_db) - 1.0)
+        elif spec.noise_temperature is not None:
+            noise_temperature = spec.noise_temperature
+        else:
+            raise LinkBudgetError(f"Device {name!r} has invalid lna parameters: no Noise_Figure or Temperature")
+        return Stage(name, kind, spec.gain_db, float(noise_temperature))
+    if kind == "attenuator":
+        if spec.loss_db is None:
+            raise LinkBudgetError(f"Device {name!r} has invalid attenuator parameters: {'; '.join(spec.problems)}")
+        return passive_stage(name, kind, spec.loss_db, physical_temperature)
+    if kind == "cable":
+        attenuation = spec.tables.get("attenuation")
+        if attenuation is None:
+            raise LinkBudgetError(f"Device {name!r} has invalid cable parameters: {'; '.join(spec.problems)}")
+        length = 1.0 if spec.length_m is None else spec.length_m
+
+        def loss_db(frequencies):
+            return attenuation(frequencies) * length
+
+        return passive_stage(name, kind, loss_db, physical_temperature)
+    if kind in BRANCH_KINDS:
+        ports = spec.ports or DEFAULT_PORTS
+        loss_db = spec.loss_db or 0.0
+        if kind in SPLIT_KINDS:
+            loss_db = loss_db + float(linear_to_db(ports))
+        return passive_stage(name, kind, loss_db, physical_temperature)
+    raise LinkBudgetError(f"Device {name!r} is not a supported link budget device")
+
+
+def build_stage(name, parameters, physical_temperature=REFERENCE_TEMPERATURE, tables=None):
+    """Build the antenna or stage for one device from its raw parameters.
+
+    Frequency dependent parameters are read from the device's precompiled
+    tables when given, and compiled on the spot otherwise.
+    """
+    return stage_from_spec(parse_device(name, parameters, tables), physical_temperature)
+
+
+def build_chain(project, library=None, physical_temperature=REFERENCE_TEMPERATURE, tables=None):
+    """Build a chain from a project's ordered list of devices.
+
+    The project may be a Project or its json data. Tables are the library's
+    compiled interpolation tables, keyed by device name.
+    """
+    antenna = None
+    stages = []
+    tables = tables or {}
+    devices = project.devices if hasattr(project, "devices") else project["devices"]
+    for index, device in enumerate(devices):
+        name = device.name if hasattr(device, "name") else device["name"]
+        # devices parsed at load carry their spec; unresolved library references are parsed here
+        spec = getattr(device, "spec", None)
+        if spec is None or spec.kind == "reference":
+            spec = parse_device(name, device_parameters(device, library), tables.get(name))
+        stage = stage_from_spec(spec, physical_temperature)
+        if isinstance(stage, Antenna):
+            if index != 0:
+                raise LinkBudgetError(f"Antenna {name!r} must be the first device in the chain")
+            antenna = stage
+        else:
+            stages.append(stage)
+    return Chain(antenna, stages)
+
+
+class LinkParameters:
+    """The transmit side and requirements of a link, all stored in dB and SI units."""
+    def __init__(self, eirp_dbw=None, path_loss_db=None, distance_m=None, other_losses_db=0.0,
+                 required_cn0_dbhz=None, sky_temperature=50.0, physical_temperature=REFERENCE_TEMPERATURE):
+        self.eirp_dbw = eirp_dbw
+        self.path_loss_db = path_loss_db
+        self.distance_m = distance_m
+        self.other_losses_db = other_losses_db
+        self.required_cn0_dbhz = required_cn0_dbhz
+        self.sky_temperature = sky_temperature
+        self.physical_temperature = physical_temperature
+
+    @classmethod
+    def from_json(cls, data):
+        """Build link parameters from a project's 'link' section."""
+        link = cls()
+        if "eirp" in data:
+            value, unit = quantity(data["eirp"], "dBW")
+            link.eirp_dbw = float(linear_to_db(power_to_w(value, unit)))
+        if "path_loss" in data:
+            value, unit = quantity(data["path_loss"], "dB")
+            link.path_loss_db = float(loss_to_db(value, unit))
+        if "distance" in data:
+            value, unit = quantity(data["distance"], "m")
+            link.distance_m = float(distance_to_m(value, unit))
+        if "other_losses" in data:
+            value, unit = quantity(data["other_losses"], "dB")
+            link.other_losses_db = float(loss_to_db(value, unit))
+        if "required_cn0" in data:
+            link.required_cn0_dbhz = float(quantity(data["required_cn0"])[0])
+        elif "required_ebn0" in data and "data_rate" in data:
+            ebn0 = float(quantity(data["required_ebn0"])[0])
+            link.required_cn0_dbhz = ebn0 + float(linear_to_db(float(quantity(data["data_rate"])[0])))
+        for key, attribute in (("sky_temperature", "sky_temperature"), ("physical_temperature", "physical_temperature")):
+            if key in data:
+                value, unit = quantity(data[key], "K")
+                setattr(link, attribute, float(temperature_to_k(value, unit)))
+        return link
+
+    def path_loss(self, frequencies):
+        """Return the path loss in dB, or None when the link geometry is unknown."""
+        if self.path_loss_db is not None:
+            return np.asarray(self.path_loss_db, dtype=float)
+        if self.distance_m is not None:
+            return free_space_path_loss(self.distance_m, frequencies)
+        return None
+
+
+class ChainResult:
+    """Arrays describing a chain evaluated over a sweep.
+
+    Per-stage arrays have the stage on the first axis and the sweep on the
+    remaining axes. Quantities that need the transmit side of the link are
+    None when the link parameters do not define it.
+    """
+    def __init__(self, frequencies, stage_names, stage_gain_db, cumulative_gain_db, antenna_gain_db,
+                 noise_temperature, g_over_t_db, cn0_dbhz=None, margin_db=None, level_dbw=None):
+        self.frequencies = frequencies
+        self.stage_names = stage_names
+        self.stage_gain_db = stage_gain_db
+        self.cumulative_gain_db = cumulative_gain_db
+        self.antenna_gain_db = antenna_gain_db
+        self.noise_temperature = noise_temperature
+        self.g_over_t_db = g_over_t_db
+        self.cn0_dbhz = cn0_dbhz
+        self.margin_db = margin_db
+        self.level_dbw = level_dbw
+
+    @property
+    def gain_db(self):
+        """Total gain of the chain after the antenna, in dB."""
+        if len(self.stage_names) == 0:
+            return np.zeros(np.shape(self.g_over_t_db))
+        return self.cumulative_gain_db[-1]
+
+
+def stage_arrays(stages, frequencies):
+    """Return the stacked (gain dB, noise temperature) arrays of the stages."""
+    shape = np.shape(frequencies)
+    gain_db = _stack([stage.gain_db(frequencies) for stage in stages], shape)
+    noise_temperature = _stack([stage.noise_temperature(frequencies) for stage in stages], shape)
+    return gain_db, noise_temperature
+
+
+def antenna_terms(antenna, frequencies, link):
+    """Return the antenna gain in dBi and the antenna noise temperature."""
+    if antenna is None:
+        return np.zeros(np.shape(frequencies)), np.full(np.shape(frequencies), link.sky_temperature)
+    return antenna.gain_db(frequencies), antenna.noise_temperature(frequencies, link.sky_temperature)
+
+
+def finish_result(chain, frequencies, link, stage_gain_db, cumulative_gain_db, receiver_temperature):
+    """Combine the cascaded stage results with the antenna and link into a ChainResult."""
+    antenna_gain_db, antenna_temperature = antenna_terms(chain.antenna, frequencies, link)
+    noise_temperature = antenna_temperature + receiver_temperature
+    g_over_t_db = antenna_gain_db - linear_to_db(noise_temperature)
+    cn0_dbhz = margin_db = level_dbw = None
+    path_loss_db = link.path_loss(frequencies)
+    if link.eirp_dbw is not None and path_loss_db is not None:
+        received_dbw = link.eirp_dbw - path_loss_db - link.other_losses_db + antenna_gain_db
+        level_dbw = received_dbw + cumulative_gain_db
+        cn0_dbhz = link.eirp_dbw - path_loss_db - link.other_losses_db + g_over_t_db - BOLTZMANN_DB
+        if link.required_cn0_dbhz is not None:
+            margin_db = cn0_dbhz - link.required_cn0_dbhz
+    return ChainResult(frequencies, [stage.name for stage in chain.stages], stage_gain_db, cumulative_gain_db,
+                       antenna_gain_db, noise_temperature, g_over_t_db, cn0_dbhz, margin_db, level_dbw)
+
+
+def evaluate_chain(chain, frequencies, link=None, library=None):
+    """Evaluate gain, cascaded noise temperature, G/T and margin of a chain over a sweep.
+
+    The chain may be a Chain or a Project. Frequencies are in Hz and may be a
+    scalar or an array of any shape; stage parameters broadcast against it.
+    """
+    if not isinstance(chain, Chain):
+        chain = build_chain(chain, library)
+    if link is None:
+        link = LinkParameters()
+    frequencies = np.asarray(frequencies, dtype=float)
+    stage_gain_db, stage_temperature = stage_arrays(chain.stages, frequencies)
+    cumulative_gain_db = np.cumsum(stage_gain_db, axis=0)
+    # Friis: each stage's noise is referred to the chain input through the gain ahead of it
+    gain_ahead = db_to_linear(cumulative_gain_db - stage_gain_db)
+    receiver_temperature = np.sum(stage_temperature / gain_ahead, axis=0)
+    return finish_result(chain, frequencies, link, stage_gain_db, cumulative_gain_db, receiver_temperature)
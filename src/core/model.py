@@ -0,0 +1,250 @@
+"""A compact, typed device representation parsed once into canonical SI units.
+
+Device parameters arrive as nested JSON: bare numbers, value/unit pairs,
+frequency ranges with inconsistent keys, and point tables. parse_device
+reads them once into a DeviceSpec whose fields are plain floats and
+compiled tables, so computations never re-interpret the raw dictionaries.
+"""
+from .interpolation import compile_device_tables, is_point_table
+from .units import (
+    Angle, Distance, Frequency, Temperature, UnitError, loss_to_db, quantity, quantity_kind, unit_of,
+)
+
+
+def classify_device(parameters):
+    """Guess the kind of a device from the parameters it carries."""
+    if not parameters:
+        return "reference"
+    if "type" in parameters:
+        return str(parameters["type"]).lower()
+    if "gain" in parameters and ("efficiency" in parameters or "diameter" in parameters):
+        return "antenna"
+    if "Noise_Figure" in parameters or "Gain" in parameters:
+        return "lna"
+    attenuation = parameters.get("attenuation")
+    if isinstance(attenuation, dict):
+        if "value" in attenuation:
+            return "attenuator"
+        return "cable"
+    if isinstance(attenuation, (int, float)):
+        return "attenuator"
+    return "unknown"
+
+
+def parse_scalar(text, value_type=None):
+    """Parse the text of a parameter entry into a bool, int, float or str.
+
+    value_type is the editor type of the entry: 'Boolean' and 'String'
+    entries keep their type, anything else is read as a number when it is
+    one, including signs and exponents.
+    """
+    if value_type == "Boolean":
+        return text.strip().lower() in ("true", "1", "yes")
+    if value_type == "String":
+        return text
+    stripped = text.strip()
+    try:
+        return int(stripped)
+    except ValueError:
+        pass
+    try:
+        return float(stripped)
+    except ValueError:
+        return text
+
+
+class FrequencyRange:
+    """A frequency coverage in Hz."""
+    __slots__ = ("low_hz", "high_hz")
+
+    def __init__(self, low_hz, high_hz):
+        self.low_hz = min(low_hz, high_hz)
+        self.high_hz = max(low_hz, high_hz)
+
+    def covers(self, low_hz, high_hz):
+        """Return True if the range covers all of [low_hz, high_hz]."""
+        return self.low_hz <= low_hz and self.high_hz >= high_hz
+
+    def __iter__(self):
+        return iter((self.low_hz, self.high_hz))
+
+    def __repr__(self):
+        return f"FrequencyRange({self.low_hz:g} Hz, {self.high_hz:g} Hz)"
+
+
+class Location:
+    """A geodetic location, latitude and longitude in radians and altitude in meters."""
+    __slots__ = ("latitude", "longitude", "altitude")
+
+    def __init__(self, latitude, longitude, altitude=0.0):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+
+    def __repr__(self):
+        return f"Location({self.latitude!r}, {self.longitude!r}, {self.altitude!r})"
+
+
+class DeviceSpec:
+    """The typed parameters of one device.
+
+    Fields a device does not define are None. Gains and losses are in dB,
+    every other quantity in its SI unit; other value/unit parameters are
+    kept in quantities by key, and point tables as compiled interpolators.
+    """
+    __slots__ = ("name", "kind", "gain_db", "noise_figure_db", "noise_temperature", "loss_db", "efficiency",
+                 "diameter_m", "length_m", "ports", "frequency_range", "location", "tables", "quantities", "problems")
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.gain_db = None
+        self.noise_figure_db = None
+        self.noise_temperature = None
+        self.loss_db = None
+        self.efficiency = None
+        self.diameter_m = None
+        self.length_m = None
+        self.ports = None
+        self.frequency_range = None
+        self.location = None
+        self.tables = {}
+        self.quantities = {}
+        self.problems = []
+
+    def __repr__(self):
+        return f"DeviceSpec(name={self.name}, kind={self.kind})"
+
+
+def _db(value):
+    value, unit = quantity(value, "dB")
+    return float(loss_to_db(value, unit))
+
+
+def _si(kind, value, default_unit):
+    value, unit = quantity(value, default_unit)
+    return float(kind.to_si(float(value), unit))
+
+
+def _frequency_range(block):
+    low = block.get("start", block.get("min"))
+    high = block.get("end", block.get("max"))
+    if low is None or high is None:
+        raise UnitError("frequency_range needs start/end or min/max")
+    unit = unit_of(block, "Hz")
+    return FrequencyRange(float(Frequency.to_si(low, unit)), float(Frequency.to_si(high, unit)))
+
+
+def _location(block):
+    return Location(float(Angle.to_si(block["lat"], unit_of(block, "deg"))),
+                    float(Angle.to_si(block["lon"], unit_of(block, "deg"))),
+                    float(Distance.to_si(block.get("alt", 0.0), block.get("alt_unit", "m"))))
+
+
+def _ports(value):
+    if type(value) is not int or value < 1:
+        raise ValueError(f"expected a positive whole number of ports, not {value!r}")
+    return value
+
+
+def _efficiency(value):
+    value, _ = quantity(value)
+    value = float(value)
+    return value / 100.0 if value > 1.0 else value
+
+
+# parameter keys with a dedicated field, and how to read them
+FIELDS = {
+    "gain": ("gain_db", _db),
+    "Gain": ("gain_db", _db),
+    "Noise_Figure": ("noise_figure_db", _db),
+    "Temperature": ("noise_temperature", lambda value: _si(Temperature, value, "K")),
+    "efficiency": ("efficiency", _efficiency),
+    "diameter": ("diameter_m", lambda value: _si(Distance, value, "m")),
+    "length": ("length_m", lambda value: _si(Distance, value, "m")),
+    "ports": ("ports", _ports),
+    "frequency_range": ("frequency_range", _frequency_range),
+    "location": ("location", _location),
+}
+
+
+def parse_device(name, parameters, tables=None):
+    """Parse a device's raw parameters into a DeviceSpec.
+
+    tables are the device's precompiled interpolation tables; when None the
+    tables are compiled here. Unreadable parameters are recorded in the
+    spec's problems rather than raised.
+    """
+    spec = DeviceSpec(name, classify_device(parameters))
+    if tables is None:
+        tables, problems = compile_device_tables(parameters)
+        spec.problems.extend(problems)
+    spec.tables = tables
+    for key, value in parameters.items():
+        try:
+            if key in FIELDS:
+                field, read = FIELDS[key]
+                setattr(spec, field, read(value))
+            elif key == "attenuation" and not is_point_table(value):
+                spec.loss_db = _db(value)
+            elif isinstance(value, dict) and "value" in value:
+                kind = quantity_kind(unit_of(value, ""))
+                if kind is not None:
+                    spec.quantities[key] = _si(kind, value, kind.si_unit)
+        except (KeyError, TypeError, ValueError, UnitError) as e:
+            spec.problems.append(f"{key}: {e}")
+    return spec
+
+
+class Device:
+    """A device in a project."""
+    __slots__ = ("json_data", "name", "spec")
+
+    def __init__(self, json_data, library=None, tables=None):
+        """Initialize a device from json data.
+
+        The parameters are parsed once into a typed spec in SI units, resolving
+        library references when a library is given; a device whose parameters
+        cannot be resolved yet has no spec.
+        """
+        self.json_data = json_data
+        self.name = json_data['name']
+        parameters = {key: value for key, value in json_data.items() if key != 'name'}
+        if not parameters and library is not None:
+            parameters = library["devices"].get(self.name)
+        self.spec = None if parameters is None else parse_device(self.name, parameters, tables)
+
+    def __repr__(self):
+        return f"Device(name={self.name})"
+
+    def __str__(self):
+        return f"Device(name={self.name})"
+
+
+class Project:
+    """A project: its json data and the devices of its chain, or of its graph when it has connections."""
+    def __init__(self, json_data, library=None, tables=None):
+        """Initialize a project from json data or a ProjectFile, parsing its devices against the device library."""
+        self.json_data = json_data
+        tables = tables or {}
+
+        def device(data):
+            return Device(data, library, tables.get(data['name']))
+
+        if hasattr(json_data, "sequence"):
+            # devices of a streamed project are built when first accessed
+            self.devices = json_data.sequence('devices', device)
+        else:
+            self.devices = [device(data) for data in json_data['devices']]
+        self._library_references = None
+
+    @property
+    def is_graph(self):
+        """Whether the devices are joined by 'connections' instead of forming one chain in list order."""
+        return 'connections' in self.json_data
+
+    def library_references(self):
+        """Return the names of devices that refer to the device library instead of carrying their own parameters."""
+        if self._library_references is None:
+            self._library_references = {device.name for device in self.devices if set(device.json_data) == {'name'}}
+        return self._library_references
@@ -0,0 +1,264 @@
+"""Monte Carlo link margin analysis under component tolerances.
+
+The nominal chain is reduced once to plain arrays at the analysis frequency:
+per-stage gain and noise temperature, the antenna gain and efficiency, and
+the link terms. Samples are then drawn in vectorized batches, each batch
+with its own child of one SeedSequence, so results depend only on the seed
+and the batch size and not on how many processes ran them. Batches return
+histogram counts and moments rather than samples, which keeps the traffic
+between processes small and lets millions of samples scale with cores.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from .link_budget import BOLTZMANN_DB, REFERENCE_TEMPERATURE, SPEED_OF_LIGHT
+from .units import frequency_to_hz, quantity
+
+# half power beamwidth of a parabolic antenna, in degrees, is about this times wavelength / diameter
+BEAMWIDTH_FACTOR = 70.0
+# worker processes start fresh rather than forking the caller, which may hold Tk, job threads and their locks
+START_METHOD = "spawn"
+
+
+class MonteCarloError(ValueError):
+    """Raised when a Monte Carlo analysis cannot be set up."""
+
+
+class Tolerances:
+    """One standard deviation of each uncertain quantity, all normally distributed.
+
+    gain_db and noise_figure_db apply to every stage unless a stage has its
+    own entry in stages, a {name: {"gain_db": sigma, "noise_figure_db":
+    sigma}} dictionary. physical_temperature_k is one spread shared by the
+    antenna and every passive stage. beamwidth_deg is only needed for
+    pointing error on antennas without a diameter.
+    """
+    def __init__(self, gain_db=0.0, noise_figure_db=0.0, efficiency=0.0, pointing_error_deg=0.0,
+                 beamwidth_deg=None, physical_temperature_k=0.0, sky_temperature_k=0.0, eirp_db=0.0,
+                 path_loss_db=0.0, stages=None):
+        self.gain_db = gain_db
+        self.noise_figure_db = noise_figure_db
+        self.efficiency = efficiency
+        self.pointing_error_deg = pointing_error_deg
+        self.beamwidth_deg = beamwidth_deg
+        self.physical_temperature_k = physical_temperature_k
+        self.sky_temperature_k = sky_temperature_k
+        self.eirp_db = eirp_db
+        self.path_loss_db = path_loss_db
+        self.stages = stages or {}
+
+    @classmethod
+    def from_json(cls, data):
+        """Read tolerances from a project's 'monte_carlo' 'tolerances' dictionary.
+
+        Efficiency may be given in percent like the devices' efficiency.
+        """
+        tolerances = cls(stages=data.get("stages", {}))
+        for key in ("gain_db", "noise_figure_db", "pointing_error_deg", "beamwidth_deg",
+                    "physical_temperature_k", "sky_temperature_k", "eirp_db", "path_loss_db"):
+            if key in data:
+                setattr(tolerances, key, float(quantity(data[key])[0]))
+        if "efficiency" in data:
+            efficiency = float(quantity(data["efficiency"])[0])
+            tolerances.efficiency = efficiency / 100.0 if efficiency > 1.0 else efficiency
+        return tolerances
+
+
+class MonteCarloModel:
+    """The nominal chain at one frequency as plain arrays, cheap to send to worker processes."""
+    def __init__(self, chain, frequency_hz, link, tolerances):
+        if link.eirp_dbw is None or link.required_cn0_dbhz is None:
+            raise MonteCarloError("Monte Carlo margins need the link's eirp and required C/N0")
+        path_loss_db = link.path_loss(frequency_hz)
+        if path_loss_db is None:
+            raise MonteCarloError("Monte Carlo margins need the link's path loss or distance")
+        self.eirp_dbw = float(link.eirp_dbw)
+        self.path_loss_db = float(path_loss_db)
+        self.other_losses_db = float(link.other_losses_db)
+        self.required_cn0_dbhz = float(link.required_cn0_dbhz)
+        self.sky_temperature = float(link.sky_temperature)
+        stages = chain.stages
+        self.gain_db = np.array([float(stage.gain_db(frequency_hz)) for stage in stages])
+        noise_temperature = np.array([float(stage.noise_temperature(frequency_hz)) for stage in stages])
+        self.passive = np.array([stage.passive for stage in stages], dtype=bool)
+        # passive stages keep the physical temperature implied by their nominal loss and noise
+        loss = 10.0 ** (-self.gain_db / 10.0) - 1.0
+        lossy = self.passive & (loss > 0.0)
+        self.physical_temperature = np.where(lossy, noise_temperature / np.where(lossy, loss, 1.0),
+                                             link.physical_temperature)
+        self.noise_figure_db = 10.0 * np.log10(1.0 + noise_temperature / REFERENCE_TEMPERATURE)
+        self.gain_sigma = np.array([tolerances.stages.get(stage.name, {}).get("gain_db", tolerances.gain_db)
+                                    for stage in stages], dtype=float)
+        self.noise_figure_sigma = np.array(
+            [tolerances.stages.get(stage.name, {}).get("noise_figure_db", tolerances.noise_figure_db)
+             for stage in stages], dtype=float)
+        self.tolerances = tolerances
+        antenna = chain.antenna
+        if antenna is None:
+            self.antenna_gain_db, self.efficiency, self.antenna_temperature = 0.0, 1.0, link.physical_temperature
+        else:
+            self.antenna_gain_db = float(antenna.gain_db(frequency_hz))
+            self.efficiency = float(antenna.efficiency)
+            self.antenna_temperature = float(antenna.physical_temperature)
+        self.beamwidth_deg = tolerances.beamwidth_deg
+        if self.beamwidth_deg is None and antenna is not None and antenna.diameter_m:
+            self.beamwidth_deg = BEAMWIDTH_FACTOR * SPEED_OF_LIGHT / frequency_hz / antenna.diameter_m
+        if tolerances.pointing_error_deg and not self.beamwidth_deg:
+            raise MonteCarloError("Pointing error needs an antenna diameter or a beamwidth_deg tolerance")
+
+    def margins(self, samples, rng):
+        """Draw samples of the link margin in dB."""
+        tolerances = self.tolerances
+        normal = rng.standard_normal
+        stages = len(self.gain_db)
+        # one environmental temperature offset per sample, shared by the antenna and the passive stages
+        temperature_offset = tolerances.physical_temperature_k * normal((samples, 1))
+        gain_db = self.gain_db + self.gain_sigma * normal((samples, stages))
+        noise_figure_db = np.maximum(self.noise_figure_db + self.noise_figure_sigma * normal((samples, stages)), 0.0)
+        active_temperature = REFERENCE_TEMPERATURE * (10.0 ** (noise_figure_db / 10.0) - 1.0)
+        passive_temperature = ((10.0 ** (np.maximum(-gain_db, 0.0) / 10.0) - 1.0)
+                               * np.maximum(self.physical_temperature + temperature_offset, 0.0))
+        noise_temperature = np.where(self.passive, passive_temperature, active_temperature)
+        cumulative_gain_db = np.cumsum(gain_db, axis=1)
+        gain_ahead = 10.0 ** ((cumulative_gain_db - gain_db) / 10.0)
+        receiver_temperature = np.sum(noise_temperature / gain_ahead, axis=1)
+
+        temperature_offset = temperature_offset[:, 0]
+        efficiency = np.clip(self.efficiency + tolerances.efficiency * normal(samples), 1e-3, 1.0)
+        antenna_gain_db = self.antenna_gain_db + 10.0 * np.log10(efficiency / self.efficiency)
+        if tolerances.pointing_error_deg:
+            # the error is a two dimensional offset from boresight; loss follows the main lobe's parabola
+            offset = tolerances.pointing_error_deg * np.hypot(normal(samples), normal(samples))
+            antenna_gain_db -= 12.0 * (offset / self.beamwidth_deg) ** 2
+        sky_temperature = np.maximum(self.sky_temperature + tolerances.sky_temperature_k * normal(samples), 0.0)
+        antenna_temperature = (efficiency * sky_temperature
+                               + (1.0 - efficiency) * np.maximum(self.antenna_temperature + temperature_offset, 0.0))
+        eirp_dbw = self.eirp_dbw + tolerances.eirp_db * normal(samples)
+        path_loss_db = self.path_loss_db + tolerances.path_loss_db * normal(samples)
+        g_over_t_db = antenna_gain_db - 10.0 * np.log10(antenna_temperature + receiver_temperature)
+        cn0_dbhz = eirp_dbw - path_loss_db - self.other_losses_db + g_over_t_db - BOLTZMANN_DB
+        return cn0_dbhz - self.required_cn0_dbhz
+
+
+def _run_batch(model, samples, seed, edges):
+    """Draw one batch and summarize it as histogram counts and moments."""
+    margins = model.margins(samples, np.random.default_rng(seed))
+    counts, _ = np.histogram(margins, edges)
+    return (counts, int(np.count_nonzero(margins < edges[0])), int(np.count_nonzero(margins > edges[-1])),
+            int(np.count_nonzero(margins < 0.0)), float(margins.sum()), float(np.square(margins).sum()),
+            float(margins.min()), float(margins.max()))
+
+
+class MonteCarloResult:
+    """The margin distribution of a Monte Carlo run.
+
+    Percentiles are read from the histogram and are accurate to one bin
+    width; the probability of a negative margin is counted exactly.
+    """
+    def __init__(self, samples, edges, counts, below, above, failures, mean, std, minimum, maximum):
+        self.samples = samples
+        self.edges = edges
+        self.counts = counts
+        self.below = below
+        self.above = above
+        self.failures = failures
+        self.mean = mean
+        self.std = std
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @property
+    def availability(self):
+        """The fraction of samples with a non-negative margin."""
+        return 1.0 - self.failures / self.samples
+
+    def percentile(self, percent):
+        """Return the margin below which percent of the samples fall."""
+        cumulative = self.below + np.concatenate(([0], np.cumsum(self.counts)))
+        target = percent / 100.0 * self.samples
+        if target <= self.below:
+            return self.minimum
+        if target >= cumulative[-1]:
+            return self.maximum
+        return float(np.interp(target, cumulative, self.edges))
+
+    def percentiles(self, percents=(1, 5, 50, 95, 99)):
+        """Return a {percent: margin} dictionary."""
+        return {percent: self.percentile(percent) for percent in percents}
+
+
+def _combine(samples, summaries, edges):
+    """Merge the summaries of batches of samples in total into one result."""
+    counts = np.sum([summary[0] for summary in summaries], axis=0)
+    total = sum(summary[4] for summary in summaries)
+    squares = sum(summary[5] for summary in summaries)
+    mean = total / samples
+    return MonteCarloResult(samples, edges, counts, sum(summary[1] for summary in summaries),
+                            sum(summary[2] for summary in summaries), sum(summary[3] for summary in summaries),
+                            mean, float(np.sqrt(max(squares / samples - mean * mean, 0.0))),
+                            min(summary[6] for summary in summaries), max(summary[7] for summary in summaries))
+
+
+def run_monte_carlo(chain, frequency_hz, link, tolerances, samples=1_000_000, seed=None, batch_size=100_000,
+                    workers=None, bins=400, progress=None):
+    """Draw samples of the link margin of a chain at one frequency.
+
+    workers is the number of processes, defaulting to the number of CPUs;
+    with one worker the batches run in this process. The same seed and
+    batch size give the same result for any number of workers.
+
+    progress, when given, is called after each batch with the result of
+    the samples drawn so far. An exception it raises stops the run, and
+    the batches not yet started are dropped.
+    """
+    if samples <= 0 or batch_size <= 0:
+        raise MonteCarloError("samples and batch_size must be positive")
+    model = MonteCarloModel(chain, float(frequency_hz), link, tolerances)
+    pilot_seed, batch_seed = np.random.SeedSequence(seed).spawn(2)
+    # a pilot batch sets the histogram range, padded so nearly every sample lands inside it
+    pilot = model.margins(min(samples, 20_000), np.random.default_rng(pilot_seed))
+    low, high = float(pilot.min()), float(pilot.max())
+    pad = max(high - low, 1e-6)
+    edges = np.linspace(low - pad, high + pad, bins + 1)
+    sizes = [batch_size] * (samples // batch_size) + ([samples % batch_size] if samples % batch_size else [])
+    seeds = batch_seed.spawn(len(sizes))
+    workers = workers or os.cpu_count() or 1
+    summaries = []
+    if workers == 1 or len(sizes) == 1:
+        for summary in map(_run_batch, repeat(model), sizes, seeds, repeat(edges)):
+            summaries.append(summary)
+            if progress is not None:
+                progress(_combine(sum(sizes[:len(summaries)]), summaries, edges))
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(sizes)),
+                                       mp_context=multiprocessing.get_context(START_METHOD))
+        try:
+            for summary in executor.map(_run_batch, repeat(model), sizes, seeds, repeat(edges),
+                                        chunksize=max(1, len(sizes) // (4 * workers))):
+                summaries.append(summary)
+                if progress is not None:
+                    progress(_combine(sum(sizes[:len(summaries)]), summaries, edges))
+        finally:
+            executor.shutdown(cancel_futures=True)
+    return _combine(samples, summaries, edges)
+
+
+def monte_carlo_from_json(chain, data, link, progress=None):
+    """Run the analysis described by a project's 'monte_carlo' section.
+
+    The section gives the 'frequency' as a value/unit pair, the 'samples',
+    an optional 'seed' and 'workers', and the 'tolerances'.
+    """
+    try:
+        value, unit = quantity(data["frequency"], "GHz")
+        frequency_hz = float(frequency_to_hz(value, unit))
+    except KeyError:
+        raise MonteCarloError("The monte_carlo section needs a frequency") from None
+    return run_monte_carlo(chain, frequency_hz, link, Tolerances.from_json(data.get("tolerances", {})),
+                           samples=int(data.get("samples", 1_000_000)), seed=data.get("seed"),
+                           batch_size=int(data.get("batch_size", 100_000)), workers=data.get("workers"),
+                           progress=progress)
@@ -0,0 +1,353 @@
+"""Parametric query index over device capabilities.
+
+Devices describe their frequency coverage with inconsistent keys
+('start'/'end' or 'min'/'max', 'unit' or 'units'). The index normalizes
+them once into intervals in Hz, kept in an interval tree, and keeps sorted
+indexes of scalar parameters such as gain and noise figure, so a query like
+"LNAs covering 8.0-8.4 GHz with NF < 1 dB and gain > 20 dB" only looks at
+the devices each condition selects.
+"""
+import bisect
+import operator
+import re
+
+from .model import parse_device
+from .units import UnitError, frequency_to_hz
+
+
+OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+             "=": operator.eq, "==": operator.eq}
+
+
+class QueryError(ValueError):
+    """Raised when a parametric query cannot be parsed."""
+
+
+def frequency_range(parameters):
+    """Return a device's (low, high) frequency coverage in Hz, or None."""
+    coverage = parse_device(None, parameters, tables={}).frequency_range
+    return None if coverage is None else tuple(coverage)
+
+
+# scalar fields of a parsed device that can be queried
+SCALAR_FIELDS = ("gain_db", "noise_figure_db", "loss_db", "efficiency", "diameter_m", "length_m")
+
+# short names accepted in text queries
+FIELD_ALIASES = {
+    "gain": "gain_db", "g": "gain_db",
+    "nf": "noise_figure_db", "noise": "noise_figure_db", "noise_figure": "noise_figure_db",
+    "loss": "loss_db", "attenuation": "loss_db",
+    "eff": "efficiency", "efficiency": "efficiency",
+    "diameter": "diameter_m", "length": "length_m",
+}
+
+
+def scalar_parameters(spec):
+    """Return the scalar fields a parsed device defines."""
+    values = {}
+    for field in SCALAR_FIELDS:
+        value = getattr(spec, field)
+        if value is not None:
+            values[field] = value
+    return values
+
+
+class _Node:
+    """A node of the interval tree: the intervals that contain its center point."""
+    __slots__ = ("center", "by_low", "by_high", "left", "right")
+
+    def __init__(self, center):
+        self.center = center
+        # (low, high, key) sorted by low, and (-high, low, key) sorted by decreasing high
+        self.by_low = []
+        self.by_high = []
+        self.left = None
+        self.right = None
+
+
+class IntervalTree:
+    """A centered interval tree answering which intervals contain a point or cover a range.
+
+    Intervals are inserted into and removed from the node whose center they
+    contain, so an edit costs a walk down the tree. The tree is rebuilt
+    around balanced centers once the number of edits since the last build
+    exceeds its size, which keeps it balanced at an amortized constant cost
+    per edit.
+    """
+    def __init__(self, intervals=None):
+        # key to (low, high)
+        self.intervals = dict(intervals or {})
+        self._build()
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def _build(self):
+        items = [(low, high, key) for key, (low, high) in self.intervals.items()]
+        self._root = self._build_node(items)
+        self._edits = 0
+
+    def _build_node(self, items):
+        if not items:
+            return None
+        endpoints = sorted(value for low, high, _ in items for value in (low, high))
+        node = _Node(endpoints[len(endpoints) // 2])
+        left, right = [], []
+        for item in items:
+            if item[1] < node.center:
+                left.append(item)
+            elif item[0] > node.center:
+                right.append(item)
+            else:
+                node.by_low.append(item)
+        node.by_low.sort()
+        node.by_high = sorted((-high, low, key) for low, high, key in node.by_low)
+        node.left = self._build_node(left)
+        node.right = self._build_node(right)
+        return node
+
+    def _find(self, low, high, create):
+        """Return the node whose center the interval contains, creating leaves if asked."""
+        if self._root is None:
+            if not create:
+                return None
+            self._root = _Node((low + high) / 2.0)
+        node = self._root
+        while True:
+            if high < node.center:
+                if node.left is None and create:
+                    node.left = _Node((low + high) / 2.0)
+                node = node.left
+            elif low > node.center:
+                if node.right is None and create:
+                    node.right = _Node((low + high) / 2.0)
+                node = node.right
+            else:
+                return node
+            if node is None:
+                return None
+
+    def add(self, key, low, high):
+        """Add or replace the interval of a key."""
+        self.remove(key)
+        self.intervals[key] = (low, high)
+        node = self._find(low, high, create=True)
+        bisect.insort(node.by_low, (low, high, key))
+        bisect.insort(node.by_high, (-high, low, key))
+        self._edited()
+
+    def remove(self, key):
+        """Remove the interval of a key, doing nothing if it has none."""
+        interval = self.intervals.pop(key, None)
+        if interval is None:
+            return
+        low, high = interval
+        node = self._find(low, high, create=False)
+        del node.by_low[bisect.bisect_left(node.by_low, (low, high, key))]
+        del node.by_high[bisect.bisect_left(node.by_high, (-high, low, key))]
+        self._edited()
+
+    def _edited(self):
+        self._edits += 1
+        if self._edits > len(self.intervals) + 64:
+            self._build()
+
+    def stab(self, point):
+        """Return the keys of the intervals containing a point."""
+        keys = set()
+        node = self._root
+        while node is not None:
+            if point < node.center:
+                for low, _, key in node.by_low:
+                    if low > point:
+                        break
+                    keys.add(key)
+                node = node.left
+            else:
+                for negative_high, _, key in node.by_high:
+                    if -negative_high < point:
+                        break
+                    keys.add(key)
+                node = node.right
+        return keys
+
+    def covering(self, low, high):
+        """Return the keys of the intervals that cover the whole range [low, high]."""
+        return {key for key in self.stab(low) if self.intervals[key][1] >= high}
+
+    def covers(self, key, low, high):
+        """Return True if the interval of a key covers the whole range [low, high]."""
+        interval = self.intervals.get(key)
+        return interval is not None and interval[0] <= low and interval[1] >= high
+
+
+class SortedIndex:
+    """A sorted list of (value, key) pairs answering range queries by bisection."""
+    def __init__(self, values=None):
+        # key to value
+        self._values = dict(values or {})
+        self._items = sorted((value, key) for key, value in self._values.items())
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, key, value):
+        self.remove(key)
+        bisect.insort(self._items, (value, key))
+        self._values[key] = value
+
+    def remove(self, key):
+        value = self._values.pop(key, None)
+        if value is not None:
+            del self._items[bisect.bisect_left(self._items, (value, key))]
+
+    def _bounds(self, comparison, value):
+        """Return the slice of items satisfying 'item comparison value'."""
+        if comparison == "<":
+            return 0, bisect.bisect_left(self._items, (value,))
+        if comparison == "<=":
+            return 0, bisect.bisect_right(self._items, (value, chr(0x10FFFF)))
+        if comparison == ">":
+            return bisect.bisect_right(self._items, (value, chr(0x10FFFF))), len(self._items)
+        if comparison == ">=":
+            return bisect.bisect_left(self._items, (value,)), len(self._items)
+        if comparison in ("=", "=="):
+            return bisect.bisect_left(self._items, (value,)), bisect.bisect_right(self._items, (value, chr(0x10FFFF)))
+        raise QueryError(f"Unknown comparison {comparison!r}")
+
+    def count(self, comparison, value):
+        start, end = self._bounds(comparison, value)
+        return end - start
+
+    def select(self, comparison, value):
+        start, end = self._bounds(comparison, value)
+        return {key for _, key in self._items[start:end]}
+
+    def test(self, key, comparison, value):
+        """Return True if the value of one key satisfies the condition."""
+        own = self._values.get(key)
+        if own is None:
+            return False
+        return OPERATORS[comparison](own, value)
+
+
+class ParametricIndex:
+    """Indexes of device kind, frequency coverage and scalar parameters, kept up to date per device."""
+    def __init__(self, devices=None):
+        self.kinds = {}
+        self._kind = {}
+        # the whole library is normalized first and each index is built in one go
+        coverage = {}
+        scalars = {field: {} for field in SCALAR_FIELDS}
+        for name, parameters in (devices or {}).items():
+            if not isinstance(parameters, dict):
+                continue
+            # tables are not indexed, so the parse skips compiling them
+            spec = parse_device(name, parameters, tables={})
+            self._add_kind(name, spec.kind)
+            if spec.frequency_range is not None:
+                coverage[name] = tuple(spec.frequency_range)
+            for field, value in scalar_parameters(spec).items():
+                scalars[field][name] = value
+        self.coverage = IntervalTree(coverage)
+        self.scalars = {field: SortedIndex(values) for field, values in scalars.items()}
+
+    def _add_kind(self, name, kind):
+        self._kind[name] = kind
+        self.kinds.setdefault(kind, set()).add(name)
+
+    def add(self, name, parameters):
+        """Index a new device, or re-index an edited one."""
+        self.remove(name)
+        if not isinstance(parameters, dict):
+            return
+        spec = parse_device(name, parameters, tables={})
+        self._add_kind(name, spec.kind)
+        if spec.frequency_range is not None:
+            self.coverage.add(name, *spec.frequency_range)
+        for field, value in scalar_parameters(spec).items():
+            self.scalars[field].add(name, value)
+
+    def remove(self, name):
+        """Remove a device from every index."""
+        kind = self._kind.pop(name, None)
+        if kind is None:
+            return
+        self.kinds[kind].discard(name)
+        self.coverage.remove(name)
+        for index in self.scalars.values():
+            index.remove(name)
+
+    def _conditions(self, kind, covers, where):
+        """Return (estimated size, select all matches, test one name) for each condition of a query."""
+        conditions = []
+        if kind is not None:
+            conditions.append((len(self.kinds.get(kind, ())), lambda: set(self.kinds.get(kind, ())),
+                               lambda name: self._kind.get(name) == kind))
+        for field, comparison, value in where:
+            if field not in self.scalars:
+                raise QueryError(f"Unknown parameter {field!r}")
+            if comparison not in OPERATORS:
+                raise QueryError(f"Unknown operator {comparison!r}")
+            index = self.scalars[field]
+            conditions.append((index.count(comparison, value),
+                               lambda index=index, comparison=comparison, value=value: index.select(comparison, value),
+                               lambda name, index=index, comparison=comparison, value=value: index.test(name, comparison, value)))
+        if covers is not None:
+            conditions.append((len(self.coverage), lambda: self.coverage.covering(*covers),
+                               lambda name: self.coverage.covers(name, *covers)))
+        return conditions
+
+    def query(self, kind=None, covers=None, where=()):
+        """Return the sorted names of the devices matching every given condition.
+
+        kind is a device kind such as 'lna', covers a (low, high) range in Hz
+        the device must cover, and where a sequence of (field, operator,
+        value) conditions on the scalar fields, e.g. ('noise_figure_db', '<', 1).
+        Only the most selective condition is answered from its index; the
+        others are tested on its result.
+        """
+        conditions = self._conditions(kind, covers, where)
+        if not conditions:
+            return sorted(self._kind)
+        conditions.sort(key=lambda condition: condition[0])
+        result = conditions[0][1]()
+        for _, _, test in conditions[1:]:
+            result = [name for name in result if test(name)]
+        return sorted(result)
+
+    def matches(self, name, kind=None, covers=None, where=()):
+        """Return True if one indexed device matches every given condition."""
+        return name in self._kind and all(test(name) for _, _, test in self._conditions(kind, covers, where))
+
+
+_RANGE = re.compile(r"^(?P<low>[\d.]+)(?:-(?P<high>[\d.]+))?(?P<unit>[a-zA-Z]*hz)?$", re.IGNORECASE)
+_CONDITION = re.compile(r"^(?P<field>[a-zA-Z_]+)\s*(?P<operator><=|>=|==|<|>|=)\s*(?P<value>-?[\d.]+)$")
+
+
+def parse_query(text, default_unit="GHz"):
+    """Parse a text query such as 'lna 8.0-8.4GHz nf<1 gain>20' into ParametricIndex.query arguments."""
+    arguments = {"kind": None, "covers": None, "where": []}
+    # allow spaces around operators by gluing them to their operands
+    text = re.sub(r"\s*(<=|>=|==|<|>|=)\s*", r"\1", text.strip())
+    for token in text.split():
+        condition = _CONDITION.match(token)
+        if condition:
+            field = FIELD_ALIASES.get(condition["field"].lower(), condition["field"].lower())
+            arguments["where"].append((field, condition["operator"], float(condition["value"])))
+            continue
+        frequencies = _RANGE.match(token)
+        if frequencies:
+            unit = frequencies["unit"] or default_unit
+            try:
+                low = float(frequency_to_hz(float(frequencies["low"]), unit))
+                high = float(frequency_to_hz(float(frequencies["high"] or frequencies["low"]), unit))
+            except (ValueError, UnitError) as e:
+                raise QueryError(str(e)) from e
+            arguments["covers"] = (min(low, high), max(low, high))
+            continue
+        if token.isalpha():
+            arguments["kind"] = token.lower()
+            continue
+        raise QueryError(f"Cannot understand {token!r}")
+    return arguments
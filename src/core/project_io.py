@@ -0,0 +1,258 @@
+"""Streaming access to large project files.
+
+A project file is memory mapped and only its structure is scanned: the
+spans of the top level sections, and of the elements of a section when it
+is first used. Sections are parsed, and devices and bulk data arrays
+materialized, on first access, so opening a project costs one pass of a
+tokenizer that skips over numbers, and memory grows with what is viewed.
+"""
+import json
+import mmap
+import os
+import re
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+# strings (with escapes) and brackets are the only tokens the structure scan needs
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]')
+_WHITESPACE = b" \t\r\n"
+# everything a flat array of numbers is made of
+_NUMBER_BYTES = b"0123456789+-.eE,\t\r\n "
+# how often, in bytes, the scan reports progress
+PROGRESS_STEP = 16 * 1024 * 1024
+
+
+class ProjectFormatError(ValueError):
+    """Raised when a project file is not a well formed json object."""
+
+
+class ProjectFile(Mapping):
+    """A read only, lazily parsed view of a json project file.
+
+    Indexing by a top level key parses that section on first access and
+    caches it. sequence() exposes an array section element by element and
+    array() reads numeric data straight into NumPy arrays.
+    """
+    def __init__(self, path, progress=None):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size == 0:
+                raise ProjectFormatError(f"{path} is empty")
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        self._containers = {}
+        self._values = {}
+        self._arrays = {}
+        start = self._skip_whitespace(0)
+        if self._buffer[start:start + 1] != b"{":
+            self.close()
+            raise ProjectFormatError(f"{path} does not contain a json object")
+        self._root = start
+        self._sections = self._container(start, progress)
+        if progress is not None:
+            progress(size, size)
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            start, end = self._sections[key]
+            self._values[key] = self._parse(start, end)
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __contains__(self, key):
+        return key in self._sections
+
+    def size(self, key):
+        """Return the size in bytes of a section in the file."""
+        start, end = self._sections[key]
+        return end - start
+
+    def sequence(self, key, factory=None):
+        """Return an array section as a lazy sequence, building each element with factory on first access."""
+        start, _ = self._sections[key]
+        if self._buffer[start:start + 1] != b"[":
+            raise ProjectFormatError(f"Section {key!r} is not an array")
+        return LazySequence(self, self._container(start), factory)
+
+    def array(self, *path, dtype=float):
+        """Read a numeric array, addressed by keys and indices from the top level, into a NumPy array.
+
+        Flat arrays are converted by NumPy's text parser without building
+        Python numbers; arrays of arrays become 2D arrays.
+        """
+        if path not in self._arrays:
+            start, end = self._locate(path)
+            self._arrays[path] = self._numbers(start, end, dtype, path)
+        return self._arrays[path]
+
+    def close(self):
+        """Unmap and close the file; sections already parsed stay available."""
+        self._buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _skip_whitespace(self, position):
+        buffer = self._buffer
+        while buffer[position:position + 1] and buffer[position:position + 1] in _WHITESPACE:
+            position += 1
+        return position
+
+    def _parse(self, start, end):
+        try:
+            return json.loads(self._buffer[start:end])
+        except ValueError as e:
+            raise ProjectFormatError(f"{self.path}: bad json at byte {start}: {e}") from e
+
+    def _locate(self, path):
+        """Return the span of the value found by following path from the top level object."""
+        start, end = self._root, None
+        for step in path:
+            if self._buffer[start:start + 1] not in (b"{", b"["):
+                raise KeyError(path)
+            children = self._container(start)
+            try:
+                start, end = children[step]
+            except (KeyError, IndexError, TypeError):
+                raise KeyError(path) from None
+        return start, end
+
+    def _numbers(self, start, end, dtype, path):
+        buffer = self._buffer
+        if buffer[start:start + 1] != b"[":
+            raise ProjectFormatError(f"{path} is not an array")
+        first = self._skip_whitespace(start + 1)
+        if buffer[first:first + 1] == b"[":
+            rows = [self._numbers(row_start, row_end, dtype, path) for row_start, row_end in self._container(start)]
+            return np.vstack(rows) if rows else np.empty((0, 0), dtype=dtype)
+        text = buffer[start + 1:end - 1]
+        if not text.strip():
+            return np.empty(0, dtype=dtype)
+        try:
+            values = np.fromstring(text, dtype=dtype, sep=",")
+        except ValueError:
+            values = None
+        # older NumPy versions stop quietly at the first bad entry, so the count is checked too
+        if values is None or values.size != text.count(b",") + 1:
+            raise ProjectFormatError(f"{path} is not an array of numbers")
+        return values
+
+    def _container(self, start, progress=None):
+        """Index the object or array starting at start.
+
+        Objects map each key to the span of its value and arrays list the
+        spans of their object and array elements; arrays that are values of
+        an indexed object are indexed in the same pass. The scan only visits
+        strings and brackets, and jumps over flat arrays of numbers.
+        """
+        if start in self._containers:
+            return self._containers[start]
+        buffer = self._buffer
+        is_object = buffer[start:start + 1] == b"{"
+        children = {} if is_object else []
+        depth = 0
+        key = None
+        value_start = None
+        elements = None
+        element_start = None
+        next_report = start + PROGRESS_STEP
+        position = start
+        while True:
+            token = _TOKEN.search(buffer, position)
+            if token is None:
+                break
+            text = token.group()
+            position = token.end()
+            first = text[:1]
+            if first == b'"':
+                if depth == 1 and is_object:
+                    after = self._skip_whitespace(position)
+                    if buffer[after:after + 1] == b":":
+                        if key is not None:
+                            children[key] = (value_start, self._value_end(value_start, token.start()))
+                        key = json.loads(text)
+                        value_start = self._skip_whitespace(after + 1)
+                continue
+            if first in b"{[":
+                depth += 1
+                if depth == 2 and not is_object:
+                    value_start = token.start()
+                elif depth == 2 and first == b"[":
+                    # the elements of arrays held by an object, like a project's devices, are indexed in the same pass
+                    elements = []
+                elif depth == 3 and elements is not None:
+                    element_start = token.start()
+                if first == b"[":
+                    # a flat array of numbers is skipped in one step, up to its closing bracket
+                    close = buffer.find(b"]", position)
+                    if close > 0 and not buffer[position:close].translate(None, _NUMBER_BYTES):
+                        position = close
+            else:
+                depth -= 1
+                if depth == 1 and not is_object:
+                    children.append((value_start, position))
+                elif depth == 2 and elements is not None:
+                    elements.append((element_start, position))
+                elif depth == 1 and elements is not None:
+                    self._containers[value_start] = elements
+                    elements = None
+                elif depth == 0:
+                    if key is not None:
+                        children[key] = (value_start, self._value_end(value_start, token.start()))
+                    self._containers[start] = children
+                    return children
+            if progress is not None and position >= next_report:
+                progress(position, len(buffer))
+                next_report = position + PROGRESS_STEP
+        raise ProjectFormatError(f"{self.path}: unterminated json at byte {start}")
+
+    def _value_end(self, value_start, limit):
+        """Return the end of the value starting at value_start, given the start of whatever follows it."""
+        end = limit
+        while end > value_start and self._buffer[end - 1:end] in (b" ", b"\t", b"\r", b"\n", b","):
+            end -= 1
+        return end
+
+
+class LazySequence(Sequence):
+    """The elements of an array section, parsed and built only when accessed."""
+    def __init__(self, project_file, spans, factory=None):
+        self._file = project_file
+        self._spans = spans
+        self._factory = factory
+        self._items = {}
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index not in self._items:
+            data = self._file._parse(*self._spans[index])
+            self._items[index] = self._factory(data) if self._factory is not None else data
+        return self._items[index]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def materialized(self):
+        """Return how many elements have been built so far."""
+        return len(self._items)
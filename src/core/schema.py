@@ -0,0 +1,209 @@
+"""Schemas of the device types and their compiled validators.
+
+A schema lists the parameters a device type requires and accepts, each
+with a value type. compile_schema turns one into a validator, a function
+that checks a device's parameters with a dictionary lookup and a prebuilt
+check per parameter, so validate_library checks a whole library in one
+pass at load. Problems are reported as messages per device, like the
+table problems, and never raised.
+"""
+from .interpolation import FREQUENCY_KEYS, MISSPELLED_FREQUENCY_KEYS, is_point_table
+from .model import classify_device
+from .units import ANGLE_UNITS, DISTANCE_UNITS, FREQUENCY_UNITS, LOSS_UNITS, unit_of
+
+# parameters any device may carry besides those of its type
+COMMON_PARAMETERS = {"type": "string", "description": "string", "notes": "string", "manufacturer": "string",
+                     "model": "string", "part_number": "string", "frequency_range": "frequency_range"}
+# units accepted by the quantity value types, keyed by lower case unit name
+QUANTITY_UNITS = {
+    "db": LOSS_UNITS,
+    "distance": DISTANCE_UNITS,
+    "frequency": FREQUENCY_UNITS,
+    "temperature": {"k": 1, "kelvin": 1, "c": 1, "degc": 1, "celsius": 1, "f": 1, "degf": 1, "fahrenheit": 1},
+}
+# value types a table point may give its attenuation in
+TABLE_UNITS = {"db", "db/m", "db/100m", "db/100ft", "db/ft", "db/km"}
+
+# required and optional parameters of each device type, with their value types
+SCHEMAS = {
+    "antenna": {"required": {"gain": "db"},
+                "optional": {"efficiency": "percent", "diameter": "distance", "location": "location"}},
+    "lna": {"required": {"Gain": "db"},
+            "optional": {"Noise_Figure": "db", "Temperature": "temperature"}},
+    "cable": {"required": {"attenuation": "table"},
+              "optional": {"length": "distance"}},
+    "attenuator": {"required": {"attenuation": "db"},
+                   "optional": {}},
+    # the attenuation of a splitter, combiner or switch is its insertion loss on top of any split
+    "splitter": {"required": {}, "optional": {"ports": "count", "attenuation": "db"}},
+    "combiner": {"required": {}, "optional": {"ports": "count", "attenuation": "db"}},
+    "switch": {"required": {}, "optional": {"ports": "count", "attenuation": "db"}},
+}
+
+# the value types a device editor can show
+EDITABLE_TYPES = (bool, int, float, str, dict)
+
+
+def _is_number(value):
+    return type(value) in (int, float)
+
+
+def _string(value):
+    return None if type(value) is str else "expected a string"
+
+
+def _percent(value):
+    if type(value) is dict and "value" in value:
+        value = value["value"]
+    if not _is_number(value):
+        return "expected a number"
+    if not 0 <= value <= 100:
+        return f"{value} is not a fraction or a percentage"
+    return None
+
+
+def _quantity(units, default_unit):
+    """Build the check of a bare number or a value/unit dictionary whose unit is in units."""
+    def check(value):
+        if _is_number(value):
+            return None
+        if type(value) is not dict or "value" not in value:
+            return "expected a number or a value with a unit"
+        if not _is_number(value["value"]):
+            return f"value {value['value']!r} is not a number"
+        unit = unit_of(value, default_unit)
+        if str(unit).strip().lower() not in units:
+            return f"unknown unit {unit!r}"
+        return None
+    return check
+
+
+def _count(value):
+    return None if type(value) is int and value >= 1 else "expected a positive whole number"
+
+
+def _frequency_range(value):
+    if type(value) is not dict:
+        return "expected start/end or min/max"
+    low = value.get("start", value.get("min"))
+    high = value.get("end", value.get("max"))
+    if not (_is_number(low) and _is_number(high)):
+        return "expected numeric start/end or min/max"
+    if str(unit_of(value, "Hz")).strip().lower() not in FREQUENCY_UNITS:
+        return f"unknown unit {unit_of(value)!r}"
+    return None
+
+
+def _location(value):
+    if type(value) is not dict:
+        return "expected lat, lon and alt"
+    latitude, longitude = value.get("lat"), value.get("lon")
+    if not (_is_number(latitude) and _is_number(longitude)):
+        return "expected numeric lat and lon"
+    if str(unit_of(value, "deg")).strip().lower() not in ANGLE_UNITS:
+        return f"unknown unit {unit_of(value)!r}"
+    if unit_of(value, "deg") in ("deg", "degree", "degrees") and not -90 <= latitude <= 90:
+        return f"latitude {latitude} is out of range"
+    if "alt" in value and not _is_number(value["alt"]):
+        return "alt is not a number"
+    return None
+
+
+def _table(value):
+    if not is_point_table(value):
+        return "expected a table of frequency points"
+    problems = []
+    for point_name, point in value.items():
+        if type(point) is not dict:
+            problems.append(f"{point_name} is not a point")
+            continue
+        frequency_key = next((key for key in FREQUENCY_KEYS if key in point), None)
+        if frequency_key is None:
+            misspelled = next((key for key in MISSPELLED_FREQUENCY_KEYS if key in point), None)
+            problems.append(f"{point_name} has misspelled frequency key {misspelled!r}" if misspelled
+                            else f"{point_name} has no frequency")
+        elif not _is_number(point[frequency_key]):
+            problems.append(f"{point_name} frequency is not a number")
+        if str(point.get("units", "Hz")).strip().lower() not in FREQUENCY_UNITS:
+            problems.append(f"{point_name} has unknown frequency unit {point.get('units')!r}")
+        if str(point.get("unit", "dB")).strip().lower() not in TABLE_UNITS:
+            problems.append(f"{point_name} has unknown unit {point.get('unit')!r}")
+    return "; ".join(problems) or None
+
+
+# value type name -> check returning a problem message or None
+CHECKS = {
+    "string": _string,
+    "count": _count,
+    "percent": _percent,
+    "frequency_range": _frequency_range,
+    "location": _location,
+    "table": _table,
+}
+CHECKS.update({name: _quantity(units, {"db": "dB", "distance": "m", "frequency": "Hz", "temperature": "K"}[name])
+               for name, units in QUANTITY_UNITS.items()})
+
+
+def compile_schema(kind, schema):
+    """Compile a schema into a validator returning the problems of a device's parameters."""
+    required = tuple(schema["required"])
+    checks = {key: CHECKS[value_type] for key, value_type in COMMON_PARAMETERS.items()}
+    checks.update((key, CHECKS[value_type]) for key, value_type in schema["required"].items())
+    checks.update((key, CHECKS[value_type]) for key, value_type in schema["optional"].items())
+
+    def validate(parameters):
+        problems = [f"{key}: missing for a {kind}" for key in required if key not in parameters]
+        for key, value in parameters.items():
+            check = checks.get(key)
+            if check is None:
+                problems.append(f"{key}: not a parameter of a {kind}")
+                continue
+            problem = check(value)
+            if problem is not None:
+                problems.append(f"{key}: {problem}")
+        return problems
+    validate.kind = kind
+    return validate
+
+
+# the compiled validators, built once at import
+VALIDATORS = {kind: compile_schema(kind, schema) for kind, schema in SCHEMAS.items()}
+
+
+def unsupported_values(parameters, path=""):
+    """Return the paths of values, such as lists or nulls, that the device editor cannot show."""
+    found = []
+    for key, value in parameters.items():
+        if type(value) is dict:
+            found.extend(unsupported_values(value, f"{path}{key}."))
+        elif type(value) not in EDITABLE_TYPES:
+            found.append(f"{path}{key}")
+    return found
+
+
+def validate_device(parameters):
+    """Return the problems of one device's parameters."""
+    if type(parameters) is not dict:
+        return ["not a parameter object"]
+    kind = classify_device(parameters)
+    validator = VALIDATORS.get(kind)
+    if validator is not None:
+        problems = validator(parameters)
+    elif kind == "reference":
+        problems = []
+    elif kind == "unknown":
+        problems = ["cannot tell the device type from its parameters"]
+    else:
+        problems = [f"type: unknown device type {parameters['type']!r}"]
+    problems.extend(f"{path}: unsupported value type" for path in unsupported_values(parameters))
+    return problems
+
+
+def validate_library(library):
+    """Validate every device of a library in one pass and return {device name: problems} for the bad ones."""
+    problems = {}
+    for name, parameters in library.get("devices", {}).items():
+        device_problems = validate_device(parameters)
+        if device_problems:
+            problems[name] = device_problems
+    return problems
@@ -0,0 +1,171 @@
+"""Type-ahead search index over device names and parameter keys.
+
+Devices are kept sorted by name with their name and parameter keys flattened
+into one string, so a broad query is a single pass of substring checks in C.
+Selective queries are narrowed first with trigram posting lists over the
+names and a key vocabulary. Devices are added and removed one at a time,
+so the index follows library edits without being rebuilt.
+"""
+import bisect
+from itertools import compress, repeat
+from operator import contains
+
+
+def trigrams(text):
+    """Return the set of three character substrings of text."""
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def parameter_keys(parameters):
+    """Return the lower case keys of a device's parameters, including nested ones."""
+    keys = set()
+    stack = [parameters]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            for key, item in value.items():
+                keys.add(str(key).lower())
+                stack.append(item)
+    return keys
+
+
+class DeviceSearchIndex:
+    """An incrementally maintained index answering type-ahead queries over a device library.
+
+    A query matches a device when it is a case insensitive substring of the
+    device name or of one of its parameter keys. Results are sorted by name.
+    """
+    # queries whose narrowest posting list is larger than this fraction of the library are scanned
+    SCAN_FRACTION = 1 / 16
+
+    def __init__(self, devices=None):
+        # parallel lists sorted by (lower case name, name): the sort keys, the names, and a
+        # haystack of the lower case name and parameter keys that one substring check can test
+        self._order = []
+        self._names = []
+        self._haystacks = []
+        self._haystack = {}
+        self._name_trigrams = {}
+        # parameter key to the names of the devices carrying it
+        self._key_devices = {}
+        self._last_query = None
+        self._last_result = None
+        if devices:
+            self.rebuild(devices)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._haystack
+
+    def rebuild(self, devices):
+        """Index a whole {name: parameters} dictionary at once."""
+        self.__init__()
+        self._order = sorted((str(name).lower(), name) for name in devices)
+        self._names = [name for _, name in self._order]
+        for lower, name in self._order:
+            self._index(name, lower, devices[name])
+        self._haystacks = [self._haystack[name] for name in self._names]
+
+    def _index(self, name, lower, parameters):
+        keys = sorted(parameter_keys(parameters)) if isinstance(parameters, dict) else []
+        self._haystack[name] = "\n".join([lower] + keys)
+        for trigram in trigrams(lower):
+            self._name_trigrams.setdefault(trigram, set()).add(name)
+        for key in keys:
+            self._key_devices.setdefault(key, set()).add(name)
+
+    def add(self, name, parameters):
+        """Index a new device, or re-index an edited one."""
+        self.remove(name)
+        lower = str(name).lower()
+        position = bisect.bisect_left(self._order, (lower, name))
+        self._index(name, lower, parameters)
+        self._order.insert(position, (lower, name))
+        self._names.insert(position, name)
+        self._haystacks.insert(position, self._haystack[name])
+        self._last_query = None
+
+    def remove(self, name):
+        """Remove a device from the index, doing nothing if it is not indexed."""
+        haystack = self._haystack.pop(name, None)
+        if haystack is None:
+            return
+        lower, *keys = haystack.split("\n")
+        position = bisect.bisect_left(self._order, (lower, name))
+        del self._order[position]
+        del self._names[position]
+        del self._haystacks[position]
+        for trigram in trigrams(lower):
+            names = self._name_trigrams[trigram]
+            names.discard(name)
+            if not names:
+                del self._name_trigrams[trigram]
+        for key in keys:
+            names = self._key_devices[key]
+            names.discard(name)
+            if not names:
+                del self._key_devices[key]
+        self._last_query = None
+
+    def matches(self, name, query):
+        """Return True if an indexed device matches a query."""
+        haystack = self._haystack.get(name)
+        return haystack is not None and query.strip().lower() in haystack
+
+    def names(self):
+        """Return every indexed name in sorted order."""
+        return list(self._names)
+
+    def position(self, name):
+        """Return the position of a name in the sorted order of all names."""
+        return bisect.bisect_left(self._order, (self._haystack[name].partition("\n")[0], name))
+
+    def _candidates(self, query):
+        """Return a small candidate set for a query, or None when scanning everything is cheaper."""
+        limit = len(self._names) * self.SCAN_FRACTION
+        if len(query) < 3:
+            return None
+        postings = sorted((self._name_trigrams.get(trigram, ()) for trigram in trigrams(query)), key=len)
+        if len(postings[0]) > limit:
+            return None
+        candidates = set(postings[0]).intersection(*postings[1:])
+        for key, names in self._key_devices.items():
+            if query in key:
+                if len(names) > limit:
+                    return None
+                candidates |= names
+        return candidates
+
+    def _filter(self, names, haystacks, query):
+        """Return the names and haystacks containing query.
+
+        The whole filter runs in C: one substring check per device and a
+        compress over the names.
+        """
+        mask = list(map(contains, haystacks, repeat(query)))
+        return list(compress(names, mask)), list(compress(haystacks, mask))
+
+    def search(self, query):
+        """Return the sorted names of the devices matching a query; an empty query returns all.
+
+        When a query extends the previous one only the previous results are
+        re-checked, which keeps typing ahead cheap.
+        """
+        query = query.strip().lower()
+        if not query:
+            return self.names()
+        if self._last_query and query.startswith(self._last_query):
+            result = self._filter(*self._last_result, query)
+        else:
+            candidates = self._candidates(query)
+            if candidates is None:
+                result = self._filter(self._names, self._haystacks, query)
+            else:
+                order = sorted((self._haystack[name].partition("\n")[0], name) for name in candidates)
+                names = [name for _, name in order]
+                result = self._filter(names, [self._haystack[name] for name in names], query)
+        self._last_query = query
+        self._last_result = result
+        return list(result[0])
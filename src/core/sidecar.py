@@ -0,0 +1,114 @@
+"""A binary cache of the prepared device library, kept in a per-user cache folder.
+
+Parsing a large device_library.json and then compiling, validating and
+indexing it is most of the startup time. The sidecar stores the library
+together with what was prepared from it as one pickle, behind a small
+header holding the hash of the source it was made from. On the next load
+the source is only hashed: when it is unchanged the pickle is loaded
+instead, otherwise the library is parsed and prepared again and the
+sidecar rewritten.
+
+Sidecars are pickles, so they must only be kept in a trusted folder. The
+library folder may be shared with others, so sidecars are kept in the
+user's own cache folder instead, named by a hash of the library's path.
+"""
+import gc
+import hashlib
+import os
+import pickle
+import tempfile
+
+# bump when the shape of the prepared data changes, so older sidecars are rebuilt
+SIDECAR_FORMAT = 1
+SIDECAR_SUFFIX = ".cache"
+
+_LOAD_ERRORS = (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError)
+
+
+def user_cache_folder():
+    """Return the folder of this user's caches: LOCALAPPDATA on Windows, XDG_CACHE_HOME or ~/.cache elsewhere."""
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        root = os.environ["LOCALAPPDATA"]
+    else:
+        root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "link_engineering")
+
+
+def sidecar_path(store, folder=None):
+    """Return the sidecar path of a file backed store, or None for a store without a source digest.
+
+    folder defaults to the user's cache folder.
+    """
+    if store.path is None or not store.digests:
+        return None
+    key = hashlib.sha256(os.path.abspath(store.path).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(folder or user_cache_folder(), f"library-{key}{SIDECAR_SUFFIX}")
+
+
+def _load_payload(f):
+    # a large object graph loads markedly faster without the collector scanning it as it grows
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.load(f)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def write_sidecar(path, digest, library, prepared):
+    """Atomically write the sidecar of a library whose source has digest."""
+    # the folder is private to the user, since whoever can write a sidecar can run code through it
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=SIDECAR_SUFFIX, dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((SIDECAR_FORMAT, digest), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump((library, prepared), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_prepared(store, prepare, folder=None):
+    """Return (library, prepared, cached) for a store, where prepared is prepare(library).
+
+    cached is True when both came from the sidecar, kept in folder or the
+    user's cache folder. A missing, damaged or
+    outdated sidecar is rebuilt; one that cannot be written is skipped.
+    Raises what store.read_changed raises, FileNotFoundError for a missing
+    library among them.
+    """
+    path = sidecar_path(store, folder)
+    if path is None:
+        library = store.load()
+        return library, prepare(library), False
+    f = None
+    digest = None
+    try:
+        f = open(path, "rb")
+        header = pickle.load(f)
+        if type(header) is tuple and len(header) == 2 and header[0] == SIDECAR_FORMAT:
+            digest = header[1]
+    except _LOAD_ERRORS:
+        pass
+    try:
+        library, new_digest = store.read_changed(digest)
+        if library is None:
+            # the handle still reads the sidecar whose header matched, even if it was replaced since
+            try:
+                library, prepared = _load_payload(f)
+                return library, prepared, True
+            except _LOAD_ERRORS:
+                library, new_digest = store.read_changed(None)
+    finally:
+        if f is not None:
+            f.close()
+    prepared = prepare(library)
+    try:
+        write_sidecar(path, new_digest, library, prepared)
+    except (OSError, pickle.PicklingError):
+        pass
+    return library, prepared, False
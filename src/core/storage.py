@@ -0,0 +1,447 @@
+"""Storage backends for the device library.
+
+The library used to live in one device_library.json that was rewritten in
+full on every edit. Stores expose per-device upsert and delete so that a
+backend can make an edit cost O(1), and every write is atomic so a crash
+never leaves a half written library behind. The default backend keeps one
+file per device plus a manifest; device_library.json remains the import
+and export format, and a library found only in that form is migrated.
+
+A devices folder may be shared, so the checked writes take the version,
+a content hash, of the device an edit was based on and refuse to replace
+a device someone else has changed since.
+"""
+import hashlib
+import json
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import tempfile
+import threading
+
+JSON_LIBRARY_NAME = "device_library.json"
+SQLITE_LIBRARY_NAME = "device_library.sqlite"
+FOLDER_LIBRARY_NAME = "device_library"
+MANIFEST_NAME = "manifest.json"
+DEFAULT_BACKEND = "folder"
+BACKENDS = ("folder", "json", "sqlite")
+
+
+class StorageError(Exception):
+    """Raised when the device library cannot be read or written."""
+
+
+class VersionConflict(StorageError):
+    """Raised by a checked write when the stored device is not the version the edit was based on."""
+    def __init__(self, name, current):
+        super().__init__(f"Device {name!r} was changed in the library by someone else")
+        self.name = name
+        # the stored data, or None if the device was deleted
+        self.current = current
+
+
+def device_version(data):
+    """Return the version of a device's data, a hash of its content, or None for a missing device."""
+    if data is None:
+        return None
+    text = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def check_version(name, current, expected_version):
+    """Raise VersionConflict unless the stored data current has the expected version."""
+    if device_version(current) != expected_version:
+        raise VersionConflict(name, current)
+
+
+def atomic_write_json(path, data, indent=4):
+    """Write json to a temporary file next to path and atomically replace path with it."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class LibraryStore(ABC):
+    """Base class of the device library storage backends.
+
+    A library is the dictionary found in device_library.json: a 'devices'
+    dictionary of device name to parameters, plus any other top level keys.
+    """
+    path = None
+    # whether read_changed returns content digests, so unchanged content can be recognised without parsing it
+    digests = False
+
+    @abstractmethod
+    def load(self):
+        """Return the whole library dictionary."""
+
+    @abstractmethod
+    def upsert(self, name, data):
+        """Insert or replace one device."""
+
+    @abstractmethod
+    def delete(self, name):
+        """Remove one device, doing nothing if it does not exist."""
+
+    @abstractmethod
+    def save_all(self, library):
+        """Replace the whole library."""
+
+    def upsert_checked(self, name, data, expected_version):
+        """Insert or replace one device if the stored one still has expected_version, None when it is new."""
+        check_version(name, self.load().get("devices", {}).get(name), expected_version)
+        self.upsert(name, data)
+
+    def delete_checked(self, name, expected_version):
+        """Remove one device if the stored one still has expected_version."""
+        check_version(name, self.load().get("devices", {}).get(name), expected_version)
+        self.delete(name)
+
+    def signature(self):
+        """Return a cheap value that changes when the stored library may have been changed by someone else."""
+        return None
+
+    def read_changed(self, digest=None):
+        """Return (library, digest) when the stored content differs from digest, else (None, digest)."""
+        return self.load(), None
+
+    def import_json(self, path):
+        """Replace the library with the contents of a device_library.json file."""
+        with open(path, "r") as f:
+            self.save_all(json.load(f))
+
+    def export_json(self, path):
+        """Write the library to a file in the device_library.json format."""
+        atomic_write_json(path, self.load())
+
+    def close(self):
+        """Release any resources held by the store."""
+
+
+class JsonLibraryStore(LibraryStore):
+    """The original single file backend; every edit rewrites the file, but atomically."""
+    digests = True
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def upsert(self, name, data):
+        library = self._load_or_empty()
+        library.setdefault("devices", {})[name] = data
+        self.save_all(library)
+
+    def delete(self, name):
+        library = self._load_or_empty()
+        if library.get("devices", {}).pop(name, None) is not None:
+            self.save_all(library)
+
+    def save_all(self, library):
+        atomic_write_json(self.path, library)
+
+    def upsert_checked(self, name, data, expected_version):
+        # the check and the write are one read and one atomic replace, not a lock
+        library = self._load_or_empty()
+        devices = library.setdefault("devices", {})
+        check_version(name, devices.get(name), expected_version)
+        devices[name] = data
+        self.save_all(library)
+
+    def delete_checked(self, name, expected_version):
+        library = self._load_or_empty()
+        devices = library.get("devices", {})
+        check_version(name, devices.get(name), expected_version)
+        if devices.pop(name, None) is not None:
+            self.save_all(library)
+
+    def signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def read_changed(self, digest=None):
+        # a rewrite with the same content, or a touch, has the same hash and is not reloaded
+        with open(self.path, "rb") as f:
+            content = f.read()
+        new_digest = hashlib.sha1(content).hexdigest()
+        if new_digest == digest:
+            return None, digest
+        return json.loads(content), new_digest
+
+    def _load_or_empty(self):
+        try:
+            return self.load()
+        except FileNotFoundError:
+            return {"devices": {}}
+
+
+class FolderLibraryStore(LibraryStore):
+    """One json file per device in a folder, so an edit rewrites only that device's file.
+
+    Device files are named by a hash of the device name and hold the name
+    and the data. The manifest keeps the device order and the top level
+    keys other than 'devices', in order; only adding or removing a device rewrites
+    it, and a device file the manifest does not list yet, such as one
+    added by a colleague at the same time, is loaded after the listed ones.
+    """
+    digests = True
+
+    def __init__(self, path):
+        self.path = path
+        self.devices_path = os.path.join(path, "devices")
+        self.manifest_path = os.path.join(path, MANIFEST_NAME)
+
+    def device_path(self, name):
+        key = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        return os.path.join(self.devices_path, f"{key}.json")
+
+    def load(self):
+        manifest = self._manifest()
+        if manifest is None:
+            raise FileNotFoundError(self.manifest_path)
+        return self._library(manifest, self._device_files())
+
+    def upsert(self, name, data):
+        self._write_device(name, data)
+
+    def delete(self, name):
+        self._remove_device(name)
+
+    def upsert_checked(self, name, data, expected_version):
+        # the check and the write touch only this device's file; like the json store, this is not a lock
+        check_version(name, self._read_device(name), expected_version)
+        self._write_device(name, data)
+
+    def delete_checked(self, name, expected_version):
+        check_version(name, self._read_device(name), expected_version)
+        self._remove_device(name)
+
+    def save_all(self, library):
+        devices = library.get("devices", {})
+        os.makedirs(self.devices_path, exist_ok=True)
+        for name, data in devices.items():
+            atomic_write_json(self.device_path(name), {"name": name, "data": data}, indent=None)
+        keep = {os.path.basename(self.device_path(name)) for name in devices}
+        for file_name in self._device_files():
+            if file_name not in keep:
+                os.remove(os.path.join(self.devices_path, file_name))
+        self._write_manifest({"keys": list(library), "order": list(devices),
+                              "metadata": {key: value for key, value in library.items() if key != "devices"}})
+
+    def signature(self):
+        # replacing, adding or removing a device file changes the folder's modification time
+        try:
+            return os.stat(self.devices_path).st_mtime_ns, os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def read_changed(self, digest=None):
+        # the digest covers each file's size and modification time, so an unchanged library is not parsed
+        manifest_stat = os.stat(self.manifest_path)
+        files = self._device_files()
+        entries = [(MANIFEST_NAME, manifest_stat.st_mtime_ns, manifest_stat.st_size)]
+        for file_name in files:
+            try:
+                stat = os.stat(os.path.join(self.devices_path, file_name))
+            except FileNotFoundError:
+                continue
+            entries.append((file_name, stat.st_mtime_ns, stat.st_size))
+        new_digest = hashlib.sha1(json.dumps(entries).encode("utf-8")).hexdigest()
+        if new_digest == digest:
+            return None, digest
+        return self._library(self._manifest(), files), new_digest
+
+    def _library(self, manifest, files):
+        found = {}
+        for file_name in files:
+            entry = self._read_file(os.path.join(self.devices_path, file_name))
+            if entry is not None:
+                found[entry["name"]] = entry["data"]
+        devices = {name: found.pop(name) for name in manifest.get("order", []) if name in found}
+        devices.update(sorted(found.items()))
+        metadata = manifest.get("metadata", {})
+        # the top level keys come back in their original order, so an export reproduces the imported file
+        library = {key: devices if key == "devices" else metadata[key]
+                   for key in manifest.get("keys", ["devices"]) if key == "devices" or key in metadata}
+        library.setdefault("devices", devices)
+        return library
+
+    def _device_files(self):
+        try:
+            return sorted(name for name in os.listdir(self.devices_path)
+                          if name.endswith(".json") and not name.startswith(".tmp-"))
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _read_file(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _read_device(self, name):
+        entry = self._read_file(self.device_path(name))
+        return None if entry is None else entry["data"]
+
+    def _manifest(self):
+        return self._read_file(self.manifest_path)
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.path, exist_ok=True)
+        atomic_write_json(self.manifest_path, manifest)
+
+    def _write_device(self, name, data):
+        path = self.device_path(name)
+        os.makedirs(self.devices_path, exist_ok=True)
+        new = not os.path.exists(path)
+        atomic_write_json(path, {"name": name, "data": data}, indent=None)
+        if new:
+            manifest = self._manifest() or {"keys": ["devices"], "order": [], "metadata": {}}
+            if name not in manifest["order"]:
+                manifest["order"].append(name)
+                self._write_manifest(manifest)
+
+    def _remove_device(self, name):
+        try:
+            os.remove(self.device_path(name))
+        except FileNotFoundError:
+            return
+        manifest = self._manifest()
+        if manifest is not None and name in manifest.get("order", []):
+            manifest["order"].remove(name)
+            self._write_manifest(manifest)
+
+
+class SqliteLibraryStore(LibraryStore):
+    """A SQLite backend with one row per device, so an edit touches only that device's row.
+
+    Devices keep their insertion order so an export reproduces the original
+    json file, and top level keys other than 'devices' are kept in a
+    metadata table. The rollback journal is used rather than WAL, which
+    needs shared memory that network folders do not provide.
+    """
+    def __init__(self, path):
+        self.path = path
+        # the store is used from the GUI thread and the library watcher's job thread; the lock keeps one
+        # thread's reads out of the other's write transactions on the shared connection
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=DELETE")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS devices (name TEXT PRIMARY KEY, position INTEGER NOT NULL, data TEXT NOT NULL)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    def load(self):
+        library = {"devices": {}}
+        # one read transaction, so the two queries see the same commit
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN")
+            metadata = self.connection.execute("SELECT key, data FROM metadata").fetchall()
+            rows = self.connection.execute("SELECT name, data FROM devices ORDER BY position").fetchall()
+        for key, data in metadata:
+            library[key] = json.loads(data)
+        devices = library["devices"]
+        for name, data in rows:
+            devices[name] = json.loads(data)
+        return library
+
+    def upsert(self, name, data):
+        with self._lock, self.connection:
+            self._upsert_row(name, data)
+
+    def delete(self, name):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM devices WHERE name = ?", (name,))
+
+    def upsert_checked(self, name, data, expected_version):
+        # the check and the write share one write transaction, so no other writer can come between them
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            check_version(name, self._row(name), expected_version)
+            self._upsert_row(name, data)
+
+    def delete_checked(self, name, expected_version):
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            check_version(name, self._row(name), expected_version)
+            self.connection.execute("DELETE FROM devices WHERE name = ?", (name,))
+
+    def signature(self):
+        # data_version only changes when another connection commits
+        with self._lock:
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def _row(self, name):
+        row = self.connection.execute("SELECT data FROM devices WHERE name = ?", (name,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _upsert_row(self, name, data):
+        self.connection.execute(
+            "INSERT INTO devices (name, position, data) "
+            "VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM devices), ?) "
+            "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+            (name, json.dumps(data)))
+
+    def save_all(self, library):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM devices")
+            self.connection.execute("DELETE FROM metadata")
+            self.connection.executemany(
+                "INSERT INTO devices (name, position, data) VALUES (?, ?, ?)",
+                ((name, position, json.dumps(data))
+                 for position, (name, data) in enumerate(library.get("devices", {}).items())))
+            self.connection.executemany(
+                "INSERT INTO metadata (key, data) VALUES (?, ?)",
+                ((key, json.dumps(value)) for key, value in library.items() if key != "devices"))
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+def open_store(devices_folder, backend=DEFAULT_BACKEND, migrate=True):
+    """Open the device library store of a devices folder.
+
+    A new folder or SQLite store is seeded from an existing
+    device_library.json so switching backends keeps the library.
+    With migrate=False nothing is written: the JSON library is
+    read in place until the folder has been migrated.
+    """
+    json_path = os.path.join(devices_folder, JSON_LIBRARY_NAME)
+    if backend == "json":
+        return JsonLibraryStore(json_path)
+    if backend == "folder":
+        store = FolderLibraryStore(os.path.join(devices_folder, FOLDER_LIBRARY_NAME))
+        if not os.path.exists(store.manifest_path) and os.path.exists(json_path):
+            if not migrate:
+                return JsonLibraryStore(json_path)
+            store.import_json(json_path)
+        return store
+    if backend == "sqlite":
+        path = os.path.join(devices_folder, SQLITE_LIBRARY_NAME)
+        seed = not os.path.exists(path)
+        if seed and not migrate and os.path.exists(json_path):
+            return JsonLibraryStore(json_path)
+        store = SqliteLibraryStore(path)
+        if seed and os.path.exists(json_path):
+            store.import_json(json_path)
+        return store
+    raise StorageError(f"Unknown device library backend: {backend!r}")
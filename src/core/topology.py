@@ -0,0 +1,329 @@
+"""Link budgets of a station described as a graph of devices.
+
+A ground station's devices need not form one chain: splitters feed many
+receivers from one front end, and combiners or switches join redundant
+paths. A project describes this with 'connections' between device ports,
+which must form a directed acyclic graph. Every path from a device
+without inputs, normally an antenna, to a device without outputs is a
+receive path with its own G/T and margin.
+
+The graph is cut into segments, runs of devices with one way in and one
+way out, and each segment is cascaded once over the sweep, in parallel.
+Paths are then joined segment by segment in topological order: the gain
+and input referred noise of a path up to the end of a segment is that of
+its upstream part combined with the segment's, so a front end shared by
+hundreds of receivers is evaluated once, and each path costs a handful of
+array operations however long it is.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .link_budget import (
+    BRANCH_KINDS, DEFAULT_PORTS, REFERENCE_TEMPERATURE, SPLIT_KINDS, Antenna, Chain, LinkBudgetError,
+    LinkParameters, device_parameters, finish_result, stage_arrays, stage_from_spec,
+)
+from .model import parse_device
+from .units import db_to_linear
+
+
+class Connection:
+    """A connection from an output port of one device to an input port of another."""
+    __slots__ = ("source", "source_port", "target", "target_port")
+
+    def __init__(self, source, source_port, target, target_port):
+        self.source = source
+        self.source_port = source_port
+        self.target = target
+        self.target_port = target_port
+
+    def __repr__(self):
+        return f"Connection({self.source}:{self.source_port} -> {self.target}:{self.target_port})"
+
+
+class Segment:
+    """A run of devices with one way in and one way out, cascaded as one.
+
+    antenna is set when the segment starts at an antenna; stages are the
+    two-port devices after it. inputs are the indexes of the segments that
+    feed this one.
+    """
+    __slots__ = ("names", "antenna", "stages", "inputs", "outputs")
+
+    def __init__(self, names, antenna, stages):
+        self.names = names
+        self.antenna = antenna
+        self.stages = stages
+        self.inputs = []
+        self.outputs = []
+
+    def __repr__(self):
+        return f"Segment({' > '.join(self.names)})"
+
+
+def _port_count(kind, ports, outputs):
+    """Return how many outputs, or inputs when outputs is false, a device of kind has."""
+    if kind == "antenna":
+        return 1 if outputs else 0
+    if kind in BRANCH_KINDS and outputs == (kind == "splitter"):
+        # a splitter fans one input out over its ports; a combiner or switch joins its ports into one output
+        return ports or DEFAULT_PORTS
+    return 1
+
+
+def parse_connection(entry):
+    """Read a connection given as [source, target] or {'from', 'to', optional 'from_port' and 'to_port'}."""
+    if isinstance(entry, (list, tuple)) and len(entry) == 2:
+        return Connection(entry[0], None, entry[1], None)
+    if isinstance(entry, dict) and "from" in entry and "to" in entry:
+        return Connection(entry["from"], entry.get("from_port"), entry["to"], entry.get("to_port"))
+    raise LinkBudgetError(f"A connection needs a source and a target: {entry!r}")
+
+
+class Topology:
+    """The devices of a station and the connections between their ports, cut into segments."""
+    def __init__(self, stages, kinds, ports, connections):
+        # device name -> Antenna or Stage, its kind and its number of ports
+        self.stages = stages
+        self.kinds = kinds
+        self.ports = ports
+        self.connections = self._assign_ports(connections)
+        self.order = self._sort()
+        self.segments = self._segment()
+
+    def _assign_ports(self, connections):
+        """Check every connection against the ports of its devices and number the ports not given."""
+        used = {}
+        for connection in connections:
+            for name, port_key, outputs in ((connection.source, "source_port", True),
+                                            (connection.target, "target_port", False)):
+                if name not in self.stages:
+                    raise LinkBudgetError(f"Connection {connection} names {name!r}, which is not a project device")
+                count = _port_count(self.kinds[name], self.ports[name], outputs)
+                taken = used.setdefault((name, outputs), set())
+                port = getattr(connection, port_key)
+                if port is None:
+                    port = next((index for index in range(count) if index not in taken), count)
+                    setattr(connection, port_key, port)
+                side = "outputs" if outputs else "inputs"
+                if not isinstance(port, int) or not 0 <= port < count:
+                    if not count:
+                        raise LinkBudgetError(f"{name!r} has no {side}")
+                    raise LinkBudgetError(f"{name!r} has {count} {side[:-1] if count == 1 else side}, "
+                                          f"so it cannot be connected at port {port!r}")
+                if port in taken:
+                    raise LinkBudgetError(f"Port {port} of the {side} of {name!r} is connected twice")
+                taken.add(port)
+        return connections
+
+    def _sort(self):
+        """Return the device names in topological order, raising LinkBudgetError on a cycle."""
+        incoming = dict.fromkeys(self.stages, 0)
+        outgoing = {name: [] for name in self.stages}
+        for connection in self.connections:
+            incoming[connection.target] += 1
+            outgoing[connection.source].append(connection.target)
+        ready = [name for name, count in incoming.items() if count == 0]
+        order = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for target in outgoing[name]:
+                incoming[target] -= 1
+                if incoming[target] == 0:
+                    ready.append(target)
+        if len(order) != len(self.stages):
+            cycle = sorted(name for name, count in incoming.items() if count)
+            raise LinkBudgetError(f"The connections form a loop through {', '.join(map(repr, cycle))}")
+        return order
+
+    def _segment(self):
+        """Cut the graph into runs of devices that have exactly one way in and one way out."""
+        sources = {name: [] for name in self.stages}
+        targets = {name: [] for name in self.stages}
+        for connection in self.connections:
+            sources[connection.target].append(connection.source)
+            targets[connection.source].append(connection.target)
+        segments = []
+        # device name -> index of the segment it ends up in
+        owner = {}
+        for name in self.order:
+            stage = self.stages[name]
+            inputs = sources[name]
+            if isinstance(stage, Antenna) and inputs:
+                raise LinkBudgetError(f"Antenna {name!r} must be at the head of its paths, not fed by "
+                                      f"{', '.join(map(repr, inputs))}")
+            if len(inputs) == 1 and len(targets[inputs[0]]) == 1:
+                segment = segments[owner[inputs[0]]]
+                segment.names.append(name)
+                segment.stages.append(stage)
+                owner[name] = owner[inputs[0]]
+                continue
+            if isinstance(stage, Antenna):
+                segment = Segment([name], stage, [])
+            else:
+                segment = Segment([name], None, [stage])
+            owner[name] = len(segments)
+            for source in inputs:
+                segment.inputs.append(owner[source])
+                segments[owner[source]].outputs.append(owner[name])
+            segments.append(segment)
+        return segments
+
+    def receivers(self):
+        """Return the names of the devices at the ends of the receive paths."""
+        return [segment.names[-1] for segment in self.segments if not segment.outputs]
+
+    def __repr__(self):
+        return f"Topology({len(self.stages)} devices, {len(self.segments)} segments)"
+
+
+def build_topology(project, library=None, physical_temperature=REFERENCE_TEMPERATURE, tables=None):
+    """Build the topology of a project with 'connections'; the project may be a Project or its json data."""
+    json_data = project.json_data if hasattr(project, "json_data") else project
+    if "connections" not in json_data:
+        raise LinkBudgetError("The project has no connections")
+    tables = tables or {}
+    stages = {}
+    kinds = {}
+    ports = {}
+    devices = project.devices if hasattr(project, "devices") else project["devices"]
+    for device in devices:
+        name = device.name if hasattr(device, "name") else device["name"]
+        if name in stages:
+            raise LinkBudgetError(f"Device {name!r} appears twice; devices of a graph need distinct names")
+        spec = getattr(device, "spec", None)
+        if spec is None or spec.kind == "reference":
+            spec = parse_device(name, device_parameters(device, library), tables.get(name))
+        stages[name] = stage_from_spec(spec, physical_temperature)
+        kinds[name] = spec.kind
+        ports[name] = spec.ports
+    return Topology(stages, kinds, ports, [parse_connection(entry) for entry in json_data["connections"]])
+
+
+class SegmentResult:
+    """A segment cascaded over the sweep: per-stage and total gain, and noise referred to its input."""
+    __slots__ = ("stage_gain_db", "stage_temperature", "cumulative_gain_db", "gain_db", "temperature")
+
+    def __init__(self, stage_gain_db, stage_temperature, cumulative_gain_db, gain_db, temperature):
+        self.stage_gain_db = stage_gain_db
+        self.stage_temperature = stage_temperature
+        self.cumulative_gain_db = cumulative_gain_db
+        self.gain_db = gain_db
+        self.temperature = temperature
+
+
+def evaluate_segment(segment, frequencies):
+    """Cascade the stages of a segment over the sweep."""
+    stage_gain_db, stage_temperature = stage_arrays(segment.stages, frequencies)
+    cumulative_gain_db = np.cumsum(stage_gain_db, axis=0)
+    # Friis within the segment, referred to the segment's own input
+    temperature = np.sum(stage_temperature / db_to_linear(cumulative_gain_db - stage_gain_db), axis=0)
+    gain_db = cumulative_gain_db[-1] if len(segment.stages) else np.zeros(np.shape(frequencies))
+    return SegmentResult(stage_gain_db, stage_temperature, cumulative_gain_db, gain_db, temperature)
+
+
+class PathResult:
+    """The G/T, C/N0 and margin at the end of one receive path.
+
+    segments are the indexes of the segments along the path; the per-stage
+    arrays are built on demand by TopologyResult.chain_result.
+    """
+    def __init__(self, segments, names, result, gain_db):
+        self.segments = segments
+        self.names = names
+        self.frequencies = result.frequencies
+        self.gain_db = gain_db
+        self.noise_temperature = result.noise_temperature
+        self.g_over_t_db = result.g_over_t_db
+        self.cn0_dbhz = result.cn0_dbhz
+        self.margin_db = result.margin_db
+        # the signal level at the path's end, when the link defines it
+        self.level_dbw = result.level_dbw
+
+    @property
+    def name(self):
+        return self.names[-1]
+
+    def __repr__(self):
+        return f"PathResult({' > '.join(self.names)})"
+
+
+class TopologyResult:
+    """Every receive path of a topology evaluated over a sweep.
+
+    Only arrays, names and the head antennas are kept, so a result can be
+    pickled into the result cache without the stages it came from.
+    """
+    def __init__(self, topology, frequencies, link, segments, paths):
+        self.frequencies = frequencies
+        self.link = link
+        # segment index -> SegmentResult, and the device names and head antenna of every segment
+        self.segments = segments
+        self.segment_names = [segment.names for segment in topology.segments]
+        self.antennas = {index: segment.antenna for index, segment in enumerate(topology.segments) if segment.antenna}
+        self.paths = paths
+
+    def receiver(self, name):
+        """Return the results of the paths ending at a device; several when combiners join paths to it."""
+        return [path for path in self.paths if path.name == name]
+
+    def chain_result(self, path):
+        """Return the full ChainResult of one path, with its per-stage arrays."""
+        antenna = self.antennas.get(path.segments[0])
+        stage_gain_db = np.concatenate([self.segments[index].stage_gain_db for index in path.segments])
+        stage_temperature = np.concatenate([self.segments[index].stage_temperature for index in path.segments])
+        cumulative_gain_db = np.cumsum(stage_gain_db, axis=0)
+        temperature = np.sum(stage_temperature / db_to_linear(cumulative_gain_db - stage_gain_db), axis=0)
+        result = finish_result(Chain(antenna, []), self.frequencies, self.link, stage_gain_db, cumulative_gain_db,
+                               temperature)
+        result.stage_names = path.names[1:] if antenna is not None else list(path.names)
+        return result
+
+    def worst(self):
+        """Return the path with the lowest margin anywhere in the sweep, or the lowest G/T without a margin."""
+        def key(path):
+            return np.min(path.margin_db if path.margin_db is not None else path.g_over_t_db)
+        return min(self.paths, key=key) if self.paths else None
+
+    def __repr__(self):
+        return f"TopologyResult({len(self.paths)} paths, {len(self.segments)} segments)"
+
+
+def evaluate_topology(topology, frequencies, link=None, workers=None):
+    """Evaluate every receive path of a topology over a sweep.
+
+    Segments are cascaded once each, on up to workers threads (by default
+    one per CPU), then joined in topological order into the paths.
+    """
+    if link is None:
+        link = LinkParameters()
+    frequencies = np.asarray(frequencies, dtype=float)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(topology.segments) == 1:
+        segments = [evaluate_segment(segment, frequencies) for segment in topology.segments]
+    else:
+        # NumPy releases the GIL in the array operations, so independent segments run side by side
+        with ThreadPoolExecutor(max_workers=min(workers, len(topology.segments))) as executor:
+            segments = list(executor.map(evaluate_segment, topology.segments, [frequencies] * len(topology.segments)))
+
+    # segment index -> the (segment indexes, gain dB, input referred temperature) of every path up to its end
+    prefixes = {}
+    paths = []
+    for index, segment in enumerate(topology.segments):
+        result = segments[index]
+        if not segment.inputs:
+            prefixes[index] = [((index,), result.gain_db, result.temperature)]
+        else:
+            prefixes[index] = [(route + (index,), gain_db + result.gain_db,
+                                temperature + result.temperature / db_to_linear(gain_db))
+                               for source in segment.inputs for route, gain_db, temperature in prefixes[source]]
+        if segment.outputs:
+            continue
+        for route, gain_db, temperature in prefixes[index]:
+            head = topology.segments[route[0]]
+            names = [name for step in route for name in topology.segments[step].names]
+            finished = finish_result(Chain(head.antenna, []), frequencies, link, None, gain_db, temperature)
+            paths.append(PathResult(route, names, finished, gain_db))
+    return TopologyResult(topology, frequencies, link, segments, paths)
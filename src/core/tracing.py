@@ -0,0 +1,246 @@
+"""Lightweight operation tracing and profiling.
+
+Spans time named operations with perf_counter and are kept in a short
+in-memory history for display, and, when a trace file is configured,
+written to it in the Chrome trace event format, which chrome://tracing and
+Perfetto open directly. The file is rotated once it grows past a size
+limit. A cProfile capture can be switched on and off around any stretch of
+use.
+"""
+import atexit
+import io
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+
+class Span:
+    """One finished operation: its name, start and duration in seconds, thread and arguments."""
+    __slots__ = ("name", "start", "duration", "thread", "args")
+
+    def __init__(self, name, start, duration, thread, args):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.thread = thread
+        self.args = args
+
+    def __repr__(self):
+        return f"Span({self.name}, {self.duration * 1000.0:.2f} ms)"
+
+
+class _ActiveSpan:
+    """Context manager timing one span; extra arguments can be attached while it runs."""
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+    def set(self, **args):
+        """Attach arguments, such as result sizes, to the span."""
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects spans into a bounded history and an optional rotating trace file.
+
+    Events are buffered and written in batches. A trace file holds at most
+    max_bytes before it is rotated to path.1, path.2 and so on, keeping
+    backups old files.
+    """
+    def __init__(self, path=None, max_bytes=8 * 1024 * 1024, backups=3, history=500, buffer_size=64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_size = buffer_size
+        self.recent = deque(maxlen=history)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._file = None
+        # the error that stopped file output, which never fails the operation being traced
+        self.error = None
+
+    def span(self, name, **args):
+        """Return a context manager timing the operation name."""
+        return _ActiveSpan(self, name, args)
+
+    def traced(self, name=None):
+        """Decorate a function so every call is a span, named after the function by default."""
+        def decorator(function):
+            span_name = name or function.__qualname__
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, start, duration, args=None):
+        """Record a finished span."""
+        thread = threading.current_thread().name
+        span = Span(name, start, duration, thread, args or {})
+        with self._lock:
+            self.recent.append(span)
+            if self.path is None:
+                return
+            self._buffer.append({"name": name, "ph": "X", "ts": round((start - self._origin) * 1e6, 1),
+                                 "dur": round(duration * 1e6, 1), "pid": self._pid, "tid": thread,
+                                 "args": span.args})
+            if len(self._buffer) >= self.buffer_size:
+                self._write()
+
+    def recent_spans(self):
+        """Return a copy of the recent spans, oldest first; recording threads may append to them meanwhile."""
+        with self._lock:
+            return list(self.recent)
+
+    def summary(self):
+        """Return {name: (count, mean seconds, max seconds)} over the recent spans."""
+        spans = self.recent_spans()
+        totals = {}
+        for span in spans:
+            count, total, longest = totals.get(span.name, (0, 0.0, 0.0))
+            totals[span.name] = (count + 1, total + span.duration, max(longest, span.duration))
+        return {name: (count, total / count, longest) for name, (count, total, longest) in totals.items()}
+
+    def configure(self, path, max_bytes=None, backups=None):
+        """Start writing to a trace file, or stop when path is None."""
+        with self._lock:
+            self._write()
+            self._close_file()
+            self.path = path
+            self.error = None
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if backups is not None:
+                self.backups = backups
+
+    def flush(self):
+        """Write buffered events to the trace file."""
+        with self._lock:
+            self._write()
+            if self._file is not None:
+                try:
+                    self._file.flush()
+                except OSError as e:
+                    self._stop_file(e)
+
+    def close(self):
+        """Flush and close the trace file."""
+        with self._lock:
+            self._write()
+            self._close_file()
+
+    def _write(self):
+        # called with the lock held
+        if not self._buffer or self.path is None:
+            self._buffer.clear()
+            return
+        try:
+            if self._file is None:
+                self._open_file()
+            # the trace event format allows the closing bracket to be left off, so the file is always valid
+            self._file.write("".join(json.dumps(event) + ",\n" for event in self._buffer))
+            self._buffer.clear()
+            if self._file.tell() >= self.max_bytes:
+                self._close_file()
+                self._rotate()
+        except OSError as e:
+            self._stop_file(e)
+
+    def _stop_file(self, error):
+        # an unwritable trace file turns file output off; the recent spans are still kept in memory
+        self.error = error
+        self._buffer.clear()
+        self.path = None
+        try:
+            self._close_file()
+        except OSError:
+            self._file = None
+
+    def _open_file(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        self._file = open(self.path, "a")
+        if self._file.tell() == 0:
+            self._file.write("[\n")
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+class Profiler:
+    """A cProfile capture of the thread that starts it, switched on and off."""
+    def __init__(self):
+        self._profile = None
+
+    @property
+    def running(self):
+        return self._profile is not None
+
+    def start(self):
+        """Start capturing; does nothing if a capture is already running."""
+        if self._profile is None:
+            # the profiler modules are only needed once a capture is started
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self, path=None, top=25):
+        """Stop capturing, save the raw profile to path when given and return a report of the top functions."""
+        if self._profile is None:
+            return ""
+        profile, self._profile = self._profile, None
+        profile.disable()
+        if path is not None:
+            profile.dump_stats(path)
+        import pstats
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(top)
+        return report.getvalue()
+
+
+# the application wide tracer and profiler
+tracer = Tracer()
+profiler = Profiler()
+atexit.register(tracer.close)
+
+
+def span(name, **args):
+    """Time an operation with the application wide tracer."""
+    return tracer.span(name, **args)
+
+
+def traced(name=None):
+    """Decorate a function so its calls are spans of the application wide tracer."""
+    return tracer.traced(name)
@@ -0,0 +1,168 @@
+"""Unit scale tables used to normalize device parameters to canonical SI values."""
+import math
+
+import numpy as np
+
+
+class UnitError(ValueError):
+    """Raised when a unit string is not recognised for a quantity."""
+
+
+# scale factors to the canonical SI unit of each quantity, keyed by lower case unit name
+FREQUENCY_UNITS = {"hz": 1.0, "khz": 1e3, "mhz": 1e6, "ghz": 1e9, "thz": 1e12}
+DISTANCE_UNITS = {
+    "m": 1.0, "meter": 1.0, "meters": 1.0, "metre": 1.0, "metres": 1.0,
+    "km": 1e3, "kilometer": 1e3, "kilometers": 1e3,
+    "cm": 1e-2, "mm": 1e-3,
+    "ft": 0.3048, "foot": 0.3048, "feet": 0.3048,
+    "mi": 1609.344, "mile": 1609.344, "miles": 1609.344,
+}
+ANGLE_UNITS = {
+    "rad": 1.0, "radian": 1.0, "radians": 1.0,
+    "deg": math.pi / 180.0, "degree": math.pi / 180.0, "degrees": math.pi / 180.0,
+}
+LOSS_UNITS = {"db": 1.0}
+
+SPEED_OF_LIGHT = 299792458.0
+
+
+def _lookup(table, unit, quantity):
+    """Return the scale factor of a unit or raise UnitError."""
+    try:
+        return table[str(unit).strip().lower()]
+    except KeyError:
+        raise UnitError(f"Unknown {quantity} unit: {unit!r}") from None
+
+
+def frequency_to_hz(value, unit="Hz"):
+    """Convert a frequency (scalar or array) to Hz."""
+    return np.asarray(value, dtype=float) * _lookup(FREQUENCY_UNITS, unit, "frequency")
+
+
+def distance_to_m(value, unit="m"):
+    """Convert a distance (scalar or array) to meters."""
+    return np.asarray(value, dtype=float) * _lookup(DISTANCE_UNITS, unit, "distance")
+
+
+def angle_to_rad(value, unit="deg"):
+    """Convert an angle (scalar or array) to radians."""
+    return np.asarray(value, dtype=float) * _lookup(ANGLE_UNITS, unit, "angle")
+
+
+def temperature_to_k(value, unit="K"):
+    """Convert a temperature (scalar or array) to Kelvin."""
+    value = np.asarray(value, dtype=float)
+    unit = str(unit).strip().lower()
+    if unit in ("k", "kelvin"):
+        return value
+    if unit in ("c", "degc", "celsius"):
+        return value + 273.15
+    if unit in ("f", "degf", "fahrenheit"):
+        return (value - 32.0) * 5.0 / 9.0 + 273.15
+    raise UnitError(f"Unknown temperature unit: {unit!r}")
+
+
+def power_to_w(value, unit="W"):
+    """Convert a power (scalar or array) to Watts."""
+    value = np.asarray(value, dtype=float)
+    unit = str(unit).strip().lower()
+    if unit in ("w", "watt", "watts"):
+        return value
+    if unit in ("mw", "milliwatt", "milliwatts"):
+        return value * 1e-3
+    if unit == "kw":
+        return value * 1e3
+    if unit == "dbw":
+        return 10.0 ** (value / 10.0)
+    if unit == "dbm":
+        return 10.0 ** ((value - 30.0) / 10.0)
+    raise UnitError(f"Unknown power unit: {unit!r}")
+
+
+def loss_to_db(value, unit="dB"):
+    """Convert a gain or loss to dB."""
+    return np.asarray(value, dtype=float) * _lookup(LOSS_UNITS, unit, "gain")
+
+
+def db_to_linear(value_db):
+    """Convert a power ratio in dB to a linear ratio."""
+    return 10.0 ** (np.asarray(value_db, dtype=float) / 10.0)
+
+
+def linear_to_db(value):
+    """Convert a linear power ratio to dB."""
+    return 10.0 * np.log10(np.asarray(value, dtype=float))
+
+
+def unit_of(entry, default=None):
+    """Return the unit of a value/unit dictionary, accepting both 'unit' and 'units'."""
+    return entry.get("unit", entry.get("units", default))
+
+
+def quantity(entry, default_unit=None):
+    """Split a parameter into a (value, unit) pair.
+
+    Parameters may be stored as a bare number or as a dictionary with a
+    'value' and a 'unit' (or 'units') key.
+    """
+    if isinstance(entry, dict):
+        if "value" not in entry:
+            raise UnitError(f"Quantity has no 'value' key: {entry!r}")
+        return entry["value"], unit_of(entry, default_unit)
+    return entry, default_unit
+
+
+class Quantity:
+    """Base of the physical quantity kinds.
+
+    Each kind sets its SI unit, its units table and to_si(value, unit),
+    the function converting a value in one of its units to the SI unit.
+    """
+    si_unit = None
+    units = {}
+
+    @classmethod
+    def accepts(cls, unit):
+        """Return True if unit is a unit of this quantity."""
+        return str(unit).strip().lower() in cls.units
+
+
+class Frequency(Quantity):
+    si_unit = "Hz"
+    units = FREQUENCY_UNITS
+    to_si = staticmethod(frequency_to_hz)
+
+
+class Distance(Quantity):
+    si_unit = "m"
+    units = DISTANCE_UNITS
+    to_si = staticmethod(distance_to_m)
+
+
+class Angle(Quantity):
+    si_unit = "rad"
+    units = ANGLE_UNITS
+    to_si = staticmethod(angle_to_rad)
+
+
+class Temperature(Quantity):
+    si_unit = "K"
+    units = dict.fromkeys(("k", "kelvin", "c", "degc", "celsius", "f", "degf", "fahrenheit"))
+    to_si = staticmethod(temperature_to_k)
+
+
+class Power(Quantity):
+    si_unit = "W"
+    units = dict.fromkeys(("w", "watt", "watts", "mw", "milliwatt", "milliwatts", "kw", "dbw", "dbm"))
+    to_si = staticmethod(power_to_w)
+
+
+QUANTITY_KINDS = (Frequency, Distance, Angle, Temperature, Power)
+
+
+def quantity_kind(unit):
+    """Return the quantity class a unit belongs to, or None for ratios such as dB and unknown units."""
+    for kind in QUANTITY_KINDS:
+        if kind.accepts(unit):
+            return kind
+    return None
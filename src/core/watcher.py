@@ -0,0 +1,123 @@
+"""Watching a shared device library for changes made by others.
+
+The watcher polls the store's signature, the file's modification time and
+size or SQLite's data version, which costs a stat or a pragma. Only when
+that moves is the library read again, and a JSON library whose content
+hash did not change is not parsed. The library read is compared device by
+device with a snapshot of the last known stored state, on the reading
+thread, so the caller only has to merge the devices that changed.
+
+The last known stored state is also what checked writes are versioned
+against: an edit is saved only if the stored device still has the version
+the edit was based on.
+"""
+import threading
+
+from .history import MISSING
+from .storage import device_version
+
+
+class LibraryDiff:
+    """The devices added, changed and removed between two states of a library."""
+    __slots__ = ("added", "changed", "removed")
+
+    def __init__(self, added, changed, removed):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+
+    def updates(self):
+        """Return {device name: new data, or MISSING for a removed device}."""
+        updates = dict(self.added)
+        updates.update(self.changed)
+        updates.update(dict.fromkeys(self.removed, MISSING))
+        return updates
+
+    def __len__(self):
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def __repr__(self):
+        return f"LibraryDiff(+{len(self.added)} ~{len(self.changed)} -{len(self.removed)})"
+
+
+def diff_devices(old, new):
+    """Compare two {device name: data} dictionaries."""
+    added = {}
+    changed = {}
+    for name, data in new.items():
+        before = old.get(name, MISSING)
+        if before is MISSING:
+            added[name] = data
+        elif before is not data and before != data:
+            changed[name] = data
+    removed = [name for name in old if name not in new]
+    return LibraryDiff(added, changed, removed)
+
+
+class LibraryWatcher:
+    """Tracks the stored state of a library and reports the devices others change.
+
+    devices is the library's 'devices' dictionary as loaded from store.
+    changed() is meant to be polled; read() may run on a worker thread and
+    its result is passed to merge() on the thread that owns the library,
+    which then only checks that it is current and adopts it.
+    """
+    def __init__(self, store, devices):
+        self.store = store
+        # the devices as last known to be stored; entries are shared with the library, never copied
+        self.base = dict(devices)
+        self._signature = store.signature()
+        self._digest = None
+        self._generation = 0
+        # guards base and the generation against read() snapshotting them while stored() changes them
+        self._lock = threading.Lock()
+
+    def changed(self):
+        """Return True when the store may have changed since the last call."""
+        signature = self.store.signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return True
+
+    def read(self):
+        """Read the store and diff it against the stored state, returning what merge() needs.
+
+        The devices are None when the library's content is unchanged.
+        """
+        with self._lock:
+            generation = self._generation
+            base = dict(self.base)
+        library, digest = self.store.read_changed(self._digest)
+        if library is None:
+            return LibraryDiff({}, {}, []), None, digest, generation
+        devices = dict(library.get("devices", {}))
+        return diff_devices(base, devices), devices, digest, generation
+
+    def merge(self, diff, devices, digest, generation):
+        """Adopt a diff from read() as the last known stored state and return it.
+
+        Returns None when our own writes happened while it was being read,
+        in which case it is stale and the next changed() asks for a new read.
+        """
+        if generation != self._generation:
+            self._signature = None
+            return None
+        self._digest = digest
+        if devices is not None:
+            with self._lock:
+                self.base = devices
+        return diff
+
+    def version(self, name):
+        """Return the version of a device as last known to be stored, the version an edit of it is based on."""
+        return device_version(self.base.get(name))
+
+    def stored(self, name, data):
+        """Record that the store now holds data for a device, None once it is deleted."""
+        with self._lock:
+            self._generation += 1
+            if data is None:
+                self.base.pop(name, None)
+            else:
+                self.base[name] = data
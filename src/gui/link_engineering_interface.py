@@ -1,9 +1,37 @@
 import tkinter as tk
-from tkinter import filedialog
 import json
 import os
+import time
 
-from .windows import PreferencesWindow, ErrorWindow, BrowseDeviceWindow
+from core.lazy import lazy_module
+from core.tracing import span, tracer
+
+# dialogs and the NumPy backed core are imported on first use, so the main window opens on Tk alone
+filedialog = lazy_module("tkinter.filedialog")
+np = lazy_module("numpy")
+sqlite3 = lazy_module("sqlite3")
+cache = lazy_module("core.cache")
+cascade = lazy_module("core.cascade")
+geometry = lazy_module("core.geometry")
+history = lazy_module("core.history")
+interpolation = lazy_module("core.interpolation")
+jobs = lazy_module("core.jobs")
+link_budget = lazy_module("core.link_budget")
+model = lazy_module("core.model")
+montecarlo = lazy_module("core.montecarlo")
+parametric = lazy_module("core.parametric")
+plot = lazy_module(".plot", __package__)
+project_io = lazy_module("core.project_io")
+schema = lazy_module("core.schema")
+search = lazy_module("core.search")
+sidecar = lazy_module("core.sidecar")
+storage = lazy_module("core.storage")
+topology = lazy_module("core.topology")
+watcher = lazy_module("core.watcher")
+windows = lazy_module(".windows", __package__)
+
+# job reports are delivered about once per frame at 60 fps
+JOB_POLL_MS = 16
 
 
 class LinkEngineeringInterface:
@@ -11,6 +39,7 @@ class LinkEngineeringInterface:
     A simple GUI application using Tkinter.
     """
     def __init__(self, root):
+        self.start_time = time.perf_counter()
         self.root = root
         self.root.title("Link Engineering Interface")
         self.root.geometry("800x600")
@@ -27,31 +56,74 @@ class LinkEngineeringInterface:
         self.root.config(menu=menu_bar)
         # add an edit menu to the window
         edit_menu = tk.Menu(menu_bar, tearoff=0)
+        # undo and redo are enabled while the library history has steps to revert or reapply
+        edit_menu.add_command(label="Undo", command=self.undo, accelerator="Ctrl+Z", state=tk.DISABLED)
+        edit_menu.add_command(label="Redo", command=self.redo, accelerator="Ctrl+Y", state=tk.DISABLED)
+        edit_menu.add_separator()
         edit_menu.add_command(label="Cut")
         edit_menu.add_command(label="Copy")
         edit_menu.add_command(label="Paste")
         edit_menu.add_separator()
-        edit_menu.add_command(label="Browse Devices", command=self.browse_devices)
+        # browsing is enabled once the device library has finished loading in the background
+        edit_menu.add_command(label="Browse Devices", command=self.browse_devices, state=tk.DISABLED)
         edit_menu.add_separator()
         edit_menu.add_command(label="Preferences", command=self.preferences)
         menu_bar.add_cascade(label="Edit", menu=edit_menu)
+        self.edit_menu = edit_menu
+        self.root.bind("<Control-z>", self.undo)
+        self.root.bind("<Control-y>", self.redo)
+        # add an analysis menu to the window
+        analysis_menu = tk.Menu(menu_bar, tearoff=0)
+        analysis_menu.add_command(label="Monte Carlo Margin", command=self.monte_carlo)
+        analysis_menu.add_command(label="Pass Margin", command=self.pass_margin)
+        analysis_menu.add_separator()
+        analysis_menu.add_command(label="Plot Chain vs Frequency", command=self.plot_chain_result)
+        analysis_menu.add_command(label="Plot Pass vs Time", command=self.plot_pass_result)
+        menu_bar.add_cascade(label="Analysis", menu=analysis_menu)
         # add a help menu to the window
         help_menu = tk.Menu(menu_bar, tearoff=0)
         help_menu.add_command(label="About")
+        help_menu.add_command(label="Performance", command=self.performance)
         menu_bar.add_cascade(label="Help", menu=help_menu)
 
         label = tk.Label(self.root, text="Welcome to the Link Engineering Interface!", font=("Helvetica", 16))
         label.pack(pady=20)
 
-        button = tk.Button(self.root, text="Click Me", command=lambda: print("Button         clicked!"))
-        button.pack(pady=10)
-
         # add a statusbar at the bottom of the window
         self.statusbar = tk.Label(self.root, text="Ready", bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.statusbar.pack(side=tk.BOTTOM, fill=tk.X)
 
+        # the results plot takes the rest of the window, packed after the statusbar so it never hides it
+        self.plot = plot.PlotCanvas(self.root)
+        self.plot.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        # the open project and an incremental evaluator of its chain, if it defines a sweep
+        self.project = None
+        self.chain_evaluator = None
+        # the evaluated chain of the open project, or every receive path when its devices form a graph
+        self.chain_result = None
+        self.topology_result = None
+        # the (geometry, result) of the last evaluated pass
+        self.pass_result = None
+        # the open browse window, which merged library changes are shown in
+        self.browse_window = None
+        # long computations run as background jobs whose reports the Tk thread polls for
+        self.scheduler = jobs.JobScheduler()
+        self._polling_jobs = False
+
         self.load_preferences()
+        self.configure_tracing()
+        self.configure_cache()
         self.load_device_library()
+        # report the time to first paint once the main loop has drawn the window
+        self.root.after(0, self.report_startup_time)
+
+    def report_startup_time(self):
+        """Show the time from construction to the first drawn window in the status bar."""
+        self.root.update_idletasks()
+        self.first_paint_ms = (time.perf_counter() - self.start_time) * 1000.0
+        if self.device_library_loading:
+            self.statusbar.config(text=f"Window ready in {self.first_paint_ms:.0f} ms, loading device library...")
 
     def load_preferences(self):
         """Load the preferences from a json file if it exists. If not, use default settings."""
@@ -63,49 +135,588 @@ class LinkEngineeringInterface:
             self.preferences = {}
             self.statusbar.config(text="No preferences found. Using default settings.")
 
+    def configure_tracing(self):
+        """Write operation spans to a trace file once tracing is turned on in the preferences.
+
+        The file is the trace_file preference, or one in the user's cache
+        folder. Recent spans are kept in memory for the Performance window
+        either way.
+        """
+        if self.preferences.get("tracing", False):
+            tracer.configure(self.preferences.get("trace_file") or
+                             os.path.join(sidecar.user_cache_folder(), "link_engineering_trace.json"))
+        else:
+            tracer.configure(None)
+
+    def configure_cache(self):
+        """Drop the result cache so it is set up again from the preferences when next used."""
+        self._result_cache = None
+
+    def result_cache(self):
+        """Return the cache of evaluation results, created on first use.
+
+        It holds up to the cache_size_mb preference of results in memory and,
+        with the disk_cache preference, keeps them in the project folder too.
+        """
+        if self._result_cache is None:
+            folder = None
+            if self.preferences.get("disk_cache", False):
+                folder = os.path.join(self.preferences.get("project_folder", "projects/"), ".link_engineering_cache")
+            self._result_cache = cache.ResultCache(int(self.preferences.get("cache_size_mb", 64) * 1024 * 1024), folder)
+        return self._result_cache
+
+    def submit_job(self, key, function, *args, **options):
+        """Run function(job, *args) as a background job and poll for its reports on the Tk thread.
+
+        The options are those of JobScheduler.submit: a token to coalesce
+        duplicates and supersede stale jobs, the devices the job reads and
+        the callbacks, which are all called on the Tk thread.
+        """
+        job = self.scheduler.submit(key, function, *args, **options)
+        if not self._polling_jobs:
+            self._polling_jobs = True
+            self.root.after(JOB_POLL_MS, self.poll_jobs)
+        return job
+
+    def poll_jobs(self):
+        """Deliver the reports of background jobs, and keep polling while any are running."""
+        self.scheduler.poll()
+        if self.scheduler.active:
+            self.root.after(JOB_POLL_MS, self.poll_jobs)
+        else:
+            self._polling_jobs = False
+
+    def show_job_progress(self, fraction, text):
+        """Show a job's progress in the status bar."""
+        if fraction is not None:
+            text = f"{text} {100.0 * fraction:.0f}%" if text else f"{100.0 * fraction:.0f}%"
+        self.statusbar.config(text=text)
+
+    def evaluation_key(self, kind, *settings):
+        """Return the cache key and device names of an evaluation of the open project."""
+        return cache.evaluation_key(kind, self.project.devices, self.device_library, *settings)
+
+    def evaluate_chain(self):
+        """Evaluate the open project's chain over its sweep, reusing a cached result of the same devices and sweep."""
+        data = self.project.json_data
+        key, names = self.evaluation_key("chain", data["sweep"], data.get("link", {}))
+        with span("chain.evaluate") as evaluate_span:
+            evaluate_span.set(cached=key in self.result_cache())
+            self.chain_result = self.result_cache().get_or_compute(key, self.chain_evaluator.result, names)
+        self.plot_chain_result()
+
+    def evaluate_topology(self):
+        """Evaluate every receive path of the open project's device graph over its sweep, reusing a cached result."""
+        data = self.project.json_data
+        key, names = self.evaluation_key("topology", data["sweep"], data.get("link", {}), data["connections"])
+
+        def compute():
+            graph = topology.build_topology(self.project, self.device_library, tables=self.device_tables)
+            link = link_budget.LinkParameters.from_json(data.get("link", {}))
+            return topology.evaluate_topology(graph, link_budget.sweep_from_json(data["sweep"]), link)
+
+        with span("topology.evaluate") as evaluate_span:
+            evaluate_span.set(cached=key in self.result_cache())
+            self.topology_result = self.result_cache().get_or_compute(key, compute, names)
+            evaluate_span.set(paths=len(self.topology_result.paths), segments=len(self.topology_result.segments))
+        self.plot_chain_result()
+
     # add methods for opening and saving projects here.
     def load_project(self):
-        """Using a File dialog, open a project file and load its contents into the interface."""
+        """Using a File dialog, open a project file and load its contents into the interface.
+
+        The file is only indexed here; its devices and data sections are
+        parsed when they are first used.
+        """
         file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
         if file_path:
-            with open(file_path, "r") as f:
-                data = json.load(f)
-                # load the data into the interface here.
-                pass
+            try:
+                with span("project.open", path=file_path):
+                    data = project_io.ProjectFile(file_path, progress=self.report_project_progress)
+            except (OSError, project_io.ProjectFormatError) as e:
+                windows.ErrorWindow(self.root, f"Cannot open project: {e}")
+                return
+            if self.project is not None and isinstance(self.project.json_data, project_io.ProjectFile):
+                self.project.json_data.close()
+            self.project = model.Project(data, self.device_library, self.device_tables)
+            self.evaluate_project()
             self.statusbar.config(text=f"Project loaded from {file_path}")
 
+    def evaluate_project(self):
+        """Build the open project's chain or graph from scratch and evaluate it over its sweep."""
+        data = self.project.json_data
+        self.chain_evaluator = None
+        self.chain_result = None
+        self.topology_result = None
+        if "sweep" in data and self.project.is_graph:
+            try:
+                self.evaluate_topology()
+            except (link_budget.LinkBudgetError, project_io.ProjectFormatError) as e:
+                windows.ErrorWindow(self.root, f"Cannot evaluate project topology: {e}")
+        elif "sweep" in data:
+            try:
+                with span("chain.build") as chain_span:
+                    chain = link_budget.build_chain(self.project, self.device_library, tables=self.device_tables)
+                    link = link_budget.LinkParameters.from_json(data.get("link", {}))
+                    self.chain_evaluator = cascade.CascadeEvaluator(chain, link_budget.sweep_from_json(data["sweep"]), link)
+                    chain_span.set(stages=len(chain.stages))
+                self.evaluate_chain()
+            except (link_budget.LinkBudgetError, project_io.ProjectFormatError) as e:
+                windows.ErrorWindow(self.root, f"Cannot evaluate project chain: {e}")
+
+    def report_project_progress(self, position, size):
+        """Show how far the scan of a project file has got."""
+        self.statusbar.config(text=f"Indexing project... {100.0 * position / size:.0f}%")
+        self.root.update_idletasks()
+
     def load_device_library(self):
-        """Load the device library from a json file and store it in a dictinoary"""
-        self.device_library = {}
+        """Start loading the device library as a background job so the window stays responsive.
+
+        Progress is shown in the status bar and the Browse Devices menu entry
+        is enabled once the library is ready.
+        """
+        self.device_library = {"devices": {}}
+        self.device_store = None
+        self.device_tables = {}
+        self.device_table_problems = {}
+        # device name -> problems found by the schema validators
+        self.device_validation = {}
+        self.device_history = None
+        self.library_watcher = None
+        # the indexes are built with the library, off the Tk thread
+        self.device_index = None
+        self.device_capabilities = None
+        self.edit_menu.entryconfig("Browse Devices", state=tk.DISABLED)
         # figure out the full path to the devices folder
-        # check the self.parent.preferences.devices_folder attribute to get the path to the devices folder.
-        devices_folder = self.preferences["devices_folder"]
+        devices_folder = self.preferences.get("devices_folder", "devices/")
         # make sure the devices folder exists
         if not os.path.exists(devices_folder):
             os.makedirs(devices_folder)
             self.statusbar.config(text=f'Created devices folder at {devices_folder}')
-        # join the devices folder and the device name to get the full path to the device json file.
-        device_path = os.path.join(devices_folder, f'device_library.json')
+        self.device_library_loading = True
+        backend = self.preferences.get("library_backend", storage.DEFAULT_BACKEND)
+        # loading another folder or backend supersedes a load still running
+        self.submit_job("library.load", self._load_device_library_worker, devices_folder, backend,
+                        token=(devices_folder, backend), on_progress=self.show_job_progress,
+                        on_done=self.device_library_loaded, on_error=self.device_library_failed)
+
+    @staticmethod
+    def _load_device_library_worker(job, devices_folder, backend):
+        """Open the store, then read the library and prepare it, or load both from its sidecar.
+
+        Returns (store, library, prepared, cached, elapsed), with a library of
+        None when the store has no library yet.
+        """
+        start = time.perf_counter()
+        job.progress(text="Opening device library...")
+        with span("library.open", backend=backend):
+            store = storage.open_store(devices_folder, backend)
+        job.progress(text=f"Reading device library from {store.path}...")
         try:
-            with open(device_path, 'r') as f:
-                self.device_library = json.load(f)
-                self.statusbar.config(text=f"Device library loaded from {device_path}")
+            with span("library.read", path=store.path) as read_span:
+                library, prepared, cached = sidecar.load_prepared(
+                    store, lambda library: LinkEngineeringInterface._prepare_device_library(job, library))
+                read_span.set(devices=len(library.get("devices", {})), cached=cached)
         except FileNotFoundError:
-            ErrorWindow(f'Cannot read device library', f'No file found at {device_path}')
+            return store, None, None, False, time.perf_counter() - start
+        tracer.record("library.load", start, time.perf_counter() - start)
+        return store, library, prepared, cached, time.perf_counter() - start
+
+    @staticmethod
+    def _prepare_device_library(job, library):
+        """Compile, validate and index a freshly read library; the result is what the sidecar caches."""
+        devices = library.get("devices", {})
+        job.progress(text=f"Compiling tables for {len(devices)} devices...")
+        # compile the frequency dependent tables once so sweeps never re-parse the nested dicts
+        with span("library.compile_tables"):
+            tables, problems = interpolation.compile_library_tables(library)
+        job.progress(text=f"Validating {len(devices)} devices...")
+        with span("library.validate"):
+            validation = schema.validate_library(library)
+        job.progress(text="Indexing device names...")
+        with span("library.index"):
+            index = search.DeviceSearchIndex(devices)
+            capabilities = parametric.ParametricIndex(devices)
+        return {"tables": tables, "table_problems": problems, "validation": validation,
+                "index": index, "capabilities": capabilities}
+
+    def device_library_loaded(self, loaded):
+        """Adopt the library read by the loading job."""
+        self.device_library_loading = False
+        self.device_store, library, prepared, cached, elapsed = loaded
+        if library is None:
+            windows.ErrorWindow(self.root, f'Cannot read device library: no file found at {self.device_store.path}')
             return
-        
-    def save_device_library(self):
-        """Save the current device library to a json file."""
-        devices_folder = self.preferences["devices_folder"]
-        device_path = os.path.join(devices_folder, f'device_library.json')
-        try:
-            with open(device_path, 'w') as f:
-                json.dump(self.device_library, f, indent=4)
-                self.statusbar.config(text=f"Device library saved to {device_path}")
-        except Exception as e:
-            ErrorWindow(f'Cannot save device library', str(e))
+        self.device_library = library
+        self.device_tables = prepared["tables"]
+        self.device_table_problems = prepared["table_problems"]
+        self.device_validation = prepared["validation"]
+        self.device_index = prepared["index"]
+        self.device_capabilities = prepared["capabilities"]
+        self.device_history = history.EditHistory(self.device_library["devices"])
+        self.update_history_menu()
+        self.watch_device_library()
+        text = (f"Device library loaded from {self.device_store.path} "
+                f"({len(self.device_library['devices'])} devices in {elapsed * 1000.0:.0f} ms"
+                f"{', from its cache' if cached else ''})")
+        if self.device_table_problems:
+            text += f" with table problems in {len(self.device_table_problems)} device(s)"
+        if self.device_validation:
+            names = ", ".join(list(self.device_validation)[:5])
+            text += f", {len(self.device_validation)} invalid device(s): {names}"
+        self.statusbar.config(text=text)
+        self.edit_menu.entryconfig("Browse Devices", state=tk.NORMAL)
+
+    def device_library_failed(self, error):
+        """Report a library that could not be opened or read."""
+        self.device_library_loading = False
+        windows.ErrorWindow(self.root, f'Cannot open device library: {error}')
+
+    def watch_device_library(self):
+        """Start polling the device store for changes made by others, as set by the watch_interval preference.
+
+        The interval is in seconds and 0 turns watching off. A change is
+        read on a worker thread and merged device by device.
+        """
+        self.library_watcher = watcher.LibraryWatcher(self.device_store, self.device_library["devices"])
+        interval = self.preferences.get("watch_interval", 2.0)
+        if interval > 0:
+            self.root.after(int(interval * 1000), self.poll_library_watcher, self.library_watcher, interval)
+
+    def poll_library_watcher(self, library_watcher, interval):
+        """Check the store and, when it moved, read it in a background job."""
+        if library_watcher is not self.library_watcher:
+            # the library was reloaded and has a watcher of its own
             return
-    
+        if library_watcher.changed():
+            self.submit_job("library.reread", self._read_library_worker, library_watcher,
+                            on_done=lambda read: self.merge_library_changes(library_watcher, interval, read),
+                            on_error=lambda error: self.merge_library_changes(library_watcher, interval, None, error))
+        else:
+            self.root.after(int(interval * 1000), self.poll_library_watcher, library_watcher, interval)
+
+    @staticmethod
+    def _read_library_worker(job, library_watcher):
+        with span("library.reread"):
+            return library_watcher.read()
+
+    def merge_library_changes(self, library_watcher, interval, read, error=None):
+        """Merge the devices others changed once the job has read the store."""
+        if library_watcher is not self.library_watcher:
+            return
+        if error is None:
+            diff = library_watcher.merge(*read)
+            if diff:
+                self.merge_devices(diff.updates(), f"Load {len(diff)} device(s) changed in the shared library")
+                self.statusbar.config(text=f"Merged changes to {len(diff)} device(s) from {self.device_store.path}")
+        else:
+            # a half written file is read again on the next change
+            self.statusbar.config(text=f"Cannot read changes to the device library: {error}")
+        self.root.after(int(interval * 1000), self.poll_library_watcher, library_watcher, interval)
+
+    def merge_devices(self, updates, label):
+        """Bring stored versions of devices into the library as one undoable step and update the open views."""
+        names = self.device_history.apply(label, updates)
+        for name in names:
+            self.device_changed(name)
+        if self.browse_window is not None and self.browse_window.winfo_exists():
+            self.browse_window.apply_device_changes(names)
+        self.update_history_menu()
+        return names
+
+    def device_changed(self, device_name):
+        """Bring derived data up to date after a device was added, edited or deleted."""
+        if self._result_cache is not None:
+            self._result_cache.invalidate_device(device_name)
+        # analyses still running on the old parameters are stale
+        self.scheduler.cancel_dependents(device_name)
+        self.device_tables.pop(device_name, None)
+        self.device_table_problems.pop(device_name, None)
+        self.device_validation.pop(device_name, None)
+        if device_name not in self.device_library["devices"]:
+            self.device_index.remove(device_name)
+            self.device_capabilities.remove(device_name)
+            # the open project can no longer be evaluated, so its results and evaluator go until the device is back
+            if self.project is not None and device_name in self.project.library_references():
+                self.chain_evaluator = None
+                self.chain_result = None
+                self.topology_result = None
+                self.plot.clear()
+                self.statusbar.config(text=f"The project's device {device_name} was deleted from the library")
+            return
+        self.device_index.add(device_name, self.device_library["devices"][device_name])
+        self.device_capabilities.add(device_name, self.device_library["devices"][device_name])
+        invalid = schema.validate_device(self.device_library["devices"][device_name])
+        if invalid:
+            self.device_validation[device_name] = invalid
+        tables, problems = interpolation.compile_device_tables(self.device_library["devices"][device_name])
+        if tables:
+            self.device_tables[device_name] = tables
+        if problems:
+            self.device_table_problems[device_name] = problems
+            self.statusbar.config(text=f"{device_name}: {'; '.join(problems)}")
+        if self.project is None or device_name not in self.project.library_references():
+            return
+        # project devices referring to the edited device are re-parsed once here
+        spec = model.parse_device(device_name, self.device_library["devices"][device_name], tables)
+        for device in self.project.devices:
+            if device.name == device_name:
+                device.spec = spec
+        # a project left without results by a deleted device is built again once the device is back
+        if self.chain_evaluator is None and self.topology_result is None:
+            self.evaluate_project()
+            return
+        # a graph's result is keyed by its devices, so the edit gives it a new key and it is evaluated again
+        if self.topology_result is not None:
+            try:
+                self.evaluate_topology()
+            except link_budget.LinkBudgetError as e:
+                windows.ErrorWindow(self.root, f"Cannot evaluate project topology: {e}")
+        # only the part of the open chain downstream of the edited device is recomputed
+        if self.chain_evaluator is not None:
+            try:
+                with span("chain.update_device", device=device_name):
+                    self.chain_evaluator.update_device(device_name, self.device_library["devices"][device_name], tables)
+                self.evaluate_chain()
+            except link_budget.LinkBudgetError as e:
+                windows.ErrorWindow(self.root, f"Cannot evaluate project chain: {e}")
+
+    def save_device(self, device_name, device_data):
+        """Add or replace one device as an undoable edit, storing it without rewriting the rest of the library."""
+        self.store_devices(self.device_history.set(device_name, device_data))
+
+    def delete_device(self, device_name):
+        """Remove one device from the library and its store as an undoable edit."""
+        self.store_devices(self.device_history.delete(device_name))
+
+    def undo(self, event=None):
+        """Revert the last device library edit and return the names of the devices it changed."""
+        if self.device_history is None or not self.device_history.can_undo:
+            return []
+        label = self.device_history.undo_label
+        names = self.device_history.undo()
+        self.store_devices(names)
+        self.statusbar.config(text=f"Undone: {label}")
+        return names
+
+    def redo(self, event=None):
+        """Reapply the last undone device library edit and return the names of the devices it changed."""
+        if self.device_history is None or not self.device_history.can_redo:
+            return []
+        label = self.device_history.redo_label
+        names = self.device_history.redo()
+        self.store_devices(names)
+        self.statusbar.config(text=f"Redone: {label}")
+        return names
+
+    def store_devices(self, names):
+        """Write changed devices to the store, deleting those no longer in the library, and update derived data.
+
+        Writes are checked against the stored version each edit was based
+        on. A device someone else changed in the meantime is not
+        overwritten: their version is loaded as an undoable step, so undo
+        brings ours back to save again. A device that cannot be written for
+        any other reason is taken back out of the edit, undo or redo, so the
+        library and the history keep matching the store.
+        """
+        conflicts = {}
+        failed = []
+        for name in names:
+            data = self.device_library["devices"].get(name)
+            expected = self.library_watcher.version(name)
+            try:
+                if data is None:
+                    with span("library.delete_device", device=name):
+                        self.device_store.delete_checked(name, expected)
+                    self.statusbar.config(text=f"{name} deleted from {self.device_store.path}")
+                else:
+                    with span("library.save_device", device=name):
+                        self.device_store.upsert_checked(name, data, expected)
+                    self.statusbar.config(text=f"{name} saved to {self.device_store.path}")
+            except storage.VersionConflict as e:
+                conflicts[name] = history.MISSING if e.current is None else e.current
+                self.library_watcher.stored(name, e.current)
+                continue
+            except Exception as e:
+                windows.ErrorWindow(self.root, f'Cannot store device {name}: {e}')
+                failed.append(name)
+                continue
+            self.library_watcher.stored(name, data)
+            self.device_changed(name)
+        # the library keeps what the store holds, so an edit that was not stored is taken back
+        self.device_history.discard(failed)
+        self.update_history_menu()
+        if conflicts:
+            self.merge_devices(conflicts, f"Load {len(conflicts)} device(s) changed by someone else")
+            windows.ErrorWindow(self.root, f"{', '.join(conflicts)} changed in the shared library since you loaded it. "
+                                           f"Their version was loaded; use Undo to get yours back and save it again.")
+
+    def update_history_menu(self):
+        """Enable Undo and Redo when the history has a step for them."""
+        can_undo = self.device_history is not None and self.device_history.can_undo
+        can_redo = self.device_history is not None and self.device_history.can_redo
+        self.edit_menu.entryconfig("Undo", state=tk.NORMAL if can_undo else tk.DISABLED)
+        self.edit_menu.entryconfig("Redo", state=tk.NORMAL if can_redo else tk.DISABLED)
+
+    def monte_carlo(self):
+        """Run the project's Monte Carlo margin analysis as a background job and show the distribution."""
+        if self.chain_evaluator is None or "monte_carlo" not in self.project.json_data:
+            windows.ErrorWindow(self.root, "Load a project with a sweep and a monte_carlo section first")
+            return
+        data = self.project.json_data
+        key, names = self.evaluation_key("monte_carlo", data["sweep"], data.get("link", {}), data["monte_carlo"])
+        # only a seeded analysis is reproducible, and so worth caching
+        seeded = data["monte_carlo"].get("seed") is not None
+        if seeded:
+            result = self.result_cache().get(key)
+            if result is not None:
+                self.statusbar.config(text=f"Monte Carlo analysis of {result.samples:,} samples loaded from the cache")
+                windows.MonteCarloWindow(self.root, self, result)
+                return
+        samples = int(data["monte_carlo"].get("samples", 1_000_000))
+        # asking again for the same analysis while it runs joins the running job
+        self.submit_job("monte_carlo", self._monte_carlo_worker, self.chain_evaluator.chain, data["monte_carlo"],
+                        self.chain_evaluator.link, token=key, devices=names,
+                        on_partial=lambda partial: self.show_monte_carlo_progress(partial, samples),
+                        on_done=lambda done: self.monte_carlo_finished(done, (key, names) if seeded else None),
+                        on_error=lambda error: windows.ErrorWindow(self.root,
+                                                                   f"Cannot run Monte Carlo analysis: {error}"))
+        self.statusbar.config(text="Running Monte Carlo margin analysis...")
+
+    @staticmethod
+    def _monte_carlo_worker(job, chain, data, link):
+        """Run the analysis, which spreads its batches over a process pool, streaming partial results."""
+        start = time.perf_counter()
+        with span("analysis.monte_carlo", samples=data.get("samples")):
+            result = montecarlo.monte_carlo_from_json(chain, data, link, progress=job.partial)
+        return result, time.perf_counter() - start
+
+    def show_monte_carlo_progress(self, partial, samples):
+        """Show the distribution of the samples drawn so far in the status bar."""
+        self.statusbar.config(text=f"Monte Carlo margin analysis: {partial.samples:,} of {samples:,} samples, "
+                                   f"availability so far {100.0 * partial.availability:.3f}%, "
+                                   f"mean margin {partial.mean:.2f} dB")
+
+    def monte_carlo_finished(self, done, cache_entry=None):
+        """Show the Monte Carlo result, caching it under cache_entry's key."""
+        result, elapsed = done
+        if cache_entry is not None:
+            key, names = cache_entry
+            self.result_cache().put(key, result, names)
+        self.statusbar.config(text=f"Monte Carlo analysis of {result.samples:,} samples finished in {elapsed:.1f} s")
+        windows.MonteCarloWindow(self.root, self, result)
+
+    def pass_margin(self):
+        """Evaluate the link margin over time along the project's pass as a background job, plotting it as it comes."""
+        if self.chain_evaluator is None or "pass" not in self.project.json_data:
+            windows.ErrorWindow(self.root, "Load a project with a sweep and a pass section first")
+            return
+        data = self.project.json_data
+        key, names = self.evaluation_key("pass", data["sweep"], data.get("link", {}), data["pass"])
+        running = self.scheduler.get("pass")
+        if running is None or running.token != key:
+            self.plot.clear("Pass", "Time (s)", "Margin (dB)")
+        self.submit_job("pass", self._pass_worker, self.result_cache(), key, names, data["pass"],
+                        list(self.project.devices), self.chain_evaluator.chain, self.chain_evaluator.link,
+                        token=key, devices=names, on_chunk=self.plot_pass_chunk, on_done=self.show_pass_margin,
+                        on_error=lambda error: windows.ErrorWindow(self.root, f"Cannot evaluate pass: {error}"))
+        self.statusbar.config(text="Evaluating pass...")
+
+    @staticmethod
+    def _pass_worker(job, result_cache, key, names, data, devices, chain, link):
+        """Evaluate the pass in chunks, streaming each chunk's curve, unless it is cached."""
+        start = time.perf_counter()
+
+        def stream(pass_geometry, result):
+            job.chunk(LinkEngineeringInterface.pass_curve(pass_geometry, result))
+
+        with span("analysis.pass") as pass_span:
+            pass_geometry, result = result_cache.get_or_compute(
+                key, lambda: geometry.pass_from_json(data, devices, chain, link, progress=stream), names)
+            pass_span.set(steps=len(pass_geometry.times))
+        return pass_geometry, result, time.perf_counter() - start
+
+    @staticmethod
+    def pass_curve(pass_geometry, result):
+        """Return (times, values, label) of a pass: the margin, or G/T without a transmit side, above the horizon."""
+        values, label = ((result.margin_db, "Margin (dB)") if result.margin_db is not None
+                         else (result.g_over_t_db, "G/T (dB/K)"))
+        values = np.broadcast_to(values, pass_geometry.times.shape)
+        return pass_geometry.times, np.where(pass_geometry.visible(), values, np.nan), label
+
+    def plot_pass_chunk(self, curve):
+        """Append a streamed chunk of the pass being evaluated to the plot."""
+        times, values, label = curve
+        self.plot.y_label = label
+        self.plot.append(label, times, values)
+        self.statusbar.config(text=f"Evaluating pass... {len(self.plot.series[label][0]):,} steps")
+
+    def show_pass_margin(self, done):
+        """Keep the evaluated pass, plot it and summarize it in the status bar."""
+        pass_geometry, result, elapsed = done
+        self.pass_result = (pass_geometry, result)
+        self.plot_pass_result()
+        elapsed *= 1000.0
+        visible = pass_geometry.visible()
+        if not visible.any():
+            self.statusbar.config(text=f"Pass of {len(visible):,} steps: the target never rises ({elapsed:.0f} ms)")
+            return
+        text = (f"Pass of {len(visible):,} steps: {len(pass_geometry.windows())} window(s), "
+                f"max elevation {np.degrees(pass_geometry.elevation.max()):.1f} deg")
+        if result.margin_db is not None:
+            text += f", min margin above the horizon {np.min(result.margin_db[visible]):.2f} dB"
+        self.statusbar.config(text=f"{text} ({elapsed:.0f} ms)")
+
+    def plot_chain_result(self):
+        """Plot the open project's margin, or its G/T without a transmit side, against frequency."""
+        if self.topology_result is not None:
+            self.plot_topology_result()
+            return
+        if self.chain_result is None:
+            self.statusbar.config(text="Load a project with a sweep to plot its chain")
+            return
+        result = self.chain_result
+        values, label = ((result.margin_db, "Margin (dB)") if result.margin_db is not None
+                         else (result.g_over_t_db, "G/T (dB/K)"))
+        frequencies = np.ravel(result.frequencies)
+        values = np.broadcast_to(values, np.shape(result.frequencies)).ravel()
+        order = np.argsort(frequencies, kind="stable")
+        self.plot.clear("Chain", "Frequency (GHz)", label)
+        self.plot.set_series(label, frequencies[order] / 1e9, values[order])
+
+    def plot_topology_result(self):
+        """Plot the worst and best receive paths of the open graph against frequency and summarize them."""
+        result = self.topology_result
+        if not result.paths:
+            self.statusbar.config(text="The project's graph has no receive paths")
+            return
+
+        def curve(path):
+            values = path.margin_db if path.margin_db is not None else path.g_over_t_db
+            return np.broadcast_to(values, np.shape(result.frequencies)).ravel()
+
+        label = "Margin (dB)" if result.paths[0].margin_db is not None else "G/T (dB/K)"
+        lowest = [float(np.min(curve(path))) for path in result.paths]
+        worst = result.paths[int(np.argmin(lowest))]
+        best = result.paths[int(np.argmax(lowest))]
+        frequencies = np.ravel(result.frequencies)
+        order = np.argsort(frequencies, kind="stable")
+        self.plot.clear("Receive paths", "Frequency (GHz)", label)
+        self.plot.set_series(f"Worst: {worst.name}", frequencies[order] / 1e9, curve(worst)[order])
+        if best is not worst:
+            self.plot.set_series(f"Best: {best.name}", frequencies[order] / 1e9, curve(best)[order])
+        self.statusbar.config(text=f"{len(result.paths):,} receive paths from {len(result.segments):,} segments; "
+                                   f"worst {worst.name} at {min(lowest):.2f} {label.split()[-1].strip('()')}")
+
+    def plot_pass_result(self):
+        """Plot the last evaluated pass against time, with the steps below the horizon left out."""
+        if self.pass_result is None:
+            self.statusbar.config(text="Evaluate a pass to plot it")
+            return
+        times, values, label = self.pass_curve(*self.pass_result)
+        self.plot.clear("Pass", "Time (s)", label)
+        self.plot.set_series(label, times, values)
+
     def save_project(self):
         """Save the current project to a json file."""
         pass
@@ -116,35 +727,27 @@ class LinkEngineeringInterface:
 
     def browse_devices(self):
         """Browse the devices library and Create new, Edit or Delete Them."""
-        BrowseDeviceWindow(self.root, self)
+        self.browse_window = windows.BrowseDeviceWindow(self.root, self)
 
     def preferences(self):
         """Open the preferences window."""
-        PreferencesWindow(self.root, self)
+        windows.PreferencesWindow(self.root, self)
+
+    def performance(self):
+        """Open the window listing recent operation timings."""
+        windows.PerformanceWindow(self.root, self)
 
     def run(self):
         self.root.mainloop()
+        self.scheduler.shutdown()
 
-class Device():
-    """A class to represent a device in the project."""
-    def __init__(self, json_data):
-        """Initialize a device from json data."""
-        self.json_data = json_data
-        self.name = json_data['name']
-
-    def __repr__(self):
-        return f"Device(name={self.name})"
-    
-    def __str__(self):
-        return f"Device(name={self.name})"
-
-
-class Project():
-    """A class to represent a project."""
-    def __init__(self, json_data):
-        """Initialize a project from json data."""
-        self.json_data = json_data
-        self.devices = [Device(device) for device in json_data['devices']]
+def __getattr__(name):
+    # Device and Project live in core.model and the windows in gui.windows; both stay importable from here
+    if name in ("Device", "Project"):
+        return getattr(model, name)
+    if name.endswith("Window"):
+        return getattr(windows, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def main():
@@ -0,0 +1,222 @@
+"""A Tk Canvas plot of long x/y series such as margin versus frequency or time.
+
+Every series is kept in a min/max pyramid, and each redraw asks it for only
+the points visible across the plot's pixel columns, so zooming into or
+panning along a million point series draws a few thousand points. Line
+items are reused between redraws, and redraws requested in a burst, such
+as one per streamed chunk, are coalesced into one when Tk is idle.
+
+The mouse wheel zooms the x axis around the pointer, dragging pans it and
+a double click shows all the data again.
+"""
+import math
+import time
+import tkinter as tk
+
+from core.lazy import lazy_module
+
+# NumPy and the pyramid are imported with the first series, not with the window
+np = lazy_module("numpy")
+decimation = lazy_module("core.decimation")
+
+COLORS = ("#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd")
+# room around the plot area for the tick labels and titles, in pixels
+LEFT, RIGHT, TOP, BOTTOM = 60, 15, 25, 40
+TICKS = 6
+ZOOM_STEP = 1.25
+
+
+def nice_ticks(low, high, count=TICKS):
+    """Return round tick values covering low to high, about count of them."""
+    if not (math.isfinite(low) and math.isfinite(high)) or high <= low:
+        return [low] if math.isfinite(low) else []
+    raw = (high - low) / max(count - 1, 1)
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(factor * magnitude for factor in (1, 2, 2.5, 5, 10) if factor * magnitude >= raw)
+    first = math.ceil(low / step) * step
+    return [first + index * step for index in range(int((high - first) / step + 1e-9) + 1)]
+
+
+def format_tick(value):
+    return f"{value:.6g}"
+
+
+class PlotCanvas(tk.Canvas):
+    """A canvas drawing named series against a shared x axis."""
+    def __init__(self, parent, **options):
+        options.setdefault("background", "white")
+        options.setdefault("highlightthickness", 0)
+        super().__init__(parent, **options)
+        # series name -> [pyramid, colour, line items]
+        self.series = {}
+        self.title = ""
+        self.x_label = ""
+        self.y_label = ""
+        # the visible x range, or None to show all the data
+        self.view = None
+        self.last_draw_ms = 0.0
+        self._redraw_pending = False
+        self._drag = None
+        self.bind("<Configure>", lambda event: self.request_redraw())
+        self.bind("<MouseWheel>", lambda event: self.zoom(event.x, event.delta > 0))
+        self.bind("<Button-4>", lambda event: self.zoom(event.x, True))
+        self.bind("<Button-5>", lambda event: self.zoom(event.x, False))
+        self.bind("<ButtonPress-1>", self.start_pan)
+        self.bind("<B1-Motion>", self.pan)
+        self.bind("<Double-Button-1>", lambda event: self.reset_view())
+
+    def clear(self, title="", x_label="", y_label=""):
+        """Remove every series and set the titles."""
+        for _, _, items in self.series.values():
+            for item in items:
+                self.delete(item)
+        self.series = {}
+        self.title = title
+        self.x_label = x_label
+        self.y_label = y_label
+        self.view = None
+        self.request_redraw()
+
+    def set_series(self, name, x, y, color=None):
+        """Add or replace a series; x must be ascending."""
+        items = self.series[name][2] if name in self.series else []
+        color = color or (self.series[name][1] if name in self.series else COLORS[len(self.series) % len(COLORS)])
+        self.series[name] = [decimation.MinMaxPyramid(x, y), color, items]
+        self.request_redraw()
+
+    def append(self, name, x, y, color=None):
+        """Append points to a series, creating it if needed, as streamed results arrive."""
+        if name not in self.series:
+            self.set_series(name, x, y, color)
+            return
+        self.series[name][0].append(x, y)
+        self.request_redraw()
+
+    def request_redraw(self):
+        """Redraw once Tk is idle, however many times this is called before then."""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self.redraw)
+
+    def extent(self):
+        """Return the x range of all the data, or None when there is none."""
+        bounds = [pyramid.bounds() for pyramid, _, _ in self.series.values() if len(pyramid)]
+        if not bounds:
+            return None
+        return min(bound[0] for bound in bounds), max(bound[1] for bound in bounds)
+
+    def area(self):
+        """Return the (left, top, right, bottom) pixel bounds of the plot area."""
+        return LEFT, TOP, self.winfo_width() - RIGHT, self.winfo_height() - BOTTOM
+
+    def visible_range(self):
+        extent = self.extent()
+        if extent is None:
+            return None
+        x0, x1 = self.view or extent
+        if x1 <= x0:
+            x0, x1 = x0 - 0.5, x1 + 0.5
+        return x0, x1
+
+    def zoom(self, pixel_x, zoom_in):
+        """Zoom the x axis in or out around a pixel column."""
+        visible = self.visible_range()
+        if visible is None:
+            return
+        left, _, right, _ = self.area()
+        x0, x1 = visible
+        anchor = x0 + (min(max(pixel_x, left), right) - left) / max(right - left, 1) * (x1 - x0)
+        scale = 1.0 / ZOOM_STEP if zoom_in else ZOOM_STEP
+        self.set_view(anchor - (anchor - x0) * scale, anchor + (x1 - anchor) * scale)
+
+    def start_pan(self, event):
+        self._drag = (event.x, self.visible_range())
+
+    def pan(self, event):
+        """Move the x axis with the pointer while the button is held."""
+        if self._drag is None or self._drag[1] is None:
+            return
+        start_x, (x0, x1) = self._drag
+        left, _, right, _ = self.area()
+        shift = (start_x - event.x) / max(right - left, 1) * (x1 - x0)
+        self.set_view(x0 + shift, x1 + shift)
+
+    def set_view(self, x0, x1):
+        """Show x0 to x1, kept within the data; the whole data shows the data as it grows."""
+        extent = self.extent()
+        if extent is None:
+            return
+        span = min(x1 - x0, extent[1] - extent[0])
+        x0 = min(max(x0, extent[0]), extent[1] - span)
+        self.view = None if span >= extent[1] - extent[0] else (x0, x0 + span)
+        self.request_redraw()
+
+    def reset_view(self):
+        self.view = None
+        self.request_redraw()
+
+    def redraw(self):
+        """Draw the visible part of every series from its decimated view."""
+        self._redraw_pending = False
+        start = time.perf_counter()
+        self.delete("frame")
+        left, top, right, bottom = self.area()
+        if right - left < 10 or bottom - top < 10:
+            return
+        self.create_text((left + right) / 2, TOP / 2, text=self.title, tags="frame")
+        self.create_text((left + right) / 2, self.winfo_height() - 10, text=self.x_label, tags="frame")
+        self.create_text(12, (top + bottom) / 2, text=self.y_label, angle=90, tags="frame")
+        self.create_rectangle(left, top, right, bottom, outline="gray", tags="frame")
+        visible = self.visible_range()
+        if visible is None:
+            self.create_text((left + right) / 2, (top + bottom) / 2, text="No results to plot", fill="gray",
+                             tags="frame")
+            return
+        x0, x1 = visible
+        views = {name: pyramid.decimate(x0, x1, right - left) for name, (pyramid, _, _) in self.series.items()}
+        finite = [y[np.isfinite(y)] for _, y in views.values()]
+        finite = [y for y in finite if len(y)]
+        y0 = min(float(y.min()) for y in finite) if finite else 0.0
+        y1 = max(float(y.max()) for y in finite) if finite else 1.0
+        pad = (y1 - y0) * 0.05 or 1.0
+        y0, y1 = y0 - pad, y1 + pad
+        x_scale = (right - left) / (x1 - x0)
+        y_scale = (bottom - top) / (y1 - y0)
+        for name, (x, y) in views.items():
+            self._draw_series(self.series[name], np.clip(left + (x - x0) * x_scale, left, right),
+                              bottom - (y - y0) * y_scale)
+        self._draw_ticks(x0, x1, y0, y1, x_scale, y_scale)
+        self.last_draw_ms = (time.perf_counter() - start) * 1000.0
+
+    def _draw_series(self, series, px, py):
+        """Draw one series as a line per run of finite points, reusing its line items."""
+        _, color, items = series
+        finite = np.isfinite(py)
+        edges = np.diff(np.concatenate(([0], finite.astype(np.int8), [0])))
+        runs = list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+        coordinates = np.column_stack((px, py))
+        for index, (begin, end) in enumerate(runs):
+            flat = coordinates[begin:end].ravel().tolist()
+            if len(flat) == 2:
+                flat = flat * 2
+            if index < len(items):
+                self.coords(items[index], *flat)
+            else:
+                items.append(self.create_line(*flat, fill=color, width=1))
+        for item in items[len(runs):]:
+            self.delete(item)
+        del items[len(runs):]
+
+    def _draw_ticks(self, x0, x1, y0, y1, x_scale, y_scale):
+        left, top, right, bottom = self.area()
+        for value in nice_ticks(x0, x1, max(2, min(TICKS, (right - left) // 80))):
+            pixel = left + (value - x0) * x_scale
+            self.create_line(pixel, bottom, pixel, bottom + 4, fill="gray", tags="frame")
+            self.create_text(pixel, bottom + 12, text=format_tick(value), tags="frame")
+        for value in nice_ticks(y0, y1, max(2, min(TICKS, (bottom - top) // 40))):
+            pixel = bottom - (value - y0) * y_scale
+            self.create_line(left - 4, pixel, left, pixel, fill="gray", tags="frame")
+            self.create_line(left, pixel, right, pixel, fill="#eeeeee", tags="frame")
+            self.create_text(left - 6, pixel, text=format_tick(value), anchor=tk.E, tags="frame")
+        # the grid goes behind the series
+        self.tag_lower("frame")
@@ -1,9 +1,16 @@
 import tkinter as tk
 from tkinter import filedialog
+import bisect
 import json
 import os
+import time
+
+from core.model import parse_scalar
+from core.parametric import QueryError, parse_query
+from core.schema import unsupported_values
+from core import storage
+from core.tracing import profiler, span, tracer
 
-from link_engineering.src.link_engineering.units import Temperature, Frequency, Distance, Angle, Power
 
 class WindowHelpers(tk.Toplevel):
     """A class for helper functions."""
@@ -29,6 +36,129 @@ class WindowHelpers(tk.Toplevel):
         self.app.statusbar.config(text=message)
 
 
+class VirtualListbox(tk.Frame):
+    """A listbox that only materializes the rows that are visible.
+
+    The items live in a python list and the Tk listbox holds just one
+    screenful of them, so showing, scrolling and changing a list of 100k
+    devices costs the same as a list of twenty.
+    """
+    def __init__(self, parent, width=30, height=20):
+        super().__init__(parent)
+        self.items = []
+        self.top = 0
+        self.rows = height
+        self.selected = None
+        self.listbox = tk.Listbox(self, width=width, height=height, selectmode=tk.SINGLE, exportselection=False)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<Configure>", self.on_configure)
+        self.listbox.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1, "units"))
+        self.listbox.bind("<Button-4>", lambda event: self.scroll(-1, "units"))
+        self.listbox.bind("<Button-5>", lambda event: self.scroll(1, "units"))
+        self.listbox.bind("<Up>", lambda event: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self.move_selection(1))
+
+    def set_items(self, items):
+        """Replace the whole list, keeping the selection if it is still present."""
+        self.items = items
+        self.refresh()
+
+    def insert_item(self, position, item):
+        """Insert one item without touching the rest of the list."""
+        self.items.insert(position, item)
+        if position < self.top + self.rows:
+            self.refresh()
+        else:
+            self.update_scrollbar()
+
+    def remove_item(self, item):
+        """Remove one item if it is present."""
+        position = self.index_of(item)
+        if position is None:
+            return
+        del self.items[position]
+        if self.selected == item:
+            self.selected = None
+        if position < self.top + self.rows:
+            self.refresh()
+        else:
+            self.update_scrollbar()
+
+    def index_of(self, item):
+        """Return the position of an item or None."""
+        try:
+            return self.items.index(item)
+        except ValueError:
+            return None
+
+    def refresh(self):
+        """Redraw the visible window of rows."""
+        self.top = max(0, min(self.top, len(self.items) - self.rows))
+        self.listbox.delete(0, tk.END)
+        visible = self.items[self.top:self.top + self.rows]
+        if visible:
+            self.listbox.insert(tk.END, *visible)
+        if self.selected in visible:
+            row = visible.index(self.selected)
+            self.listbox.selection_set(row)
+            self.listbox.activate(row)
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        count = max(len(self.items), 1)
+        self.scrollbar.set(self.top / count, min(1.0, (self.top + self.rows) / count))
+
+    def yview(self, *args):
+        """Scrollbar callback, in the same protocol as a Tk widget's yview."""
+        if args[0] == tk.MOVETO:
+            self.top = int(float(args[1]) * len(self.items))
+            self.refresh()
+        elif args[0] == tk.SCROLL:
+            self.scroll(int(args[1]), args[2])
+
+    def scroll(self, amount, what):
+        self.top += amount * (self.rows if what == tk.PAGES else 1)
+        self.refresh()
+        return "break"
+
+    def see(self, item):
+        """Scroll so an item is visible."""
+        position = self.index_of(item)
+        if position is not None and not self.top <= position < self.top + self.rows:
+            self.top = position - self.rows // 2
+            self.refresh()
+
+    def select(self, item):
+        """Select an item and scroll it into view."""
+        self.selected = item
+        self.see(item)
+        self.refresh()
+
+    def move_selection(self, step):
+        position = self.index_of(self.selected)
+        position = 0 if position is None else max(0, min(len(self.items) - 1, position + step))
+        if self.items:
+            self.select(self.items[position])
+        return "break"
+
+    def on_select(self, event):
+        selection = self.listbox.curselection()
+        if selection:
+            self.selected = self.items[self.top + selection[0]]
+
+    def on_configure(self, event):
+        # follow the listbox height when the window is resized
+        bbox = self.listbox.bbox(0)
+        if bbox:
+            rows = max(1, event.height // bbox[3])
+            if rows != self.rows:
+                self.rows = rows
+                self.refresh()
+
+
 class BrowseDeviceWindow(WindowHelpers):
     """A window to browse and maintain our device library"""
     def __init__(self, parent, app):
@@ -45,11 +175,24 @@ class BrowseDeviceWindow(WindowHelpers):
         # add a main frame for everything else to live in
         self.main_frame = tk.Frame(self, padx=15, pady=5)
         self.main_frame.grid(row=0, column=0, sticky="nsew")
-        # add a frame on the left side for the device list
+        # add a frame on the left side for the filter and the device list
         self.list_frame = tk.Frame(self.main_frame)
         self.list_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        # add a listbox to the left side frame for the device list
-        self.device_listbox = tk.Listbox(self.list_frame, width=30, height=20, selectmode=tk.SINGLE)
+        # add a type-ahead filter over device names and parameter keys
+        self.filter_var = tk.StringVar()
+        self.filter_entry = tk.Entry(self.list_frame, textvariable=self.filter_var)
+        self.filter_entry.pack(side=tk.TOP, fill=tk.X)
+        self.filter_var.trace_add("write", lambda *args: self.update_device_listbox())
+        # add a capability filter, e.g. "lna 8.0-8.4GHz nf<1 gain>20", answered by the parametric index
+        self.capability_var = tk.StringVar()
+        self.capability_entry = tk.Entry(self.list_frame, textvariable=self.capability_var)
+        self.capability_entry.pack(side=tk.TOP, fill=tk.X)
+        self.capability_var.trace_add("write", lambda *args: self.update_capability_filter())
+        # the devices matching the last query that parsed, and that query's parsed terms
+        self.capability_matches = None
+        self.capability_query = None
+        # add a virtual list to the left side frame for the device list
+        self.device_listbox = VirtualListbox(self.list_frame, width=30, height=20)
         self.device_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         # add a frame on the right side for our control buttons. Add, Edit, and Delete.
         self.control_frame = tk.Frame(self.main_frame)
@@ -58,61 +201,267 @@ class BrowseDeviceWindow(WindowHelpers):
         self.add_button = tk.Button(self.control_frame, text="Add", command=self.add_device)
         self.edit_button = tk.Button(self.control_frame, text="Edit", command=self.edit_device)
         self.delete_button = tk.Button(self.control_frame, text="Delete", command=self.delete_device)
+        self.undo_button = tk.Button(self.control_frame, text="Undo", command=self.undo)
+        self.redo_button = tk.Button(self.control_frame, text="Redo", command=self.redo)
         self.cancel_button = tk.Button(self.control_frame, text="Cancel", command=self.destroy)
         self.add_button.pack(side=tk.TOP, fill=tk.X)
         self.edit_button.pack(side=tk.TOP, fill=tk.X)
         self.delete_button.pack(side=tk.TOP, fill=tk.X)
+        self.undo_button.pack(side=tk.TOP, fill=tk.X)
+        self.redo_button.pack(side=tk.TOP, fill=tk.X)
         self.cancel_button.pack(side=tk.TOP, fill=tk.X)
+        # the window is modal, so it takes the undo shortcuts of the main window
+        self.bind("<Control-z>", lambda event: self.undo())
+        self.bind("<Control-y>", lambda event: self.redo())
         self.center_on_parent()
 
-        self.update_device_listbox(active_index=0)
-
-    def update_device_listbox(self, active_index=None):
-        """Update the device listbox with the current devices."""
-        # clear the current devices from the listbox
-        self.device_listbox.delete(0, tk.END)
-        # add the current devices to the listbox
-        for device in self.app.device_library["devices"].keys():
-            self.device_listbox.insert(tk.END, device)
-        self.device_listbox.selection_set(active_index)
-        self.device_listbox.activate(active_index)
-        self.device_listbox.yview_moveto(0)
+        self.update_device_listbox()
+        if self.device_listbox.items:
+            self.device_listbox.select(self.device_listbox.items[0])
+        self.filter_entry.focus_set()
+
+    def update_device_listbox(self):
+        """Show the devices matching the current filters."""
+        with span("browse.update_listbox") as listbox_span:
+            names = self.app.device_index.search(self.filter_var.get())
+            if self.capability_matches is not None:
+                names = [name for name in names if name in self.capability_matches]
+            self.device_listbox.set_items(names)
+            listbox_span.set(shown=len(names))
+
+    def update_capability_filter(self):
+        """Run the capability query and refilter the list; an unparsable query leaves the list as it was."""
+        text = self.capability_var.get().strip()
+        if not text:
+            self.capability_matches = None
+            self.capability_query = None
+        else:
+            try:
+                query = parse_query(text)
+                self.capability_matches = set(self.app.device_capabilities.query(**query))
+            except QueryError as e:
+                self.update_status_bar(f"Capability filter: {e}")
+                return
+            self.capability_query = query
+        self.update_device_listbox()
+
+    def matches_filters(self, name):
+        """Return True if a device passes both the name and the capability filter."""
+        if not self.app.device_index.matches(name, self.filter_var.get()):
+            return False
+        if self.capability_matches is None:
+            return True
+        # test the last query that parsed on this device only, since its parameters may have changed
+        matches = self.app.device_capabilities.matches(name, **self.capability_query)
+        if matches:
+            self.capability_matches.add(name)
+        else:
+            self.capability_matches.discard(name)
+        return matches
+
+    def apply_device_changes(self, changed_names, select=None):
+        """Apply added, edited or deleted devices to the list as incremental changes."""
+        for name in changed_names:
+            self.device_listbox.remove_item(name)
+            if self.matches_filters(name):
+                # the list is sorted like the index, so a bisect finds the slot
+                position = bisect.bisect_left(self.device_listbox.items, (name.lower(), name),
+                                              key=lambda item: (item.lower(), item))
+                self.device_listbox.insert_item(position, name)
+        if select is not None:
+            self.device_listbox.select(select)
 
     def add_device(self):
         """Add a new device to the device library."""
         # create a window to add a new device, if the user clicks cancel, do nothing
         add_window = DeviceWindow(self, self.app)
         if add_window.result:
-            self.update_device_listbox(active_index="end")
+            self.apply_device_changes([add_window.device_name], select=add_window.device_name)
 
     def edit_device(self):
         """Edit an existing device in the device library."""
-        # get the selected device from the listbox
-        selected_device = self.device_listbox.get(tk.ACTIVE)
-        # get the index of the selected device in the listbox
-        index = self.device_listbox.index(tk.ACTIVE)
+        # get the selected device from the list
+        selected_device = self.device_listbox.selected
+        if selected_device is None:
+            return
+        # the editor shows numbers, strings, booleans and dictionaries only
+        unsupported = unsupported_values(self.app.device_library["devices"][selected_device])
+        if unsupported:
+            ErrorWindow(self, f"{selected_device} has values the editor cannot show: {', '.join(unsupported)}")
+            return
         # create a window to edit the device
-        DeviceWindow(self, self.app, selected_device)
-        self.update_device_listbox(index)
+        edit_window = DeviceWindow(self, self.app, selected_device)
+        if edit_window.result:
+            self.apply_device_changes([edit_window.device_name], select=edit_window.device_name)
 
     def delete_device(self):
         """Delete an existing device from the device library."""
-        # get the selected device from the listbox
-        selected_device = self.device_listbox.get(tk.ACTIVE)
+        # get the selected device from the list
+        selected_device = self.device_listbox.selected
+        if selected_device is None:
+            return
+        position = self.device_listbox.index_of(selected_device)
         # remove the selected device from the library
-        self.app.device_library["devices"].pop(selected_device)
-        self.app.save_device_library()
-        # update the device listbox
-        self.update_device_listbox(active_index=0)
+        self.app.delete_device(selected_device)
+        # update the device list
+        self.apply_device_changes([selected_device])
+        if self.device_listbox.items:
+            self.device_listbox.select(self.device_listbox.items[min(position, len(self.device_listbox.items) - 1)])
+
+    def undo(self):
+        """Revert the last library edit and show its devices in the list."""
+        self.show_history_changes(self.app.undo())
+
+    def redo(self):
+        """Reapply the last undone library edit and show its devices in the list."""
+        self.show_history_changes(self.app.redo())
+
+    def show_history_changes(self, names):
+        """Apply the devices changed by undo or redo to the list and select one that is still listed."""
+        self.apply_device_changes(names)
+        for name in names:
+            if self.device_listbox.index_of(name) is not None:
+                self.device_listbox.select(name)
+                break
+
+
+def parameter_type(value):
+    """Return the editor type name of a parameter value."""
+    if type(value) is bool:
+        return "Boolean"
+    if type(value) is int or type(value) is float:
+        return "Number"
+    if type(value) is str:
+        return "String"
+    if type(value) is dict:
+        return "Dictionary"
+    raise ValueError("Unsupported data type for device parameter: {}".format(type(value)))
+
+
+def parse_value(text, value_type="Number"):
+    """Turn the text of an entry back into a parameter value."""
+    return parse_scalar(text, value_type)
+
+
+class ParameterNode:
+    """One parameter of the device being edited.
+
+    Dictionaries keep their raw data and only build child nodes when they
+    are first expanded, and a dictionary that was never expanded is saved
+    back exactly as it was loaded.
+    """
+    __slots__ = ("key", "value_type", "text", "raw", "children", "expanded", "depth")
+
+    def __init__(self, key, value, depth, value_type=None):
+        self.key = key
+        self.depth = depth
+        self.value_type = value_type or parameter_type(value)
+        self.expanded = False
+        self.children = None
+        self.raw = value if self.value_type == "Dictionary" else None
+        self.text = "" if self.value_type == "Dictionary" or value is None else str(value)
+
+    def ensure_children(self):
+        """Build the child nodes of a dictionary on first use."""
+        if self.children is None:
+            self.children = [ParameterNode(key, value, self.depth + 1) for key, value in (self.raw or {}).items()]
+
+    def to_value(self):
+        """Return the edited value of this parameter."""
+        if self.value_type != "Dictionary":
+            return parse_value(self.text, self.value_type)
+        if self.children is None:
+            return self.raw if self.raw is not None else {}
+        return {child.key: child.to_value() for child in self.children}
+
+
+class ParameterRow(tk.Frame):
+    """A reusable row of widgets that can show any ParameterNode."""
+    def __init__(self, parent, window):
+        super().__init__(parent)
+        self.window = window
+        self.node = None
+        self.key_var = tk.StringVar()
+        self.value_var = tk.StringVar()
+        self.toggle_button = tk.Button(self, width=2, command=lambda: self.window.toggle(self.node))
+        self.toggle_button.grid(row=0, column=0, sticky="w")
+        self.key_entry = tk.Entry(self, width=20, textvariable=self.key_var)
+        self.key_entry.grid(row=0, column=1, sticky="ew")
+        self.value_entry = tk.Entry(self, width=40, textvariable=self.value_var)
+        self.value_entry.grid(row=0, column=2, sticky="ew")
+        self.type_label = tk.Label(self, width=10, anchor="w")
+        self.type_label.grid(row=0, column=3, sticky="w")
+        self.add_item_button = tk.Button(self, text="Add Item", command=lambda: self.window.add_item(self.node))
+        self.add_item_button.grid(row=0, column=4, sticky="w")
+        # write edits straight into the node the row is showing
+        self.key_var.trace_add("write", lambda *args: self.write_back("key", self.key_var))
+        self.value_var.trace_add("write", lambda *args: self.write_back("text", self.value_var))
+        for widget in (self, self.key_entry, self.value_entry, self.type_label):
+            widget.bind("<MouseWheel>", lambda event: self.window.scroll(-1 if event.delta > 0 else 1))
+            widget.bind("<Button-4>", lambda event: self.window.scroll(-1))
+            widget.bind("<Button-5>", lambda event: self.window.scroll(1))
+
+    def write_back(self, attribute, variable):
+        """Copy an edited entry into the node the row is showing."""
+        if self.node is not None:
+            setattr(self.node, attribute, variable.get())
+
+    def bind_node(self, node):
+        """Show a node in this row."""
+        self.node = None
+        self.key_var.set(node.key)
+        self.value_var.set(node.text)
+        self.node = node
+        self.toggle_button.grid_configure(padx=(node.depth * 20, 0))
+        self.type_label.config(text=node.value_type)
+        if node.value_type == "Dictionary":
+            self.toggle_button.config(text="-" if node.expanded else "+", state=tk.NORMAL)
+            self.value_entry.grid_remove()
+            self.add_item_button.grid()
+        else:
+            self.toggle_button.config(text="", state=tk.DISABLED)
+            self.value_entry.grid()
+            self.add_item_button.grid_remove()
+
+
+class RowPool:
+    """Hands out ParameterRow widgets, reusing released ones instead of creating new widgets."""
+    def __init__(self, parent, window):
+        self.parent = parent
+        self.window = window
+        self.free = []
+        self.created = 0
+
+    def acquire(self):
+        if self.free:
+            return self.free.pop()
+        self.created += 1
+        return ParameterRow(self.parent, self.window)
+
+    def release(self, row):
+        row.node = None
+        row.grid_remove()
+        self.free.append(row)
 
 
 class DeviceWindow(WindowHelpers):
-    """A window to create a new device."""
+    """A window to create a new device.
+
+    Parameters are held in a tree of ParameterNode objects and only the rows
+    that fit in the window are backed by widgets, taken from a pool of
+    recycled rows. Dictionaries start collapsed and build their children
+    when expanded, so opening a device costs the same whatever its size.
+    """
+    # number of parameter rows visible at once
+    VISIBLE_ROWS = 20
+
     def __init__(self, parent, app, selected_device=None):
+        start = time.perf_counter()
         super().__init__(parent, app)
         self.parent = parent
         self.app = app
         self.result = None
+        self.device_name = None
         self.title("Create Device")
         # set the dialog size
         self.geometry()
@@ -121,8 +470,11 @@ class DeviceWindow(WindowHelpers):
         self.grab_set()
         self.focus_set()
 
-        # create a parameter list for lookups of the widgets, this is alist of tuples. The first element of the tuple is the points tothe parameter_name widget, the second element is theparameter_value widget.
-        self.parameter_list = []
+        # the top level parameters, the flattened list of visible nodes and the first one shown
+        self.parameter_nodes = []
+        self.visible_nodes = []
+        self.top = 0
+        self.rows = []
 
         # add a main frame for everything else to live in
         self.main_frame = tk.Frame(self, padx=15, pady=5)
@@ -133,10 +485,9 @@ class DeviceWindow(WindowHelpers):
         # add widgets for creating a device here
         self.parameter_type_var = tk.StringVar()
         self.parameter_type_var.set("String")
-        add_button = tk.Button(top_frame, text="Add Parameter")
-        
+        add_button = tk.Button(top_frame, text="Add Parameter", command=self.add_parameter)
         add_button.pack(side=tk.LEFT)
-        parameter_type_menu = tk.OptionMenu(top_frame, self.parameter_type_var, "String", "Number", "Temerature", "Frequency", "Angle", "Distance", "Power")
+        parameter_type_menu = tk.OptionMenu(top_frame, self.parameter_type_var, "String", "Number", "Boolean", "Dictionary", "Temerature", "Frequency", "Angle", "Distance", "Power")
         parameter_type_menu.pack(side=tk.LEFT)
         # add an empty label to separate the buttons
         empty_label = tk.Label(top_frame, text="", width=2) 
@@ -146,170 +497,135 @@ class DeviceWindow(WindowHelpers):
         cancel_button.pack(side=tk.RIGHT)
         save_button = tk.Button(top_frame, text="Save", command=self.save_device)
         save_button.pack(side=tk.RIGHT)
-        # add a frame for the device parameters
-        self.parameters_frame = tk.Frame(self.main_frame, padx=15, pady=5)
-        self.parameters_frame.grid(row=1, column=0, sticky="nsew")
-        # add a class variable to keep track of which row we are on inside the parameters frame
-        next_row = self.parameters_frame.grid_size()[1] + 1
-
         # create a label and entry for the device name
-        name_label = tk.Label(self.parameters_frame, text="Name:")
-        name_label.grid(row=next_row, column=0, sticky="w")
-        self.name_entry = tk.Entry(self.parameters_frame)
-        self.name_entry.grid(row=next_row, column=1, sticky="ew")
-
-        add_button.config(command=lambda: self.add_parameter(self.parameters_frame, self.parameter_type_var, self.parameter_list, depth=0))
-        # center the dialog on the parent window
-        self.center_on_parent()
+        name_frame = tk.Frame(self.main_frame, padx=15)
+        name_frame.grid(row=1, column=0, sticky="nsew")
+        name_label = tk.Label(name_frame, text="Name:")
+        name_label.pack(side=tk.LEFT)
+        self.name_entry = tk.Entry(name_frame)
+        self.name_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        # add a frame for the device parameters with a scrollbar over the whole parameter tree
+        self.parameters_frame = tk.Frame(self.main_frame, padx=15, pady=5)
+        self.parameters_frame.grid(row=2, column=0, sticky="nsew")
+        self.scrollbar = tk.Scrollbar(self.main_frame, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.grid(row=2, column=1, sticky="ns")
+        self.row_pool = RowPool(self.parameters_frame, self)
+        # a single menu of item types, posted by the Add Item button of any dictionary row
+        self.item_menu = tk.Menu(self, tearoff=0)
+        self.item_menu_target = None
+        for item_type in ("String", "Number", "Boolean", "Dictionary"):
+            self.item_menu.add_command(label=item_type, command=lambda item_type=item_type: self.add_child(item_type))
 
         if selected_device is not None:
             # get the device data from the device library
             device_data = self.app.device_library["devices"][selected_device]
-            # load the device data into the entry fields
+            # load the device data into the parameter tree, nested dictionaries stay collapsed
             self.name_entry.insert(0, selected_device)
             for key in device_data.keys():
-                if type(device_data[key]) is str:
-                    self.add_parameter(self.parameters_frame, "String", self.parameter_list, depth=0, data=[key, device_data[key]])
-                elif type(device_data[key]) is int or type(device_data[key]) is float:
-                    self.add_parameter(self.parameters_frame, "Number", self.parameter_list, depth=0, data=[key, device_data[key]])
-                elif type(device_data[key]) is bool:
-                    self.add_parameter(self.parameters_frame, "Boolean", self.parameter_list, depth=0, data=[key, device_data[key]])
-                elif type(device_data[key]) is dict:
-                    if key == "Frequency":   
-                        self.add_parameter(self.parameters_frame,"Dictionary", self.parameter_list, depth=0, data=[key, device_data[key]])
-                    elif key == "Temperature":
-                        self.add_parameter(self.parameters_frame,"Dictionary", self.parameter_list, depth=0, data=[key, device_data[key]])
-                    elif key == "Distance":
-                        self.add_parameter(self.parameters_frame,"Dictionary", self.parameter_list, depth=0, data=[key, device_data[key]])
-                    elif key == "Angle":
-                        self.add_parameter(self.parameters_frame,"Dictionary", self.parameter_list, depth=0, data=[key, device_data[key]])
-                    elif key == "Power":
-                        self.add_parameter(self.parameters_frame,"Dictionary", self.parameter_list, depth=0, data=[key, device_data[key]])
-                else:
-                    raise ValueError("Unsupported data type for device parameter: {}".format(type(device_data[key])))
+                self.parameter_nodes.append(ParameterNode(key, device_data[key], depth=0))
+        self.refresh()
+        # center the dialog on the parent window
+        self.center_on_parent()
+        # the span covers building the window, not the time it then stays open
+        tracer.record("device_window.open", start, time.perf_counter() - start,
+                      {"device": selected_device, "parameters": len(self.parameter_nodes)})
 
         parent.wait_window(self)
 
-    def add_parameter(self, target_frame, type_var, storage_list, depth=0, data=None):
-        """Add a new parameter to the device."""
-        # what type of parameter to add?
-        if data:
-            parameter_type = type_var
-        else:
-            parameter_type = type_var.get()
-        # add the parameter based on its type
-        if parameter_type == "Dictionary":
-            self.add_dictionary_object(target_frame, storage_list, depth, data)
-        else:
-            self.add_simple_object(target_frame, parameter_type, storage_list, depth, data)
-
-
-    def add_simple_object(self, target_frame, object_type, storage_list, depth, data=None):
-        """Add a new string object to the device."""
-        next_row = target_frame.grid_size()[1] + 1
-
-        descriptor_label = tk.Label(target_frame, text="Descriptor:")
-        descriptor_label.grid(row=next_row, column=depth, sticky="w")
-        value_label = tk.Label(target_frame, text=object_type)
-        value_label.grid(row=next_row, column=depth+1, sticky="w")
-        next_row += 1
-        parameter_descriptor_entry = tk.Entry(target_frame,width=20)
-        parameter_descriptor_entry.grid(row=next_row, column=depth,sticky="ew")
-        parameter_value_entry = tk.Entry(target_frame, width=40)
-        parameter_value_entry.grid(row=next_row, column=depth+1,sticky="ew")
-        # append the parameter value label and entry widgets to a 2 elementlist and append that to the parameter_list.
-        temp_list = [parameter_descriptor_entry, parameter_value_entry]
-        if data:
-            parameter_descriptor_entry.insert(0, data[0])
-            parameter_value_entry.insert(0, data[1])
-        storage_list.append(temp_list)
-
-    def add_dictionary_object(self, target_frame, storage_list, depth, data=None):
-        """Add a dictionary object to the parameters list."""
-        next_row = target_frame.grid_size()[1] + 1
-        dictionary_label = tk.Label(target_frame, text="Dictionary")
-        dictionary_label.grid(row=next_row, column=depth,sticky="ew")
-        dictionary_name_entry = tk.Entry(target_frame, width=40)
-        dictionary_name_entry.grid(row=next_row, column=depth+1,sticky="ew")
-        next_row += 1
-        dictionary_contents = []
-        # add a button to add key, value pairs to the dictionary object. Add a tk.StringVar() to hold the object type.
-        parameter_type_var = tk.StringVar(value="Dictionary")
-        # add a frame to hold the key, value pairs of the dictionary object.
-        dictionary_frame = tk.Frame(target_frame)
-        dictionary_frame.grid(row=next_row, column=depth+1,sticky="ew")
-        # add a button to add key, value pairs to the dictionary object. Add a tk.StringVar() to hold the object type.
-        parameter_type_var = tk.StringVar(value="Dictionary")
-        next_row = dictionary_frame.grid_size()[1] + 1
-        add_item_button = tk.Button(dictionary_frame, text="Add Item",command=lambda: self.add_parameter(dictionary_frame, parameter_type_var,dictionary_contents, depth+1))
-        add_item_button.grid(row=next_row, column=depth,sticky="ew")
-        parameter_type_menu = tk.OptionMenu(dictionary_frame, parameter_type_var, "String", "Number", "Boolean", "Dictionary")
-        parameter_type_menu.grid(row=next_row, column=depth+1,sticky="ew")
-        # append the parameter value label and entry widgets to a 2 elementlist and append that to the parameter_list.
-        temp_list = ["Dictionary", dictionary_name_entry, dictionary_contents]
-        if data:
-            dictionary_name_entry.insert(0, data[0])
-            device_data = data[1]
-            for key in device_data.keys():
-                if type(device_data[key]) is str:
-                    self.add_parameter(dictionary_frame, "String", dictionary_contents, depth=depth+1, data=[key, device_data[key]])
-                elif type(device_data[key]) is int or type(device_data[key]) is float:
-                    self.add_parameter(dictionary_frame, "Number", dictionary_contents, depth=depth+1, data=[key, device_data[key]])
-                elif type(device_data[key]) is bool:
-                    self.add_parameter(dictionary_frame,"Boolean", dictionary_contents, depth=depth+1, data=[key, device_data[key]])
-                elif type(device_data[key]) is dict:
-                    self.add_parameter(dictionary_frame, "Dictionary", dictionary_contents, depth=depth+1, data=[key, device_data[key]])
-                else:
-                    ErrorWindow("Error", "Unsupported data type for device parameter: {}".format(type(device_data[key])))
-        storage_list.append(temp_list)
+    def flatten(self):
+        """Rebuild the list of visible nodes from the expanded parts of the tree."""
+        visible = []
+        stack = list(reversed(self.parameter_nodes))
+        while stack:
+            node = stack.pop()
+            visible.append(node)
+            if node.expanded and node.children:
+                stack.extend(reversed(node.children))
+        self.visible_nodes = visible
+
+    def refresh(self):
+        """Flatten the tree and redraw the visible rows."""
+        self.flatten()
+        self.render()
+
+    def render(self):
+        """Bind the visible window of nodes to pooled rows."""
+        self.top = max(0, min(self.top, len(self.visible_nodes) - self.VISIBLE_ROWS))
+        shown = self.visible_nodes[self.top:self.top + self.VISIBLE_ROWS]
+        while len(self.rows) > len(shown):
+            self.row_pool.release(self.rows.pop())
+        while len(self.rows) < len(shown):
+            self.rows.append(self.row_pool.acquire())
+        for index, (row, node) in enumerate(zip(self.rows, shown)):
+            row.bind_node(node)
+            row.grid(row=index, column=0, sticky="w")
+        count = max(len(self.visible_nodes), 1)
+        self.scrollbar.set(self.top / count, min(1.0, (self.top + self.VISIBLE_ROWS) / count))
+
+    def yview(self, *args):
+        """Scrollbar callback."""
+        if args[0] == tk.MOVETO:
+            self.top = int(float(args[1]) * len(self.visible_nodes))
+            self.render()
+        elif args[0] == tk.SCROLL:
+            self.scroll(int(args[1]) * (self.VISIBLE_ROWS if args[2] == tk.PAGES else 1))
+
+    def scroll(self, amount):
+        self.top += amount
+        self.render()
+        return "break"
+
+    def toggle(self, node):
+        """Expand or collapse a dictionary, building its children the first time."""
+        if node is None or node.value_type != "Dictionary":
+            return
+        node.ensure_children()
+        node.expanded = not node.expanded
+        self.refresh()
+
+    def add_parameter(self):
+        """Add a new top level parameter to the device."""
+        parameter_type = self.parameter_type_var.get()
+        value = {} if parameter_type == "Dictionary" else ""
+        self.parameter_nodes.append(ParameterNode("", value, depth=0, value_type=parameter_type))
+        self.refresh()
+        self.see(self.parameter_nodes[-1])
+
+    def add_item(self, node):
+        """Offer the item types for a new entry of a dictionary."""
+        self.item_menu_target = node
+        self.item_menu.tk_popup(self.winfo_pointerx(), self.winfo_pointery())
+
+    def add_child(self, item_type):
+        """Add an item of the chosen type to the dictionary whose Add Item button was used."""
+        node = self.item_menu_target
+        if node is None:
+            return
+        node.ensure_children()
+        node.expanded = True
+        value = {} if item_type == "Dictionary" else ""
+        child = ParameterNode("", value, node.depth + 1, value_type=item_type)
+        node.children.append(child)
+        self.refresh()
+        self.see(child)
+
+    def see(self, node):
+        """Scroll so a node is visible."""
+        index = self.visible_nodes.index(node)
+        if not self.top <= index < self.top + self.VISIBLE_ROWS:
+            self.top = index - self.VISIBLE_ROWS + 1
+            self.render()
 
     def save_device(self):
         """Save the device and close the window."""
         device_name = self.name_entry.get()
-        # build a dictionary out of our parameter list.
-        device_dict = {}
-        for parameter in self.parameter_list:
-            if type(parameter[0]) == str:
-                dictionary_name_entry = parameter[1]
-                dictionary_contents = parameter[2]
-                device_dict[dictionary_name_entry.get()] = self.traverse_serial_dictionary(dictionary_contents)
-            else:
-                descriptor = parameter[0].get()
-                value = parameter[1].get()
-                # set the value to the correct type.
-                if value.isdigit():
-                    value = int(value)
-                elif "." in value:
-                    value = float(value)
-                else:
-                    value = str(value)
-                device_dict[descriptor] = value
-        self.app.device_library["devices"][device_name] = device_dict
-        self.app.save_device_library()
+        # build a dictionary out of our parameter tree, collapsed dictionaries are kept as loaded.
+        device_dict = {node.key: node.to_value() for node in self.parameter_nodes}
+        self.app.save_device(device_name, device_dict)
+        self.device_name = device_name
         self.result = True
         self.destroy()
 
-    def traverse_serial_dictionary(self, dictionary_contents):
-        """Traverse a serial dictionary and return a python dictionary."""
-        temp_dictionary = {}
-        for parameter in dictionary_contents:
-            if type(parameter[0]) == str:
-                dictionary_name_entry = parameter[1]
-                dictionary_contents = parameter[2]
-                temp_dictionary[dictionary_name_entry.get()] = self.traverse_serial_dictionary(dictionary_contents)
-            else:
-                descriptor = parameter[0].get()
-                value = parameter[1].get()
-                # set the value to the correct type.
-                if value.isdigit():
-                    value = int(value)
-                elif "." in value:
-                    value = float(value)
-                else:
-                    value = str(value)
-                temp_dictionary[descriptor] = value
-        return temp_dictionary
-
 
 class PreferencesWindow(WindowHelpers):
     """A dialog for setting preferences."""
@@ -353,6 +669,25 @@ class PreferencesWindow(WindowHelpers):
         project_folder_button = tk.Button(preferences_frame, text="Browse", command=self.browse_project_folder)
         project_folder_button.grid(row=1, column=2, padx=5)
 
+        # create a label and menu for the device library storage backend
+        library_backend_label = tk.Label(preferences_frame, text="Device library storage:")
+        library_backend_label.grid(row=2, column=0, sticky=tk.W)
+        self.library_backend_var = tk.StringVar(value=self.app.preferences.get('library_backend', storage.DEFAULT_BACKEND))
+        library_backend_menu = tk.OptionMenu(preferences_frame, self.library_backend_var, *storage.BACKENDS)
+        library_backend_menu.grid(row=2, column=1, padx=10, sticky=tk.W)
+
+        # create a checkbox to write operation timings to a trace file
+        self.tracing_var = tk.BooleanVar(value=self.app.preferences.get('tracing', False))
+        tracing_check = tk.Checkbutton(preferences_frame, text="Write operation traces to file",
+                                       variable=self.tracing_var)
+        tracing_check.grid(row=3, column=1, padx=10, sticky=tk.W)
+
+        # create a checkbox to keep evaluation results in the project folder between sessions
+        self.disk_cache_var = tk.BooleanVar(value=self.app.preferences.get('disk_cache', False))
+        disk_cache_check = tk.Checkbutton(preferences_frame, text="Keep evaluation results in the project folder",
+                                          variable=self.disk_cache_var)
+        disk_cache_check.grid(row=4, column=1, padx=10, sticky=tk.W)
+
         # create a frame for the save and cancel buttons
         button_frame = tk.Frame(self)
         button_frame.pack(pady=10)
@@ -378,10 +713,16 @@ class PreferencesWindow(WindowHelpers):
             self.project_folder_entry.insert(0, folder_selected)
 
     def save_preferences(self):
-        self.app.preferences = {
+        # settings without a control here, like trace_file and cache_size_mb, are kept as they are
+        self.app.preferences = dict(self.app.preferences, **{
             'devices_folder': self.devices_folder_entry.get(),
-            'project_folder': self.project_folder_entry.get()
-        }
+            'project_folder': self.project_folder_entry.get(),
+            'library_backend': self.library_backend_var.get(),
+            'tracing': self.tracing_var.get(),
+            'disk_cache': self.disk_cache_var.get(),
+        })
+        self.app.configure_tracing()
+        self.app.configure_cache()
         try:
             with open('preferences.json', 'w') as f:
                 json.dump(self.app.preferences, f, indent=4)
@@ -392,6 +733,116 @@ class PreferencesWindow(WindowHelpers):
         self.destroy()
 
 
+class MonteCarloWindow(WindowHelpers):
+    """Shows the margin distribution of a Monte Carlo run as a summary and a histogram."""
+    WIDTH = 480
+    HEIGHT = 200
+
+    def __init__(self, parent, app, result):
+        super().__init__(parent, app)
+        self.title("Monte Carlo Margin")
+        self.result = result
+        summary = (f"{result.samples:,} samples, mean {result.mean:.2f} dB, std {result.std:.2f} dB, "
+                   f"availability {100.0 * result.availability:.3f}%")
+        tk.Label(self, text=summary).pack(padx=10, pady=(10, 0))
+        percentiles = "   ".join(f"P{percent}: {margin:.2f} dB" for percent, margin in result.percentiles().items())
+        tk.Label(self, text=percentiles).pack(padx=10)
+        self.canvas = tk.Canvas(self, width=self.WIDTH, height=self.HEIGHT, bg="white")
+        self.canvas.pack(padx=10, pady=10)
+        self.draw_histogram()
+        tk.Button(self, text="Close", command=self.destroy).pack(pady=(0, 10))
+        self.center_on_parent()
+
+    def draw_histogram(self):
+        """Draw the histogram bins, merged to at most one bar per pixel column, and the zero margin line."""
+        counts = self.result.counts
+        edges = self.result.edges
+        columns = max(1, len(counts) // self.WIDTH + (len(counts) % self.WIDTH > 0))
+        bars = [sum(counts[index:index + columns]) for index in range(0, len(counts), columns)]
+        tallest = max(bars) or 1
+        bar_width = self.WIDTH / len(bars)
+        for index, count in enumerate(bars):
+            height = (self.HEIGHT - 20) * count / tallest
+            x = index * bar_width
+            self.canvas.create_rectangle(x, self.HEIGHT - 20 - height, x + bar_width, self.HEIGHT - 20,
+                                         fill="steelblue", width=0)
+        low, high = edges[0], edges[-1]
+        self.canvas.create_text(2, self.HEIGHT - 10, text=f"{low:.1f} dB", anchor=tk.W)
+        self.canvas.create_text(self.WIDTH - 2, self.HEIGHT - 10, text=f"{high:.1f} dB", anchor=tk.E)
+        if low < 0.0 < high:
+            x = self.WIDTH * (0.0 - low) / (high - low)
+            self.canvas.create_line(x, 0, x, self.HEIGHT - 20, fill="red")
+
+
+class PerformanceWindow(WindowHelpers):
+    """Lists recent operation timings and switches a cProfile capture on and off."""
+    REFRESH_MS = 1000
+
+    def __init__(self, parent, app):
+        super().__init__(parent, app)
+        self.title("Performance")
+        # the most recent spans, newest first
+        tk.Label(self, text="Recent operations").pack(anchor=tk.W, padx=10, pady=(10, 0))
+        self.recent_listbox = tk.Listbox(self, width=80, height=15, font=("Courier", 10))
+        self.recent_listbox.pack(fill=tk.BOTH, expand=True, padx=10)
+        # count, mean and worst time per operation
+        tk.Label(self, text="By operation").pack(anchor=tk.W, padx=10, pady=(10, 0))
+        self.summary_listbox = tk.Listbox(self, width=80, height=8, font=("Courier", 10))
+        self.summary_listbox.pack(fill=tk.BOTH, expand=True, padx=10)
+        # hits and size of the evaluation result cache
+        self.cache_label = tk.Label(self, anchor=tk.W, font=("Courier", 10))
+        self.cache_label.pack(fill=tk.X, padx=10, pady=(10, 0))
+        # profiler controls and the report of the last capture
+        button_frame = tk.Frame(self)
+        button_frame.pack(fill=tk.X, padx=10, pady=5)
+        self.profile_button = tk.Button(button_frame, command=self.toggle_profiling)
+        self.profile_button.pack(side=tk.LEFT)
+        tk.Button(button_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT)
+        self.profile_text = tk.Text(self, width=80, height=12, font=("Courier", 9))
+        self.profile_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.update_profile_button()
+        self.refresh()
+        self.center_on_parent()
+
+    def refresh(self):
+        """Reload the span lists, and keep doing so while the window is open."""
+        self.recent_listbox.delete(0, tk.END)
+        for recorded in reversed(tracer.recent_spans()):
+            self.recent_listbox.insert(tk.END, f"{recorded.duration * 1000.0:10.2f} ms  {recorded.name:32s} {recorded.thread}")
+        self.summary_listbox.delete(0, tk.END)
+        summary = sorted(tracer.summary().items(), key=lambda item: -item[1][1] * item[1][0])
+        for name, (count, mean, longest) in summary:
+            self.summary_listbox.insert(tk.END, f"{name:32s} {count:6d}x  mean {mean * 1000.0:9.2f} ms  max {longest * 1000.0:9.2f} ms")
+        stats = self.app.result_cache().stats()
+        self.cache_label.config(text=f"Result cache: {stats['hits']} hits, {stats['disk_hits']} from disk, "
+                                     f"{stats['misses']} misses ({stats['hit_rate']:.0%}), {stats['entries']} entries, "
+                                     f"{stats['bytes'] / 1e6:.1f} MB, {stats['evictions']} evicted, "
+                                     f"{stats['invalidations']} invalidated")
+        if tracer.error is not None:
+            self.cache_label.config(text=f"{self.cache_label.cget('text')}\nTrace file turned off: {tracer.error}")
+        self.refresh_job = self.after(self.REFRESH_MS, self.refresh)
+
+    def destroy(self):
+        self.after_cancel(self.refresh_job)
+        super().destroy()
+
+    def update_profile_button(self):
+        self.profile_button.config(text="Stop Profiling" if profiler.running else "Start Profiling")
+
+    def toggle_profiling(self):
+        """Start a cProfile capture of the GUI thread, or stop it and show the top functions."""
+        if not profiler.running:
+            profiler.start()
+            self.update_status_bar("Profiling started")
+        else:
+            path = self.app.preferences.get('profile_file', 'link_engineering.prof')
+            report = profiler.stop(path)
+            self.profile_text.delete("1.0", tk.END)
+            self.profile_text.insert(tk.END, report)
+            self.update_status_bar(f"Profile saved to {path}")
+        self.update_profile_button()
+
+
 class ErrorWindow(tk.Toplevel):
     def __init__(self, parent, message):
         super().__init__(parent)
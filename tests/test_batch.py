@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import subprocess
+
+import pytest
+
+from src.core.batch import evaluate_project, find_projects, load_library, run_batch
+
+DEVICES_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'src', 'devices')
+
+
+def _projects(folder, count):
+    for index in range(count):
+        project = {"devices": [{"name": "Parabolic Antenna"}, {"name": "LNA"}],
+                   "sweep": {"start": 8.0, "stop": 8.4, "points": 11, "unit": "GHz"},
+                   "link": {"eirp": 50 + index, "distance": {"value": 36000, "unit": "km"}, "required_cn0": 60}}
+        (folder / f"p{index}.json").write_text(json.dumps(project))
+    (folder / "broken.json").write_text('{"devices": [')
+    return find_projects([str(folder)])
+
+
+def test_batch_streams_rows_and_resumes(tmp_path):
+    projects = _projects(tmp_path, 4)
+    output = str(tmp_path / "results.jsonl")
+    assert run_batch(projects[:3], DEVICES_FOLDER, output, workers=1) == (3, 1, 0)
+    # an interruption can leave half a row behind, which resuming drops
+    with open(output, "a") as f:
+        f.write('{"project": "cut sho')
+    assert run_batch(projects, DEVICES_FOLDER, output, workers=1, resume=True) == (2, 0, 3)
+    with open(output) as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(row["project"] for row in rows) == projects
+    ok = {row["project"]: row for row in rows if row["status"] == "ok"}
+    assert len(ok) == 4
+    assert ok[projects[2]]["min_margin_db"] - ok[projects[1]]["min_margin_db"] == pytest.approx(1.0)
+
+
+def test_projects_without_devices_or_with_misshapen_sections_are_errors(tmp_path):
+    library = load_library(DEVICES_FOLDER)
+    sweep = {"start": 8.0, "stop": 8.4, "points": 11, "unit": "GHz"}
+    devices = [{"name": "Parabolic Antenna"}, {"name": "LNA"}]
+    for project, error in (({"devices": [], "sweep": sweep}, "no devices"),
+                           ({"devices": devices, "sweep": sweep, "link": [50]}, "link must be an object"),
+                           ({"devices": devices, "sweep": "8-8.4 GHz"}, "sweep must be an object")):
+        path = tmp_path / "project.json"
+        path.write_text(json.dumps(project))
+        row = evaluate_project(str(path), library, None)
+        assert row["status"] == "error" and error in row["error"] and row["min_g_over_t_db"] is None
+
+
+def test_batch_module_does_not_import_tk():
+    source = os.path.join(os.path.dirname(__file__), '..', 'src')
+    code = "import sys, core.batch; print('tkinter' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=source, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
@@ -0,0 +1,23 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks import generators, suite
+from src.core.model import parse_device
+
+
+def test_generated_library_is_reproducible_and_parses():
+    library = generators.generate_library(200, seed=4, nesting=6)
+    assert library == generators.generate_library(200, seed=4, nesting=6)
+    kinds = {parse_device(name, parameters).kind for name, parameters in library["devices"].items()}
+    assert {"antenna", "lna", "cable", "attenuator", "unknown"} <= kinds
+    project = generators.generate_project(library, 50, measurement_points=10)
+    assert len(project["devices"]) == 50 and project["devices"][0]["name"].startswith("ANTENNA")
+
+
+def test_compare_flags_only_real_slowdowns():
+    baseline = {"results": {"a[1000]": {"median": 0.010}, "b[1000]": {"median": 0.010},
+                            "tiny[1000]": {"median": 0.00001}}}
+    current = {"results": {"a[1000]": {"median": 0.011}, "b[1000]": {"median": 0.020},
+                           "tiny[1000]": {"median": 0.00005}, "new[1000]": {"median": 1.0}}}
+    assert [name for name, *_ in suite.compare(baseline, current, threshold=0.25)] == ["b[1000]"]
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.cache import ResultCache, evaluation_key
+from src.core.model import Project
+
+
+def test_lru_evicts_by_size_and_invalidates_by_device():
+    cache = ResultCache(max_bytes=3 * 8_200)
+    for index in range(3):
+        cache.put(f"k{index}", np.zeros(1000) + index, devices=[f"D{index}"])
+    assert cache.get("k0")[0] == 0.0
+    # the least recently used entry, k1, makes room for a fourth
+    cache.put("k3", np.ones(1000), devices=["D0"])
+    assert "k1" not in cache and "k0" in cache
+    assert cache.invalidate_device("D0") == 2
+    assert len(cache) == 1
+    assert cache.get("k0") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["invalidations"]) == (1, 1, 1, 2)
+    calls = []
+    assert cache.get_or_compute("k5", lambda: calls.append(1) or 5) == 5
+    assert cache.get_or_compute("k5", lambda: calls.append(1) or 5) == 5
+    assert calls == [1]
+
+
+def test_keys_follow_device_content_and_disk_store_survives(tmp_path):
+    library = {"devices": {"LNA": {"Gain": 20, "Noise_Figure": 1.0}}}
+    project = Project({"devices": [{"name": "LNA"}, {"name": "Cable", "attenuation": 1.0}]}, library)
+    sweep = {"start": 1, "stop": 2, "points": 11}
+    key, names = evaluation_key("chain", project.devices, library, sweep)
+    assert names == ["LNA", "Cable"]
+    assert evaluation_key("chain", project.devices, library, sweep)[0] == key
+    assert evaluation_key("chain", project.devices, library, dict(sweep, points=12))[0] != key
+    edited = {"devices": {"LNA": {"Gain": 21, "Noise_Figure": 1.0}}}
+    assert evaluation_key("chain", project.devices, edited, sweep)[0] != key
+
+    folder = str(tmp_path / "cache")
+    ResultCache(folder=folder).put(key, {"margin": np.arange(5.0)}, names)
+    reopened = ResultCache(folder=folder)
+    assert np.array_equal(reopened.get(key)["margin"], np.arange(5.0))
+    assert reopened.stats()["disk_hits"] == 1
+    # the dependencies were stored with the entry, so an edit removes it from disk too
+    reopened.invalidate_device("LNA")
+    assert ResultCache(folder=folder).get(key) is None
+    # the disk index reaches entries this process never read
+    ResultCache(folder=folder).put(key, {"margin": np.arange(5.0)}, names)
+    assert ResultCache(folder=folder).invalidate_device("Cable") == 1
+    assert not os.path.exists(os.path.join(folder, key + ".pickle"))
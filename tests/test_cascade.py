@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+
+from src.core.cascade import CascadeEvaluator
+from src.core.link_budget import Chain, LinkBudgetError, LinkParameters, Stage, build_stage, evaluate_chain, frequency_sweep
+
+
+def _chain(stages=50):
+    antenna = build_stage("Dish", {"gain": 40, "efficiency": 80})
+    return Chain(antenna, [Stage(f"S{index}", "lna", 1.0 + index % 3, 50.0 + index) for index in range(stages)])
+
+
+def test_edit_recomputes_only_downstream_stages():
+    frequencies = frequency_sweep(1, 10, 2001)
+    link = LinkParameters(eirp_dbw=50.0, distance_m=1.0e6, required_cn0_dbhz=60.0)
+    evaluator = CascadeEvaluator(_chain(), frequencies, link)
+    evaluator.result()
+    assert evaluator.stages_evaluated == 50
+    evaluator.update_device("S45", {"Gain": {"value": 10, "unit": "dB"}, "Noise_Figure": {"value": 1, "unit": "dB"}})
+    result = evaluator.result()
+    assert evaluator.stages_evaluated == 51
+    expected = evaluate_chain(evaluator.chain, frequencies, link)
+    assert np.allclose(result.noise_temperature, expected.noise_temperature)
+    assert np.allclose(result.cumulative_gain_db, expected.cumulative_gain_db)
+    assert np.allclose(result.margin_db, expected.margin_db)
+
+
+def test_insert_and_remove_keep_prefix():
+    frequencies = frequency_sweep(1, 2, 11)
+    evaluator = CascadeEvaluator(_chain(5), frequencies)
+    evaluator.result()
+    evaluator.insert_stage(3, Stage("Pad", "attenuator", -3.0, 290.0))
+    evaluator.remove_stage(0)
+    result = evaluator.result()
+    assert evaluator.stages_evaluated == 6
+    assert result.stage_names == ["S1", "S2", "Pad", "S3", "S4"]
+    assert np.allclose(result.noise_temperature, evaluate_chain(evaluator.chain, frequencies).noise_temperature)
+
+
+def test_kind_change_rebuilds_the_chain():
+    frequencies = frequency_sweep(1, 2, 11)
+    link = LinkParameters(eirp_dbw=50.0, distance_m=1.0e6, required_cn0_dbhz=60.0)
+    evaluator = CascadeEvaluator(_chain(3), frequencies, link)
+    evaluator.result()
+    # the antenna becomes an LNA, so it joins the cascade at its head
+    evaluator.update_device("Dish", {"Gain": 20, "Noise_Figure": 1.0})
+    result = evaluator.result()
+    assert evaluator.chain.antenna is None and result.stage_names == ["Dish", "S0", "S1", "S2"]
+    assert np.allclose(result.noise_temperature, evaluate_chain(evaluator.chain, frequencies, link).noise_temperature)
+    # and back again
+    evaluator.update_device("Dish", {"gain": 40, "efficiency": 80})
+    result = evaluator.result()
+    assert evaluator.chain.antenna.name == "Dish" and result.stage_names == ["S0", "S1", "S2"]
+    assert np.allclose(result.margin_db, evaluate_chain(_chain(3), frequencies, link).margin_db)
+    # an antenna cannot sit behind other devices, and the chain is left as it was
+    with pytest.raises(LinkBudgetError, match="must be the first device"):
+        evaluator.update_device("S1", {"gain": 30, "efficiency": 70})
+    assert evaluator.result().stage_names == ["S0", "S1", "S2"]
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.decimation import MinMaxPyramid
+
+
+def test_decimated_views_keep_the_extremes_of_every_column():
+    rng = np.random.default_rng(1)
+    x = np.sort(rng.uniform(0.0, 100.0, 200_000))
+    y = np.sin(x) + rng.normal(0.0, 0.1, len(x))
+    pyramid = MinMaxPyramid(x, y)
+    for x0, x1 in [(0.0, 100.0), (10.0, 12.5), (40.0, 40.01)]:
+        view_x, view_y = pyramid.decimate(x0, x1, 500)
+        assert len(view_x) <= 2 * 500 + 2
+        inside = (x >= x0) & (x <= x1)
+        # the view may reach one point past each end, so its extremes bound the visible ones
+        assert view_y.max() >= y[inside].max() and view_y.min() <= y[inside].min()
+    # a short view returns the points themselves
+    view_x, view_y = pyramid.decimate(x[1000], x[1010], 500)
+    assert np.array_equal(view_x, x[999:1012])
+    assert pyramid.bounds() == (x[0], x[-1], y.min(), y.max())
+
+
+def test_streamed_appends_match_a_bulk_build_and_keep_gaps():
+    x = np.arange(100_003, dtype=float)
+    y = np.cos(x / 1000.0)
+    y[50_000:60_000] = np.nan
+    bulk = MinMaxPyramid(x, y)
+    streamed = MinMaxPyramid()
+    for start in range(0, len(x), 7_777):
+        streamed.append(x[start:start + 7_777], y[start:start + 7_777])
+    assert len(streamed) == len(x)
+    for x0, x1, width in [(0, 100_002, 300), (45_000, 65_000, 80)]:
+        bulk_x, bulk_y = bulk.decimate(x0, x1, width)
+        streamed_x, streamed_y = streamed.decimate(x0, x1, width)
+        assert np.array_equal(bulk_x, streamed_x) and np.array_equal(bulk_y, streamed_y, equal_nan=True)
+    # the columns that fall inside the gap are drawn as gaps
+    view_x, view_y = bulk.decimate(45_000, 65_000, 80)
+    assert np.isnan(view_y[(view_x > 51_000) & (view_x < 59_000)]).all()
+    with pytest.raises(ValueError):
+        streamed.append([0.0], [1.0])
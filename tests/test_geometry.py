@@ -0,0 +1,57 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.geometry import (
+    WGS84_A, Ephemeris, KeplerianOrbit, geodetic_to_ecef, pass_from_json, pass_geometry,
+)
+from src.core.link_budget import Chain, LinkParameters, Stage, build_stage, free_space_path_loss
+from src.core.model import Device, Location
+
+
+def test_look_angles_range_and_doppler():
+    station = Location(np.radians(40.0), np.radians(-74.0), 100.0)
+    overhead = geodetic_to_ecef(station.latitude, station.longitude, 1000e3)
+    east = geodetic_to_ecef(station.latitude, station.longitude + 0.2, 0.0)
+    # one target straight overhead and receding at 1 km/s, then on the horizon to the east-ish
+    ephemeris = Ephemeris([0.0, 1.0], [overhead, east], velocities=[overhead / np.linalg.norm(overhead) * 1000.0,
+                                                                      [0.0, 0.0, 0.0]])
+    geometry = pass_geometry(station, ephemeris)
+    assert np.isclose(np.degrees(geometry.elevation[0]), 90.0)
+    assert np.isclose(geometry.range_m[0], 1000e3 - 100.0)
+    assert np.isclose(geometry.range_rate[0], 1000.0)
+    assert np.isclose(geometry.doppler_hz(1e9)[0], -1e9 * 1000.0 / 299792458.0)
+    assert 60.0 < np.degrees(geometry.azimuth[1]) < 120.0 and geometry.elevation[1] < 0.0
+
+
+def test_keplerian_pass_margin_over_time():
+    orbit = KeplerianOrbit(WGS84_A + 550e3, 0.001, np.radians(53.0))
+    times = np.arange(0.0, 3 * orbit.period, 1.0)
+    positions, velocities = orbit.state(times)
+    # a near circular orbit keeps its radius and its speed matches the numerical derivative
+    assert np.ptp(np.linalg.norm(positions, axis=1)) < 2 * 0.001 * (WGS84_A + 550e3) + 1.0
+    assert np.allclose(np.gradient(positions, times, axis=0)[1:-1], velocities[1:-1], atol=0.1)
+
+    station = Device({"name": "Dish", "gain": 40, "efficiency": 80,
+                      "location": {"lat": 40.7128, "lon": -74.006, "alt": 100}})
+    chain = Chain(build_stage("Dish", {"gain": 40, "efficiency": 80}), [Stage("LNA", "lna", 1.0, 50.0)])
+    link = LinkParameters(eirp_dbw=30.0, required_cn0_dbhz=60.0)
+    data = {"station": "Dish", "frequency": {"value": 8.2, "unit": "GHz"},
+            "orbit": {"altitude": {"value": 550, "unit": "km"}, "eccentricity": 0.001, "inclination": 53},
+            "times": {"start": 0, "stop": 3 * orbit.period, "step": 1}}
+    geometry, result = pass_from_json(data, [station], chain, link)
+    assert result.margin_db.shape == geometry.times.shape == times.shape
+    # the margin follows the slant range: closer is better
+    loss = free_space_path_loss(geometry.range_m, 8.2e9)
+    assert np.allclose(result.margin_db + loss, (result.margin_db + loss)[0], atol=0.01)
+
+    # streamed in chunks, the pass is the same once joined
+    chunks = []
+    streamed_geometry, streamed = pass_from_json(data, [station], chain, link,
+                                                 progress=lambda *chunk: chunks.append(chunk), chunk_size=5000)
+    assert len(chunks) == -(-len(times) // 5000) and len(chunks[-1][0].times) == len(times) % 5000
+    assert np.array_equal(streamed_geometry.elevation, geometry.elevation)
+    assert np.allclose(streamed.margin_db, result.margin_db) and np.allclose(streamed.g_over_t_db, result.g_over_t_db)
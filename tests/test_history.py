@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.history import EditHistory, HistoryError
+
+
+def test_undo_redo_restores_devices():
+    devices = {"LNA-1": {"Gain": 20}, "Cable": {"attenuation": 1.0}}
+    original = dict(devices)
+    history = EditHistory(devices)
+    history.set("LNA-1", {"Gain": 30})
+    history.delete("Cable")
+    history.set("LNA-2", {"Gain": 25})
+    assert history.undo_label == "Add LNA-2"
+    assert history.undo() == ["LNA-2"]
+    assert history.undo() == ["Cable"]
+    assert devices["Cable"] is original["Cable"]
+    history.undo()
+    assert devices == original
+    with pytest.raises(HistoryError):
+        history.undo()
+    history.redo()
+    assert devices["LNA-1"] == {"Gain": 30}
+    # a new edit discards the steps that could have been redone
+    history.set("LNA-1", {"Gain": 40})
+    assert not history.can_redo
+    # an edit that changes nothing is not a step
+    assert history.set("LNA-1", devices["LNA-1"]) == []
+    # an edit that could not be saved is taken back, with the redo steps it cleared
+    history.undo()
+    history.set("LNA-1", {"Gain": 50})
+    history.discard(["LNA-1"])
+    assert devices["LNA-1"] == {"Gain": 30} and history.redo_label == "Edit LNA-1" and len(history) == 1
+    # an undo that could not be saved is put back to be tried again
+    history.undo()
+    history.discard(["LNA-1"])
+    assert devices["LNA-1"] == {"Gain": 30} and history.undo_label == "Edit LNA-1" and len(history) == 1
+    assert history.redo_label == "Edit LNA-1" and history.redo() == ["LNA-1"] and devices["LNA-1"] == {"Gain": 40}
+
+
+def test_history_shares_unchanged_devices():
+    devices = {f"D{index}": {"Gain": index} for index in range(100_000)}
+    history = EditHistory(devices, limit=2_000)
+    for step in range(3_000):
+        history.set(f"D{step % 10}", {"Gain": -step})
+    assert len(history) == 2_000
+    # each step holds only the devices it changed
+    assert all(len(step.changes) == 1 for step in history._undo)
+    for _ in range(2_000):
+        history.undo()
+    # the oldest kept step followed step 999, which last set D0 at step 990
+    assert devices["D0"] == {"Gain": -990}
+    assert devices["D10"] == {"Gain": 10}
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# cumulative import time budgets in milliseconds, generous enough for a slow CI machine
+BUDGETS = {
+    "core": 20,
+    "core.tracing": 30,
+    "gui.link_engineering_interface": 150,
+}
+
+
+def import_times(module):
+    """Import module in a fresh interpreter with -X importtime and return {module: cumulative microseconds}."""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=SRC,
+                               capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", ["core", "core.tracing"])
+def test_core_imports_within_budget(module):
+    times = import_times(module)
+    assert "numpy" not in times and "tkinter" not in times
+    assert times[module] < BUDGETS[module] * 1000
+
+
+def test_core_is_tk_free():
+    times = import_times("core.batch, core.montecarlo, core.model, core.parametric, core.search, core.storage")
+    assert not [name for name in times if name.startswith("tkinter")]
+
+
+def test_gui_defers_dialogs_and_numpy():
+    pytest.importorskip("tkinter")
+    times = import_times("gui.link_engineering_interface")
+    for deferred in ("gui.windows", "tkinter.filedialog", "numpy", "core.model"):
+        assert deferred not in times
+    assert times["gui.link_engineering_interface"] < BUDGETS["gui.link_engineering_interface"] * 1000
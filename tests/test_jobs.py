@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.jobs import CANCELLED, DONE, FAILED, JobScheduler
+from src.core.link_budget import LinkParameters, build_chain
+from src.core.montecarlo import Tolerances, run_monte_carlo
+
+
+def wait_for(scheduler, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while scheduler.active and time.perf_counter() < deadline:
+        scheduler.poll()
+        time.sleep(0.005)
+    assert not scheduler.active
+
+
+def test_duplicates_coalesce_and_changed_inputs_supersede():
+    scheduler = JobScheduler(workers=2)
+    release = threading.Event()
+    delivered = []
+
+    def sweep(job, points):
+        for step in range(100):
+            job.progress(step / 100, f"sweeping {points} points")
+        while not release.wait(0.01):
+            job.check()
+        return points
+
+    first = scheduler.submit("sweep", sweep, 10, token="a", on_done=delivered.append)
+    assert scheduler.submit("sweep", sweep, 10, token="a", on_done=delivered.append) is first
+    progress = []
+    second = scheduler.submit("sweep", sweep, 20, token="b", on_done=delivered.append,
+                              on_progress=lambda fraction, text: progress.append(fraction))
+    assert first.cancelled and scheduler.get("sweep") is second
+    time.sleep(0.05)
+    release.set()
+    wait_for(scheduler)
+    # the superseded job never reports, and a burst of progress arrives as few snapshots
+    assert delivered == [20] and first.state == CANCELLED and second.state == DONE
+    assert 1 <= len(progress) < 100 and progress[-1] == 0.99
+
+    # chunks of a streamed result all arrive, in order, however many land between polls
+    def stream(job):
+        for step in range(5):
+            job.chunk(step)
+            job.partial(step)
+    chunks = []
+    partials = []
+    scheduler.submit("stream", stream, on_chunk=chunks.append, on_partial=partials.append)
+    time.sleep(0.05)
+    wait_for(scheduler)
+    assert chunks == [0, 1, 2, 3, 4] and partials == []
+
+    def fails(job):
+        raise ValueError("no sweep")
+    errors = []
+    job = scheduler.submit("sweep", fails, on_error=errors.append)
+    dependent = scheduler.submit("pass", sweep, 1, devices=["LNA"], on_done=delivered.append)
+    assert scheduler.cancel_dependents("LNA") == 1 and scheduler.cancel_dependents("LNA") == 0
+    wait_for(scheduler)
+    assert job.state == FAILED and str(errors[0]) == "no sweep" and dependent.state == CANCELLED
+    scheduler.shutdown()
+
+
+def test_monte_carlo_streams_partial_results_and_stops_when_cancelled():
+    devices = [{"name": "Dish", "gain": 40, "efficiency": 0.6}, {"name": "LNA", "Gain": 30, "Noise_Figure": 0.8}]
+    chain = build_chain({"devices": devices})
+    link = LinkParameters(eirp_dbw=50.0, distance_m=3.6e7, required_cn0_dbhz=60.0)
+    scheduler = JobScheduler(workers=1)
+    partials = []
+    done = []
+
+    def analysis(job):
+        return run_monte_carlo(chain, 8e9, link, Tolerances(gain_db=0.5), samples=50_000, seed=1,
+                               batch_size=10_000, workers=1, progress=job.partial)
+
+    scheduler.submit("monte_carlo", analysis, on_partial=partials.append, on_done=done.append)
+    wait_for(scheduler)
+    assert done[0].samples == 50_000 and partials and partials[-1].samples <= 50_000
+
+    def cancelled(job):
+        job.cancel()
+        return analysis(job)
+    job = scheduler.submit("monte_carlo", cancelled, on_done=done.append)
+    wait_for(scheduler)
+    assert job.state == CANCELLED and len(done) == 1
+    scheduler.shutdown()
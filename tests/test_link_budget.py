@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+
+import numpy as np
+import pytest
+
+from src.core.interpolation import InterpolationTable, TableError, compile_library_tables, compile_table
+from src.core.link_budget import (
+    LinkParameters, build_chain, evaluate_chain, frequency_sweep, REFERENCE_TEMPERATURE,
+)
+
+LIBRARY_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'devices', 'device_library.json')
+
+
+class _Device:
+    def __init__(self, name, json_data):
+        self.name = name
+        self.json_data = json_data
+
+
+class _Project:
+    def __init__(self, names):
+        with open(LIBRARY_PATH, 'r') as f:
+            library = json.load(f)
+        self.devices = [_Device(name, dict(library["devices"][name], name=name)) for name in names]
+
+
+def test_lna_chain_matches_friis():
+    project = _Project(["Parabolic Antenna", "Attenuator", "LNA"])
+    result = evaluate_chain(project, frequency_sweep(1, 2, 5), LinkParameters(sky_temperature=50.0))
+    attenuator_loss = 10 ** 2.5
+    lna_temperature = REFERENCE_TEMPERATURE * (10 ** 0.3 - 1)
+    expected = (0.8 * 50 + 0.2 * 290) + (attenuator_loss - 1) * 290 + lna_temperature * attenuator_loss
+    assert np.allclose(result.noise_temperature, expected)
+    assert np.allclose(result.gain_db, 0.0)
+    assert np.allclose(result.g_over_t_db, 40 - 10 * np.log10(expected))
+
+
+def test_cable_loss_is_interpolated_over_sweep():
+    project = _Project(["Cable RG-214"])
+    chain = build_chain(project)
+    result = evaluate_chain(chain, np.array([1e9, 3e9, 5e9]))
+    assert np.allclose(result.stage_gain_db[0], [-25.2, -(25.2 + 67.85) / 2, -67.85])
+
+
+def test_margin_requires_link_parameters():
+    project = _Project(["Parabolic Antenna", "LNA"])
+    frequencies = frequency_sweep(1, 10, 1000)
+    assert evaluate_chain(project, frequencies).margin_db is None
+    link = LinkParameters(eirp_dbw=50.0, distance_m=1.0e6, required_cn0_dbhz=60.0)
+    result = evaluate_chain(project, frequencies, link)
+    assert result.margin_db.shape == frequencies.shape
+    assert np.all(np.diff(result.margin_db) < 0)
+
+
+def test_library_tables_report_misspelled_keys():
+    with open(LIBRARY_PATH, 'r') as f:
+        library = json.load(f)
+    tables, problems = compile_library_tables(library)
+    assert list(tables) == ["Cable RG-214"]
+    assert "frequenccy" in problems["Cable RG-214"][0]
+    attenuation = tables["Cable RG-214"]["attenuation"]
+    assert np.allclose(attenuation(np.array([1e7, 1e9, 2e10])), [0.021, 0.252, 0.3651])
+
+
+def test_malformed_table_points_fail_at_compile_time():
+    table = {"F1": {"frequency": "x", "units": "GHz", "attenuation": 1}, "F2": {"units": "GHz", "attenuation": 2}}
+    with pytest.raises(TableError) as e:
+        compile_table(table, "attenuation")
+    assert len(e.value.problems) == 2
+
+
+def test_loglog_table():
+    table = InterpolationTable([1e9, 1e11], [1.0, 100.0], mode="loglog")
+    assert np.isclose(table(1e10), 10.0)
@@ -0,0 +1,44 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import math
+
+from src.core.model import DeviceSpec, parse_device, parse_scalar
+
+LIBRARY_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'devices', 'device_library.json')
+
+
+def test_parse_device_converts_quantities_to_si():
+    spec = parse_device("Dish", {
+        "gain": {"value": 40, "unit": "dB"}, "efficiency": 65, "diameter": {"value": 300, "units": "cm"},
+        "frequency_range": {"min": 7.25, "max": 8.4, "units": "GHz"},
+        "location": {"lat": 45, "lon": -90, "unit": "deg"},
+        "physical_temperature": {"value": 20, "unit": "C"},
+    })
+    assert spec.kind == "antenna"
+    assert spec.gain_db == 40.0 and spec.efficiency == 0.65 and spec.diameter_m == 3.0
+    assert tuple(spec.frequency_range) == (7.25e9, 8.4e9)
+    assert spec.frequency_range.covers(8.0e9, 8.4e9)
+    assert math.isclose(spec.location.latitude, math.pi / 4)
+    assert math.isclose(spec.quantities["physical_temperature"], 293.15)
+    assert spec.problems == []
+    assert not hasattr(spec, "__dict__")
+
+
+def test_library_devices_parse_without_problems():
+    with open(LIBRARY_PATH, 'r') as f:
+        devices = json.load(f)["devices"]
+    specs = {name: parse_device(name, parameters) for name, parameters in devices.items()}
+    assert all(isinstance(spec, DeviceSpec) for spec in specs.values())
+    assert [name for name, spec in specs.items() if spec.problems] == ["Cable RG-214"]
+    assert specs["LNA"].kind == "lna" and specs["LNA"].noise_figure_db is not None
+    assert "attenuation" in specs["Cable RG-214"].tables
+
+
+def test_parse_scalar_reads_signed_and_exponent_numbers():
+    assert parse_scalar("-3") == -3
+    assert parse_scalar("1e-3") == 0.001
+    assert parse_scalar("12", "String") == "12"
+    assert parse_scalar("yes", "Boolean") is True
+    assert parse_scalar("abc") == "abc"
@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+
+from src.core.link_budget import Chain, LinkParameters, build_stage, evaluate_chain, passive_stage
+from src.core.montecarlo import MonteCarloError, MonteCarloModel, Tolerances, run_monte_carlo
+
+
+def _chain():
+    return Chain(build_stage("Dish", {"gain": 40, "efficiency": 80, "diameter": 3}),
+                 [build_stage("LNA", {"Gain": 30, "Noise_Figure": 1.0}), passive_stage("Cable", "cable", 3.0)])
+
+
+LINK = LinkParameters(eirp_dbw=50.0, distance_m=3.6e7, required_cn0_dbhz=60.0)
+
+
+def test_eirp_spread_gives_a_normal_margin_around_nominal():
+    nominal = float(evaluate_chain(_chain(), 8.2e9, LINK).margin_db)
+    result = run_monte_carlo(_chain(), 8.2e9, LINK, Tolerances(eirp_db=1.0), samples=200_000, seed=7,
+                             batch_size=50_000, workers=1)
+    assert result.mean == pytest.approx(nominal, abs=0.02)
+    assert result.std == pytest.approx(1.0, abs=0.02)
+    assert result.percentile(50) == pytest.approx(nominal, abs=0.05)
+    assert result.percentile(5) == pytest.approx(nominal - 1.645, abs=0.05)
+    assert result.availability == 1.0
+
+
+def test_results_do_not_depend_on_the_number_of_workers():
+    tolerances = Tolerances(gain_db=0.5, noise_figure_db=0.2, efficiency=0.05, pointing_error_deg=0.1,
+                            physical_temperature_k=10.0)
+    serial = run_monte_carlo(_chain(), 8.2e9, LINK, tolerances, samples=40_000, seed=3, batch_size=10_000, workers=1)
+    pooled = run_monte_carlo(_chain(), 8.2e9, LINK, tolerances, samples=40_000, seed=3, batch_size=10_000, workers=2)
+    assert np.array_equal(serial.counts, pooled.counts)
+    assert serial.mean == pooled.mean and serial.failures == pooled.failures
+    with pytest.raises(MonteCarloError):
+        run_monte_carlo(_chain(), 8.2e9, LinkParameters(), tolerances, samples=10)
+
+
+def test_every_passive_stage_keeps_its_physical_temperature():
+    # splitters, combiners and switches are passive losses just like attenuators and cables
+    splitter = build_stage("Splitter", {"type": "splitter", "ports": 4, "attenuation": 0.5})
+    chain = Chain(_chain().antenna, _chain().stages + [splitter])
+    model = MonteCarloModel(chain, 8.2e9, LinkParameters(eirp_dbw=50.0, distance_m=3.6e7, required_cn0_dbhz=60.0,
+                                                         physical_temperature=250.0), Tolerances())
+    assert model.passive.tolist() == [False, True, True]
+    assert np.allclose(model.physical_temperature, [250.0, 290.0, 290.0])
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import random
+
+import pytest
+
+from src.core.parametric import IntervalTree, ParametricIndex, QueryError, parse_query
+
+LIBRARY_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'devices', 'device_library.json')
+
+
+def test_query_normalizes_frequency_range_keys():
+    with open(LIBRARY_PATH, 'r') as f:
+        index = ParametricIndex(json.load(f)["devices"])
+    assert index.query(covers=(8.0e9, 8.4e9)) == ["Attenuator", "Cable RG-214", "LNA", "Parabolic Antenna"]
+    assert index.query(covers=(0.15e9, 1e9)) == ["LNA"]
+    assert index.query(**parse_query("lna 8.0-8.4GHz nf<1 gain>20")) == []
+    assert index.query(**parse_query("lna 8.0-8.4GHz nf <= 3 gain > 20")) == ["LNA"]
+    assert index.query(**parse_query("loss>=25")) == ["Attenuator"]
+
+
+def test_incremental_updates_match_a_scan():
+    random.seed(3)
+    index = ParametricIndex()
+    devices = {}
+    for number in range(400):
+        name = f"LNA-{number % 150}"
+        low = random.uniform(1, 10)
+        devices[name] = {"frequency_range": {"min": low, "max": low + random.uniform(0, 5), "units": "GHz"},
+                         "Gain": {"value": random.uniform(10, 40), "unit": "dB"}, "Noise_Figure": random.uniform(0.3, 3)}
+        index.add(name, devices[name])
+        if number % 7 == 0:
+            removed = f"LNA-{random.randrange(150)}"
+            devices.pop(removed, None)
+            index.remove(removed)
+    expected = sorted(name for name, device in devices.items()
+                      if device["frequency_range"]["min"] <= 8.0 and device["frequency_range"]["max"] >= 8.4
+                      and device["Noise_Figure"] < 1 and device["Gain"]["value"] > 20)
+    assert index.query("lna", (8.0e9, 8.4e9), [("noise_figure_db", "<", 1), ("gain_db", ">", 20)]) == expected
+
+
+def test_interval_tree_stab():
+    tree = IntervalTree({"a": (1, 5), "b": (4, 9), "c": (6, 7)})
+    assert tree.stab(4.5) == {"a", "b"}
+    assert tree.covering(4, 8) == {"b"}
+
+
+def test_bad_query():
+    with pytest.raises(QueryError):
+        parse_query("gain>>3")
+
+
+def test_matches_single_device():
+    with open(LIBRARY_PATH, 'r') as f:
+        index = ParametricIndex(json.load(f)["devices"])
+    assert index.matches("LNA", **parse_query("lna 8-8.4 gain>20"))
+    assert not index.matches("Attenuator", **parse_query("lna"))
+    assert not index.matches("missing")
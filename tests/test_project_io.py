@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+
+import numpy as np
+import pytest
+
+from src.core.project_io import ProjectFile, ProjectFormatError
+
+
+def _write(tmp_path, data):
+    path = tmp_path / "project.json"
+    path.write_text(json.dumps(data, indent=2))
+    return str(path)
+
+
+def test_sections_and_devices_are_parsed_on_access(tmp_path):
+    data = {
+        "name": "x [y] {z} \"q\"",
+        "devices": [{"name": f"D{index}", "Gain": index, "note": "]}"} for index in range(50)],
+        "measurements": {"S21": [1.5, -2.0, 3e-3], "grid": [[1, 2], [3, 4]]},
+        "link": {"eirp": {"value": 50, "unit": "dBW"}},
+    }
+    seen = []
+    with ProjectFile(_write(tmp_path, data), progress=lambda position, size: seen.append(position)) as project:
+        assert list(project) == ["name", "devices", "measurements", "link"]
+        assert seen[-1] == os.path.getsize(project.path)
+        devices = project.sequence("devices", lambda device: device["name"])
+        assert len(devices) == 50 and devices.materialized() == 0
+        assert devices[7] == "D7" and devices[-1] == "D49"
+        assert devices.materialized() == 2
+        assert project["name"] == data["name"] and project.get("link") == data["link"]
+        assert np.array_equal(project.array("measurements", "S21"), [1.5, -2.0, 3e-3])
+        assert project.array("measurements", "grid").shape == (2, 2)
+        with pytest.raises(KeyError):
+            project.array("measurements", "missing")
+
+
+def test_malformed_files_are_reported(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text('{"devices": [1, 2')
+    with pytest.raises(ProjectFormatError):
+        ProjectFile(str(path))
+    with ProjectFile(_write(tmp_path, {"data": [1, "a", 2]})) as project:
+        with pytest.raises(ProjectFormatError):
+            project.array("data")
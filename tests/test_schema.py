@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.schema import unsupported_values, validate_library
+from src.core.sidecar import load_prepared, sidecar_path
+from src.core.storage import JsonLibraryStore
+
+LIBRARY_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'devices', 'device_library.json')
+
+
+def test_library_is_validated_in_one_pass():
+    with open(LIBRARY_PATH) as f:
+        library = json.load(f)
+    problems = validate_library(library)
+    assert set(problems) == {"Cable RG-214", "glue", "fasdf"}
+    assert problems["Cable RG-214"] == ["attenuation: F1 has misspelled frequency key 'frequenccy'"]
+
+    problems = validate_library({"devices": {
+        "LNA": {"Gain": {"value": 20, "unit": "dB"}, "Noise_Figure": "low", "Colour": "red"},
+        "Dish": {"gain": 40, "efficiency": 65, "diameter": {"value": 3, "unit": "furlong"}},
+        "Pad": {"type": "attenuator"},
+        "Ref": {},
+    }})
+    assert problems == {
+        "LNA": ["Noise_Figure: expected a number or a value with a unit", "Colour: not a parameter of a lna"],
+        "Dish": ["diameter: unknown unit 'furlong'"],
+        "Pad": ["attenuation: missing for a attenuator"],
+    }
+    assert unsupported_values({"gain": 40, "ports": [1, 2], "location": {"lat": None}}) == ["ports", "location.lat"]
+
+
+def test_sidecar_skips_preparing_an_unchanged_library(tmp_path):
+    (tmp_path / "shared").mkdir()
+    store = JsonLibraryStore(str(tmp_path / "shared" / "device_library.json"))
+    store.save_all({"devices": {"LNA": {"Gain": 20}}})
+    folder = str(tmp_path / "cache")
+    prepared = []
+
+    def prepare(library):
+        prepared.append(len(library["devices"]))
+        return validate_library(library)
+
+    library, problems, cached = load_prepared(store, prepare, folder)
+    assert not cached and prepared == [1] and os.path.exists(sidecar_path(store, folder))
+    # nothing is written to the library's folder, which may be shared
+    assert os.listdir(tmp_path / "shared") == ["device_library.json"]
+    library, problems, cached = load_prepared(store, prepare, folder)
+    assert cached and prepared == [1] and library == {"devices": {"LNA": {"Gain": 20}}}
+
+    # an edited library is read and prepared again, as is one whose sidecar is damaged
+    store.upsert("Dish", {"gain": 40, "diameter": 2.4})
+    library, problems, cached = load_prepared(store, prepare, folder)
+    assert not cached and prepared == [1, 2] and problems == {}
+    with open(sidecar_path(store, folder), "r+b") as f:
+        f.seek(-8, os.SEEK_END)
+        f.write(b"\0" * 8)
+    library, problems, cached = load_prepared(store, prepare, folder)
+    assert not cached and prepared == [1, 2, 2]
@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+
+from src.core.search import DeviceSearchIndex
+
+LIBRARY_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'devices', 'device_library.json')
+
+
+def _index():
+    with open(LIBRARY_PATH, 'r') as f:
+        return DeviceSearchIndex(json.load(f)["devices"])
+
+
+def test_search_matches_names_and_parameter_keys():
+    index = _index()
+    assert index.search("") == ["Attenuator", "Cable RG-214", "fasdf", "glue", "LNA", "Parabolic Antenna"]
+    assert index.search("ant") == ["Parabolic Antenna"]
+    assert index.search("rg-") == ["Cable RG-214"]
+    assert index.search("noise") == ["LNA"]
+    assert index.search("atten") == ["Attenuator", "Cable RG-214"]
+    assert index.search("attenuator") == ["Attenuator"]
+
+
+def test_incremental_add_and_remove():
+    index = _index()
+    index.add("LNA-2", {"Noise_Figure": 1})
+    index.remove("LNA")
+    index.remove("missing")
+    assert index.search("lna") == ["LNA-2"]
+    assert index.search("noise_f") == ["LNA-2"]
+    index.remove("LNA-2")
+    assert index.search("noise") == []
+    assert len(index) == 5
+
+
+def test_matches_single_device():
+    index = _index()
+    assert index.matches("LNA", "")
+    assert index.matches("LNA", "Noise")
+    assert not index.matches("LNA", "diameter")
+    assert not index.matches("missing", "")
@@ -0,0 +1,45 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import shutil
+
+from src.core.storage import FolderLibraryStore, JsonLibraryStore, SqliteLibraryStore, open_store
+
+LIBRARY_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'devices', 'device_library.json')
+
+
+def test_stores_migrate_and_round_trip_the_json_library(tmp_path):
+    shutil.copy(LIBRARY_PATH, tmp_path / "device_library.json")
+    with open(LIBRARY_PATH, 'r') as f:
+        original = json.load(f)
+    # a read-only open leaves the folder as it is and reads the json library
+    for backend in ("folder", "sqlite"):
+        store = open_store(str(tmp_path), backend, migrate=False)
+        assert isinstance(store, JsonLibraryStore) and store.load() == original
+    assert os.listdir(tmp_path) == ["device_library.json"]
+    # the default backend migrates the json library into one file per device
+    for backend in ("folder", "sqlite"):
+        store = open_store(str(tmp_path)) if backend == "folder" else open_store(str(tmp_path), backend)
+        store.export_json(str(tmp_path / "exported.json"))
+        store.close()
+        with open(tmp_path / "exported.json", 'r') as f:
+            exported = json.load(f)
+        assert exported == original
+        assert list(exported) == list(original) and list(exported["devices"]) == list(original["devices"])
+    assert len(os.listdir(tmp_path / "device_library" / "devices")) == len(original["devices"])
+
+
+def test_per_device_upsert_and_delete(tmp_path):
+    for store in (JsonLibraryStore(str(tmp_path / "library.json")), SqliteLibraryStore(str(tmp_path / "library.sqlite")),
+                  FolderLibraryStore(str(tmp_path / "library"))):
+        store.upsert("LNA", {"Gain": 25})
+        store.upsert("Cable", {"length": 3})
+        store.upsert("LNA", {"Gain": 30})
+        store.delete("Cable")
+        store.delete("missing")
+        assert store.load() == {"devices": {"LNA": {"Gain": 30}}}
+        store.close()
+    assert [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")] == []
+    # each device is one file, and a deleted device leaves none behind
+    assert os.listdir(tmp_path / "library" / "devices") == [os.path.basename(store.device_path("LNA"))]
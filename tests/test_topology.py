@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core import topology
+from src.core.link_budget import LinkBudgetError, LinkParameters, evaluate_chain, frequency_sweep
+from src.core.topology import build_topology, evaluate_topology
+
+ANTENNA = {"gain": 40, "efficiency": 80}
+LNA = {"Gain": {"value": 25, "unit": "dB"}, "Noise_Figure": {"value": 3, "unit": "dB"}}
+ATTENUATOR = {"attenuation": {"value": 6, "unit": "dB"}}
+LINK = LinkParameters(eirp_dbw=50.0, distance_m=3.6e7, required_cn0_dbhz=50.0)
+
+
+def station(receivers):
+    """An antenna and LNA feeding a 4-way splitter, each output through a splitter to receivers."""
+    devices = [dict(ANTENNA, name="Antenna"), dict(LNA, name="LNA"),
+               {"name": "Splitter", "type": "splitter", "ports": 4, "attenuation": 0.5}]
+    connections = [["Antenna", "LNA"], ["LNA", "Splitter"]]
+    for branch in range(4):
+        devices.append({"name": f"Split {branch}", "type": "splitter", "ports": receivers})
+        connections.append(["Splitter", f"Split {branch}"])
+        for receiver in range(receivers):
+            name = f"Receiver {branch}.{receiver}"
+            devices += [dict(ATTENUATOR, name=f"Pad {branch}.{receiver}"), dict(LNA, name=name)]
+            connections += [{"from": f"Split {branch}", "from_port": receiver, "to": f"Pad {branch}.{receiver}"},
+                            [f"Pad {branch}.{receiver}", name]]
+    return {"devices": devices, "connections": connections}
+
+
+def test_paths_match_their_flattened_chains_and_share_upstream_segments(monkeypatch):
+    project = station(receivers=8)
+    graph = build_topology(project)
+    evaluated = []
+    segment = topology.evaluate_segment
+    monkeypatch.setattr(topology, "evaluate_segment",
+                        lambda part, frequencies: evaluated.append(part) or segment(part, frequencies))
+    frequencies = frequency_sweep(1, 2, 11)
+    result = evaluate_topology(graph, frequencies, LINK, workers=4)
+    assert len(result.paths) == 32 and sorted(graph.receivers()) == sorted(path.name for path in result.paths)
+    # the shared front end, each branch splitter and each receive leg are cascaded once
+    assert len(evaluated) == len(graph.segments) == 1 + 4 + 32
+    devices = {device["name"]: device for device in project["devices"]}
+    for path in (result.paths[0], result.receiver("Receiver 2.5")[0]):
+        chain = evaluate_chain({"devices": [devices[name] for name in path.names]}, frequencies, LINK)
+        assert np.allclose(path.noise_temperature, chain.noise_temperature)
+        assert np.allclose(path.gain_db, chain.gain_db)
+        assert np.allclose(path.margin_db, chain.margin_db)
+        full = result.chain_result(path)
+        assert full.stage_names == chain.stage_names
+        assert np.allclose(full.cumulative_gain_db, chain.cumulative_gain_db)
+        assert np.allclose(full.level_dbw, chain.level_dbw)
+    # the splits cost 10log10(4) and 10log10(8) dB on top of the 0.5 dB insertion loss
+    assert np.allclose(result.paths[0].gain_db, 25 - 0.5 - 10 * np.log10(32) - 6 + 25)
+
+
+def test_combiners_join_paths_and_bad_graphs_are_rejected():
+    devices = [dict(ANTENNA, name="A"), dict(ANTENNA, name="B"), dict(LNA, name="LNA A"), dict(LNA, name="LNA B"),
+               {"name": "Combiner", "type": "combiner"}, dict(LNA, name="Receiver")]
+    connections = [["A", "LNA A"], ["B", "LNA B"], ["LNA A", "Combiner"], ["LNA B", "Combiner"],
+                   ["Combiner", "Receiver"]]
+    result = evaluate_topology(build_topology({"devices": devices, "connections": connections}),
+                               frequency_sweep(1, 2, 3), workers=1)
+    assert [path.names for path in result.receiver("Receiver")] == [
+        ["A", "LNA A", "Combiner", "Receiver"], ["B", "LNA B", "Combiner", "Receiver"]]
+    assert result.worst() in result.paths
+
+    def build(connections):
+        return build_topology({"devices": devices, "connections": connections})
+
+    with pytest.raises(LinkBudgetError, match="loop"):
+        build([["LNA A", "Receiver"], ["Receiver", "LNA B"], ["LNA B", "LNA A"]])
+    # an LNA has one output, so fanning out needs a splitter
+    with pytest.raises(LinkBudgetError, match="has 1 output,"):
+        build([["A", "LNA A"], ["A", "LNA B"]])
+    with pytest.raises(LinkBudgetError, match="connected twice"):
+        build([{"from": "LNA A", "to": "Combiner", "to_port": 1}, {"from": "LNA B", "to": "Combiner", "to_port": 1}])
+    with pytest.raises(LinkBudgetError, match="no inputs"):
+        build([["LNA A", "A"]])
+    with pytest.raises(LinkBudgetError, match="not a project device"):
+        build([["A", "Missing"]])
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+
+import pytest
+
+from src.core.tracing import Profiler, Tracer
+
+
+def test_spans_are_written_as_chrome_trace_events_and_rotated(tmp_path):
+    path = str(tmp_path / "trace.json")
+    tracer = Tracer(path, max_bytes=2000, backups=2, buffer_size=4)
+    for index in range(60):
+        with tracer.span("compute", index=index) as span:
+            span.set(points=index * 2)
+    with pytest.raises(ValueError):
+        with tracer.span("failing"):
+            raise ValueError("boom")
+    tracer.close()
+    assert os.path.exists(path + ".1") and os.path.exists(path + ".2") and not os.path.exists(path + ".3")
+    with open(path) as f:
+        # the trace event format leaves the array open, so close it to read it back
+        events = json.loads(f.read().rstrip().rstrip(",") + "]")
+    assert events[-1]["name"] == "failing" and events[-1]["args"]["error"] == "ValueError"
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    count, mean, longest = tracer.summary()["compute"]
+    assert count == 60 and 0 <= mean <= longest
+    spans = tracer.recent_spans()
+    assert spans[-1].name == "failing" and spans is not tracer.recent_spans()
+
+    # a trace file that cannot be written turns file output off instead of failing the traced operation
+    (tmp_path / "not_a_folder").write_text("")
+    tracer.configure(str(tmp_path / "not_a_folder" / "trace.json"))
+    tracer.buffer_size = 1
+    with tracer.span("load"):
+        pass
+    assert isinstance(tracer.error, OSError) and tracer.path is None and tracer.recent_spans()[-1].name == "load"
+
+
+def test_profiler_reports_the_captured_calls(tmp_path):
+    profiler = Profiler()
+    profiler.start()
+    sorted(range(1000), key=lambda value: -value)
+    report = profiler.stop(str(tmp_path / "capture.prof"))
+    assert "function calls" in report and os.path.exists(tmp_path / "capture.prof")
+    assert not profiler.running and profiler.stop() == ""
@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.storage import FolderLibraryStore, JsonLibraryStore, SqliteLibraryStore, VersionConflict, device_version
+from src.core.watcher import LibraryWatcher
+
+
+@pytest.mark.parametrize("store_class, file_name", [(JsonLibraryStore, "device_library.json"),
+                                                   (SqliteLibraryStore, "device_library.sqlite"),
+                                                   (FolderLibraryStore, "device_library")])
+def test_external_changes_are_diffed_per_device(tmp_path, store_class, file_name):
+    path = str(tmp_path / file_name)
+    ours = store_class(path)
+    ours.save_all({"devices": {"LNA": {"Gain": 20}, "Cable": {"attenuation": 1.0}, "Dish": {"gain": 40}}})
+    library = ours.load()
+    watcher = LibraryWatcher(ours, library["devices"])
+    assert not watcher.changed()
+
+    # a colleague edits one device, deletes another and adds a third through their own store
+    theirs = store_class(path)
+    theirs.upsert("LNA", {"Gain": 25})
+    theirs.delete("Cable")
+    theirs.upsert("Filter", {"attenuation": 0.5})
+    # the file's times may not have moved within the clock's resolution
+    if store_class is JsonLibraryStore:
+        os.utime(path, ns=(0, 0))
+    elif store_class is FolderLibraryStore:
+        os.utime(theirs.devices_path, ns=(0, 0))
+    assert watcher.changed()
+    diff = watcher.merge(*watcher.read())
+    assert diff.changed == {"LNA": {"Gain": 25}} and diff.removed == ["Cable"] and list(diff.added) == ["Filter"]
+
+    # our own writes are not reported back as changes
+    ours.upsert_checked("Dish", {"gain": 41}, watcher.version("Dish"))
+    watcher.stored("Dish", {"gain": 41})
+    assert len(watcher.merge(*watcher.read())) == 0
+    # a read diffed against the state before one of our writes is stale
+    read = watcher.read()
+    watcher.stored("Filter", None)
+    assert watcher.merge(*read) is None
+    ours.close()
+    theirs.close()
+
+
+def test_checked_writes_detect_concurrent_edits(tmp_path):
+    store = SqliteLibraryStore(str(tmp_path / "device_library.sqlite"))
+    store.save_all({"devices": {"LNA": {"Gain": 20}}})
+    based_on = device_version({"Gain": 20})
+    store.upsert("LNA", {"Gain": 30})
+    with pytest.raises(VersionConflict) as conflict:
+        store.upsert_checked("LNA", {"Gain": 22}, based_on)
+    assert conflict.value.current == {"Gain": 30}
+    assert store.load()["devices"]["LNA"] == {"Gain": 30}
+    with pytest.raises(VersionConflict):
+        store.upsert_checked("New", {"Gain": 1}, based_on)
+    store.upsert_checked("New", {"Gain": 1}, None)
+    store.delete_checked("LNA", device_version({"Gain": 30}))
+    assert store.load()["devices"] == {"New": {"Gain": 1}}
+
+    # the watcher's rereads share the connection with our writes without seeing them half done
+    errors = []
+    loads = []
+    done = threading.Event()
+
+    def reread():
+        while not done.is_set():
+            try:
+                loads.append(store.load()["devices"]["New"])
+            except Exception as e:
+                errors.append(e)
+    reader = threading.Thread(target=reread)
+    reader.start()
+    for gain in range(2, 200):
+        store.upsert_checked("New", {"Gain": gain}, device_version({"Gain": gain - 1}))
+    done.set()
+    reader.join()
+    assert errors == [] and loads and all(1 <= device["Gain"] < 200 for device in loads)
+    store.close()